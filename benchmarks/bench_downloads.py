@@ -0,0 +1,126 @@
+"""Load-test /download against a local cloud server: full downloads plus random Range requests.
+
+    python benchmarks/bench_downloads.py                        # Flask dev server on synthetic files
+    python benchmarks/bench_downloads.py --asgi                 # cloud_asgi under uvicorn (if installed)
+    python benchmarks/bench_downloads.py --url http://host:5000 --files a.mp4 b.jpg
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import http.client
+from urllib.parse import urlsplit, quote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+RANGE_SIZE = 1024 * 1024  # Bytes per Range request, roughly one video scrub
+
+
+def start_local_server(folder, asgi, port):
+    """Serve folder with cloud_server (or cloud_asgi) on a background thread, return its URL."""
+    os.chdir(folder)  # Importing cloud_server creates its UPLOAD_FOLDER relative to the cwd
+    import cloud_server
+    cloud_server.app.config["UPLOAD_FOLDER"] = folder
+    if asgi:
+        import uvicorn
+        import cloud_asgi
+        cloud_asgi.app.upload_folder = folder
+        server = uvicorn.Server(uvicorn.Config(cloud_asgi.app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+    else:
+        from werkzeug.serving import make_server
+        server = make_server("127.0.0.1", port, cloud_server.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+
+def make_files(folder, count, size):
+    names = []
+    for i in range(count):
+        name = f"MVI_{i:04d}.MP4"
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(os.urandom(size))
+        names.append(name)
+    return names
+
+
+def client(url, files, sizes, requests, range_share, results, rng):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    for _ in range(requests):
+        name = rng.choice(files)
+        headers = {}
+        if rng.random() < range_share and sizes[name] > RANGE_SIZE:
+            start = rng.randrange(0, sizes[name] - RANGE_SIZE)
+            headers["Range"] = f"bytes={start}-{start + RANGE_SIZE - 1}"
+        began = time.perf_counter()
+        conn.request("GET", f"/download/{quote(name)}", headers=headers)
+        response = conn.getresponse()
+        received = len(response.read())
+        if response.will_close:
+            conn.close()
+        results.append((time.perf_counter() - began, received, response.status))
+    conn.close()
+
+
+def run(url, files, sizes, concurrency, requests, range_share):
+    results = []
+    threads = [threading.Thread(target=client, args=(url, files, sizes, requests, range_share, results,
+                                                        random.Random(i)))
+               for i in range(concurrency)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    latencies = sorted(latency for latency, _, _ in results)
+    total = sum(received for _, received, _ in results)
+    statuses = {}
+    for _, _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{concurrency:>4} clients: {len(results) / elapsed:8.1f} req/s {total / elapsed / 1024 ** 2:8.1f} MB/s  "
+          f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms  p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms  "
+          f"{statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Benchmark this running server instead of a local one")
+    parser.add_argument("--files", nargs="+", help="File names on --url to download (with their sizes found by HEAD)")
+    parser.add_argument("--asgi", action="store_true", help="Serve locally through cloud_asgi and uvicorn")
+    parser.add_argument("--count", type=int, default=8, help="Synthetic files to serve locally")
+    parser.add_argument("--size", type=int, default=32, help="Size of each synthetic file in MB")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent clients per run")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--range-share", type=float, default=0.75, help="Fraction of requests that are 1 MB ranges")
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        if args.url:
+            url, files = args.url, args.files
+            sizes = {}
+            parts = urlsplit(url)
+            for name in files:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port)
+                conn.request("HEAD", f"/download/{quote(name)}")
+                sizes[name] = int(conn.getresponse().getheader("Content-Length"))
+                conn.close()
+        else:
+            files = make_files(folder, args.count, args.size * 1024 * 1024)
+            sizes = {name: args.size * 1024 * 1024 for name in files}
+            url = start_local_server(folder, args.asgi, args.port)
+        print(f"Downloading from {url}: {len(files)} files, {args.range_share:.0%} range requests")
+        for concurrency in args.concurrency:
+            run(url, files, sizes, concurrency, args.requests, args.range_share)
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))  # Let the temporary folder be removed
+
+
+if __name__ == "__main__":
+    main()
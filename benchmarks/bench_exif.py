@@ -0,0 +1,76 @@
+"""Compare EXIF date extraction throughput: full PIL/exifread parse vs the header-only reader.
+
+    python benchmarks/bench_exif.py                 # synthetic card of JPEGs
+    python benchmarks/bench_exif.py --card D:\\DCIM  # real files (JPEG/CR3)
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from PIL import Image
+from picchronicle import extract_cr3_exif, extract_exif, extract_date, get_date_taken, SUPPORTED_IMAGE_EXTENSIONS
+from media_metadata import read_exif_fast
+
+
+def make_synthetic_card(folder, count):
+    """Write count small JPEGs carrying DateTimeOriginal, orientation and a maker-note sized blob."""
+    start = datetime(2025, 6, 27, 9, 0, 0)
+    for i in range(count):
+        exif = Image.Exif()
+        exif[0x0112] = 1
+        exif[0x010F] = "Canon"
+        exif.get_ifd(0x8769)[0x9003] = (start + timedelta(seconds=i)).strftime("%Y:%m:%d %H:%M:%S")
+        exif.get_ifd(0x8769)[0x927C] = os.urandom(8192)  # MakerNote, like real camera files
+        Image.new("RGB", (1600, 1200), (i % 256, 80, 160)).save(
+            os.path.join(folder, f"IMG_{i:04d}.JPG"), quality=90, exif=exif)
+
+
+def legacy_date(path):
+    if path.lower().endswith('.cr3'):
+        return extract_date(extract_cr3_exif(path), is_raw=True)
+    with Image.open(path) as img:
+        return extract_date(extract_exif(img))
+
+
+def fast_date(path):
+    exif = read_exif_fast(path)
+    return get_date_taken(exif) if exif else None
+
+
+def bench(label, func, paths):
+    start = time.perf_counter()
+    found = sum(1 for path in paths if func(path))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>8}: {len(paths) / elapsed:8.1f} files/s ({found}/{len(paths)} dated, {elapsed:.2f}s)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500, help="Synthetic JPEGs to generate")
+    parser.add_argument("--card", help="Benchmark the images in this folder instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = args.card
+        if not folder:
+            folder = tmpdir
+            make_synthetic_card(folder, args.files)
+        paths = [os.path.join(root, f) for root, _, files in os.walk(folder) for f in files
+                 if f.lower().endswith(SUPPORTED_IMAGE_EXTENSIONS)]
+        # Warm the page cache so both runs measure parsing rather than the card reader.
+        for path in paths:
+            with open(path, 'rb') as f:
+                f.read()
+        before = bench("before", legacy_date, paths)
+        after = bench("after", fast_date, paths)
+        print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Measure FTPPool throughput against a local pyftpdlib server, by number of sessions.
+
+    python benchmarks/bench_ftp_upload.py                       # 24 x 4 MB files, 1 MB/s per connection
+    python benchmarks/bench_ftp_upload.py --limit 0             # Unthrottled loopback
+    python benchmarks/bench_ftp_upload.py --auto-tune --rate-limit 3    # Plus a run tuned by UploadScheduler
+    python benchmarks/bench_ftp_upload.py --host 192.168.1.20 --port 2221 --user u --password p
+
+Per-connection throttling stands in for a phone on Wi-Fi, where a single
+transfer can't fill the link. pyftpdlib only throttles a transfer once it has
+sent --limit bytes, so keep --size above --limit.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from ftplib import FTP
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from ftp_pool import FTPPool, UploadJob
+from upload_scheduler import UploadScheduler
+from progress import format_size
+
+
+def start_local_server(root, limit):
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler, ThrottledDTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("user", "pass", root, perm="elradfmw")
+    handler = type("Handler", (FTPHandler,), {"authorizer": authorizer})
+    if limit:
+        handler.dtp_handler = type("DTP", (ThrottledDTPHandler,), {"read_limit": limit})
+    server = ThreadedFTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, kwargs={"timeout": 0.1}, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=24, help="Files per run")
+    parser.add_argument("--size", type=float, default=4, help="Size of each file in MB")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8], help="Pool sizes to compare")
+    parser.add_argument("--limit", type=float, default=1, help="Local server: MB/s per connection, 0 = unthrottled")
+    parser.add_argument("--auto-tune", action="store_true", help="Also run with UploadScheduler picking the sessions")
+    parser.add_argument("--rate-limit", type=float, default=0, help="UploadScheduler rate limit in MB/s, 0 = none")
+    parser.add_argument("--host", help="Upload to this FTP server instead of a local one")
+    parser.add_argument("--port", type=int, default=21)
+    parser.add_argument("--user", default="user")
+    parser.add_argument("--password", default="pass")
+    parser.add_argument("--remote", default="/", help="Remote folder to upload into")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        local = os.path.join(folder, "local")
+        os.makedirs(local)
+        host, port = args.host, args.port
+        if not host:
+            os.makedirs(os.path.join(folder, "remote"))
+            server = start_local_server(os.path.join(folder, "remote"), int(args.limit * 1024 * 1024))
+            host, port = server.address
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(local, f"IMG_{i:04d}.JPG")
+            with open(path, "wb") as f:
+                f.write(os.urandom(int(args.size * 1024 * 1024)))
+            paths.append(path)
+
+        def connect():
+            ftp = FTP()
+            ftp.connect(host, port, timeout=30)
+            ftp.login(args.user, args.password)
+            return ftp
+
+        total = sum(os.path.getsize(path) for path in paths)
+        print(f"Uploading {args.files} files ({format_size(total)}) to {host}:{port}")
+        results = []
+        runs = [(sessions, None) for sessions in args.sessions]
+        if args.auto_tune:
+            runs.append(("auto", UploadScheduler("fifo", rate_limit=int(args.rate_limit * 1024 * 1024), sessions=1,
+                                                   auto_tune=True)))
+        for sessions, scheduler in runs:
+            remote = args.remote.rstrip("/")
+            jobs = [UploadJob(path, f"{remote}/s{sessions}_{os.path.basename(path)}") for path in paths]
+            pool = FTPPool(connect, sessions, scheduler=scheduler) if scheduler else FTPPool(connect, sessions)
+            start = time.perf_counter()
+            with open(os.devnull, "w") as quiet:  # Keep the per-file lines out of the results
+                stdout, sys.stdout = sys.stdout, quiet
+                try:
+                    uploaded, failed = pool.run(jobs)
+                finally:
+                    sys.stdout = stdout
+            elapsed = time.perf_counter() - start
+            results.append((sessions, elapsed))
+            tuned = f" (tuned {' -> '.join(str(h[3]) for h in scheduler.tuner.history)})" if scheduler else ""
+            print(f"{sessions:>4} sessions: {format_size(total / elapsed)}/s, {elapsed:.1f}s"
+                  + (f", {failed} failed" if failed else "") + tuned)
+        base = results[0][1]
+        print("Speedup: " + ", ".join(f"{s} sessions x{base / t:.1f}" for s, t in results))
+
+
+if __name__ == "__main__":
+    main()
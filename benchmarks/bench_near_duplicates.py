@@ -0,0 +1,83 @@
+"""Measure the near-duplicate finder: thumbnail decoding with and without JPEG draft mode, and clustering.
+
+    python benchmarks/bench_near_duplicates.py                      # 200 synthetic JPEGs, 500k hashes
+    python benchmarks/bench_near_duplicates.py --library D:\\organized
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import numpy as np
+from PIL import Image
+import near_duplicates
+from near_duplicates import decode_thumbnails, cluster_hashes, PHASH_SIZE, HASH_SIZE, HASHABLE_EXTENSIONS
+
+
+def make_synthetic_library(folder, count):
+    """count camera-sized JPEGs with gradients so they compress like photos."""
+    x = np.linspace(0, 255, 4000, dtype=np.float32)
+    y = np.linspace(0, 255, 3000, dtype=np.float32)[:, None]
+    for i in range(count):
+        pixels = np.stack([(x + i) % 256 + 0 * y, (y + 2 * i) % 256 + 0 * x, (x + y) / 2], axis=2)
+        Image.fromarray(pixels.astype(np.uint8)).save(os.path.join(folder, f"IMG_{i:04d}.JPG"), quality=90)
+
+
+def decode_without_draft(path):
+    with Image.open(path) as img:
+        small = img.convert("L").resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR)
+        return np.asarray(small), np.asarray(small.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR))
+
+
+def bench_decode(label, func, paths):
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>14}: {len(paths) / elapsed:8.1f} images/s per core")
+    return elapsed
+
+
+def synthetic_hashes(count, bursts, rng):
+    """Random 64-bit hashes with bursts of 5 frames each a few bits apart."""
+    hashes = rng.integers(0, 2 ** 63, size=count, dtype=np.uint64) * np.uint64(2)
+    for frame in range(1, 5):
+        flips = rng.integers(0, 64, size=(bursts, 3)).astype(np.uint64)
+        masks = np.bitwise_or.reduce(np.uint64(1) << flips, axis=1)
+        hashes[frame * bursts:(frame + 1) * bursts] = hashes[:bursts] ^ masks
+    return hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200, help="Synthetic 12MP JPEGs to decode")
+    parser.add_argument("--hashes", type=int, default=500000, help="Synthetic hashes to cluster")
+    parser.add_argument("--library", help="Decode the images in this folder instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = args.library
+        if not folder:
+            folder = tmpdir
+            make_synthetic_library(folder, args.files)
+        paths = [os.path.join(root, f) for root, _, files in os.walk(folder) for f in files
+                 if f.lower().endswith(HASHABLE_EXTENSIONS)]
+        before = bench_decode("full decode", decode_without_draft, paths)
+        after = bench_decode("draft decode", decode_thumbnails, paths)
+        print(f"speedup: {before / after:.1f}x, "
+              f"{args.hashes * after / len(paths) / (near_duplicates.HASH_WORKERS * 60):.1f} min for "
+              f"{args.hashes} images on {near_duplicates.HASH_WORKERS} cores")
+
+    hashes = synthetic_hashes(args.hashes, args.hashes // 25, np.random.default_rng(0))
+    start = time.perf_counter()
+    clusters = cluster_hashes(hashes)
+    elapsed = time.perf_counter() - start
+    print(f"clustering: {len(hashes)} hashes in {elapsed:.1f}s, {len(clusters)} clusters "
+          f"({sum(len(c) for c in clusters)} images)")
+
+
+if __name__ == "__main__":
+    main()
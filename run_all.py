@@ -1,6 +1,7 @@
 import subprocess
 import sys
 import os
+import argparse
 
 # Optional: Activate the venv if not already activated
 # Usually handled by Cmder/batch, but we can enforce it for safety.
@@ -16,18 +17,31 @@ scripts = [
     "src/ftp_dir_upload.py"
 ]
 
-def run_script(script_path):
+# Extra command line arguments per script, e.g. the card folders for picchronicle.py
+def script_args(script_path, args):
+    if script_path == "src/picchronicle.py":
+        return [arg for source in args.sources for arg in ("--source", source)]
+    return []
+
+def run_script(script_path, extra_args=()):
     print(f"\n��� Running {script_path} ...")
     try:
-        subprocess.run([VENV_PYTHON, script_path], check=True)
+        subprocess.run([VENV_PYTHON, script_path, *extra_args], check=True)
         print(f"✅ Completed {script_path}")
     except subprocess.CalledProcessError as e:
         print(f"❌ Error running {script_path} (exit code {e.returncode})")
         sys.exit(e.returncode)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the PicChronicle pipeline.")
+    parser.add_argument("--source", action="append", dest="sources", default=[], metavar="DIR",
+                        help="Card folder to organize, repeatable (passed to picchronicle.py)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     for script in scripts:
-        run_script(script)
+        run_script(script, script_args(script, args))
     print("\n��� All scripts completed successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,229 @@
+import os
+import json
+import numbers
+import argparse
+import tempfile
+from fractions import Fraction
+from collections import defaultdict
+
+JOURNAL_NAME = "catalog.jsonl"
+LEGACY_METADATA_NAME = "metadata.json"
+COMPACT_MIN_RECORDS = 1000  # Never compact tiny journals
+COMPACT_RATIO = 2.0  # Compact once the journal holds twice as many records as live entries
+
+
+def _json_default(value):
+    if isinstance(value, bytes):
+        return value.decode(errors="ignore")
+    if isinstance(value, (Fraction, numbers.Rational)):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dump(record):
+    return json.dumps(record, default=_json_default, ensure_ascii=False)
+
+
+class Catalog:
+    """Append-only catalog of organized files, replacing the monolithic metadata.json.
+
+    Every change is one JSON line appended to ``catalog.jsonl``: ``{"op": "put",
+    "entry": {...}}`` or ``{"op": "delete", "filepath": ...}``. The journal is
+    replayed into memory on open and indexed by filepath, content hash, capture
+    date and file type. Superseded records are dropped by ``compact()``, which
+    runs automatically once they outnumber the live entries.
+
+    If there is no journal yet but a legacy metadata.json exists, its entries are
+    loaded read-only; the journal is only written on the first change.
+    """
+
+    def __init__(self, folder, journal_name=JOURNAL_NAME):
+        self.folder = folder
+        self.journal_path = os.path.join(folder, journal_name)
+        self.legacy_path = os.path.join(folder, LEGACY_METADATA_NAME)
+        self.entries = {}
+        self.by_hash = defaultdict(dict)
+        self.by_date = defaultdict(dict)
+        self.by_type = defaultdict(dict)
+        self.records = 0
+        self.needs_import = False
+        self.journal = None
+        self.load()
+
+    # --- loading ---
+    def load(self):
+        if os.path.exists(self.journal_path):
+            self._replay_journal()
+        elif os.path.exists(self.legacy_path):
+            self._load_legacy()
+
+    def _replay_journal(self):
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append leaves at most one partial line behind.
+                    print(f"Warning: Skipping corrupt catalog record at line {line_number}.")
+                    continue
+                self.records += 1
+                if record.get("op") == "put":
+                    self._index(record["entry"])
+                elif record.get("op") == "delete":
+                    self._unindex(record["filepath"])
+
+    def _load_legacy(self):
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        except json.JSONDecodeError:
+            print("Warning: Corrupt metadata.json file. Creating a new one.")
+            return
+        for entry in metadata.get("files", []):
+            self._index(entry)
+        self.needs_import = bool(self.entries)
+
+    # --- indexes ---
+    def _index(self, entry):
+        filepath = os.path.abspath(entry["filepath"])
+        self._unindex(filepath)
+        self.entries[filepath] = entry
+        if entry.get("content_hash"):
+            self.by_hash[entry["content_hash"]][filepath] = None
+        if entry.get("creation_date"):
+            self.by_date[entry["creation_date"][:10]][filepath] = None
+        if entry.get("file_type"):
+            self.by_type[entry["file_type"]][filepath] = None
+
+    def _unindex(self, filepath):
+        entry = self.entries.pop(filepath, None)
+        if entry is None:
+            return
+        for index, key in ((self.by_hash, entry.get("content_hash")),
+                           (self.by_date, (entry.get("creation_date") or "")[:10]),
+                           (self.by_type, entry.get("file_type"))):
+            if key in index:
+                index[key].pop(filepath, None)
+                if not index[key]:
+                    del index[key]
+
+    # --- queries ---
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(list(self.entries.values()))
+
+    def __contains__(self, filepath):
+        return os.path.abspath(filepath) in self.entries
+
+    def get(self, filepath):
+        return self.entries.get(os.path.abspath(filepath))
+
+    def filepaths(self):
+        return set(self.entries)
+
+    def find_by_hash(self, content_hash):
+        return [self.entries[p] for p in self.by_hash.get(content_hash, ())]
+
+    def find_by_date(self, date):
+        """Entries captured on date ('YYYY-MM-DD' or a date/datetime)."""
+        key = date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+        return [self.entries[p] for p in self.by_date.get(key, ())]
+
+    def find_by_type(self, *file_types):
+        return [self.entries[p] for file_type in file_types for p in self.by_type.get(file_type, ())]
+
+    # --- changes ---
+    def _append(self, record):
+        if self.needs_import:
+            # First change after loading a legacy metadata.json: persist it as the journal.
+            self.needs_import = False
+            self.compact()
+        if self.journal is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self.journal = open(self.journal_path, "a", encoding="utf-8")
+        self.journal.write(_dump(record) + "\n")
+        self.journal.flush()
+        self.records += 1
+
+    def add(self, entry):
+        """Insert or replace the entry for entry["filepath"]."""
+        self._append({"op": "put", "entry": entry})
+        self._index(entry)
+
+    def update(self, filepath, **fields):
+        entry = dict(self.get(filepath) or {"filepath": filepath}, **fields)
+        self.add(entry)
+        return entry
+
+    def remove(self, filepath):
+        filepath = os.path.abspath(filepath)
+        if filepath in self.entries:
+            self._append({"op": "delete", "filepath": filepath})
+            self._unindex(filepath)
+
+    def compact(self):
+        """Rewrite the journal with one put per live entry."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        os.makedirs(self.folder, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8", dir=self.folder) as tmpfile:
+            for entry in self.entries.values():
+                tmpfile.write(_dump({"op": "put", "entry": entry}) + "\n")
+            temp_path = tmpfile.name
+        os.replace(temp_path, self.journal_path)
+        self.records = len(self.entries)
+
+    def maybe_compact(self):
+        if self.records >= COMPACT_MIN_RECORDS and self.records > COMPACT_RATIO * max(len(self.entries), 1):
+            self.compact()
+            return True
+        return False
+
+    def close(self):
+        self.maybe_compact()
+        if self.journal is not None:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.journal.close()
+            self.journal = None
+
+    # --- legacy export ---
+    def export_legacy(self, path=None):
+        """Write the catalog as the legacy {"files": [...]} metadata.json."""
+        path = path or self.legacy_path
+        with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8",
+                                         dir=os.path.dirname(os.path.abspath(path))) as tmpfile:
+            json.dump({"files": list(self.entries.values())}, tmpfile, indent=4, default=_json_default)
+            temp_path = tmpfile.name
+        os.replace(temp_path, path)
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the PicChronicle catalog journal.")
+    parser.add_argument("command", choices=["export", "compact", "stats"])
+    parser.add_argument("folder", help="Organized folder holding catalog.jsonl")
+    parser.add_argument("--output", help="Where to write metadata.json (export only)")
+    args = parser.parse_args()
+
+    catalog = Catalog(args.folder)
+    if args.command == "export":
+        print(f"Exported {len(catalog)} entries to {catalog.export_legacy(args.output)}")
+    elif args.command == "compact":
+        before = catalog.records
+        catalog.compact()
+        print(f"Compacted {before} records into {catalog.records}")
+    else:
+        print(f"{len(catalog)} entries, {catalog.records} journal records")
+        for file_type, paths in sorted(catalog.by_type.items()):
+            print(f"  {file_type}: {len(paths)}")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import uuid
+import base64
+import hashlib
+import tempfile
+import threading
+
+from file_hashing import new_hasher, DEFAULT_ALGORITHM
+
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # Bytes per PATCH; the last chunk may be shorter
+STREAM_BUFFER_SIZE = 1024 * 1024  # Bytes read from the request body at a time
+SESSION_TTL = 24 * 3600  # Seconds without activity before an unfinished upload is removed
+GC_INTERVAL = 3600  # Seconds between sweeps for abandoned uploads while the server runs
+MAX_UPLOAD_BYTES = 64 * 1024 ** 3  # Largest file a session can be started for (its .part is preallocated)
+SESSIONS_FOLDER_NAME = ".uploads"  # Inside the upload folder: <id>.json sidecars and <id>.part data
+CHECKSUM_ALGORITHMS = {"sha256": hashlib.sha256, "sha1": hashlib.sha1, "md5": hashlib.md5}
+
+
+class UploadError(Exception):
+    """A chunked upload request that can't be honoured; status is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_checksum(header):
+    """tus-style "Upload-Checksum: <algorithm> <base64 digest>" -> (hasher factory, digest bytes)."""
+    try:
+        name, encoded = header.split(" ", 1)
+        return CHECKSUM_ALGORITHMS[name.lower()], base64.b64decode(encoded.strip(), validate=True)
+    except (ValueError, KeyError):
+        raise UploadError(f"Unsupported Upload-Checksum {header!r}, expected '<sha256|sha1|md5> <base64>'")
+
+
+class UploadSession:
+    """One resumable upload: a sidecar JSON of its state plus the .part file the chunks land in.
+
+    Chunks are written at their own offset, so they may arrive in any order
+    and in parallel. The content hash is computed over the contiguous prefix
+    as it grows, so finishing an upload doesn't read the whole file back.
+    """
+
+    def __init__(self, folder, state):
+        self.folder = folder
+        self.state = state
+        self.lock = threading.Lock()
+        self.received = set(state["received"])
+        self.hasher = new_hasher(state["algorithm"])
+        self.hashed_offset = 0  # Running hashes can't be persisted, a reloaded session rehashes its prefix
+
+    @property
+    def id(self):
+        return self.state["id"]
+
+    @property
+    def part_path(self):
+        return os.path.join(self.folder, f"{self.id}.part")
+
+    @property
+    def sidecar_path(self):
+        return os.path.join(self.folder, f"{self.id}.json")
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.state["size"] // self.state["chunk_size"]))
+
+    def chunk_length(self, index):
+        return min(self.state["chunk_size"], self.state["size"] - index * self.state["chunk_size"])
+
+    @property
+    def offset(self):
+        """Bytes received without a gap from the start of the file (the tus Upload-Offset)."""
+        index = 0
+        while index in self.received:
+            index += 1
+        return min(index * self.state["chunk_size"], self.state["size"])
+
+    @property
+    def complete(self):
+        return len(self.received) == self.chunk_count
+
+    def save(self):
+        self.state["received"] = sorted(self.received)
+        self.state["updated_at"] = time.time()
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=self.folder, suffix=".tmp", encoding="utf-8") as tmpfile:
+            json.dump(self.state, tmpfile)
+        os.replace(tmpfile.name, self.sidecar_path)
+
+    def _advance_hash(self):
+        """Feed newly contiguous bytes to the running hash (still in the page cache, just written)."""
+        end = self.offset
+        if self.hashed_offset >= end:
+            return
+        with open(self.part_path, "rb") as f:
+            f.seek(self.hashed_offset)
+            while self.hashed_offset < end:
+                data = f.read(min(STREAM_BUFFER_SIZE, end - self.hashed_offset))
+                if not data:
+                    raise UploadError(f"Upload {self.id} data is shorter than recorded", 409)
+                self.hasher.update(data)
+                self.hashed_offset += len(data)
+
+    def write_chunk(self, offset, stream, checksum=None):
+        """Stream one chunk from a file-like body to its offset, verifying its length and checksum.
+
+        Returns the new contiguous offset.
+        """
+        chunk_size = self.state["chunk_size"]
+        if offset % chunk_size or not 0 <= offset < max(self.state["size"], 1):
+            raise UploadError(f"Upload-Offset must be a multiple of {chunk_size} below {self.state['size']}", 409)
+        index = offset // chunk_size
+        expected = self.chunk_length(index)
+        verifier = None
+        if checksum:
+            factory, digest = parse_checksum(checksum)
+            verifier = factory()
+
+        written = 0
+        if index in self.received:
+            # A retry of a chunk we already have (its response got lost): don't touch the verified bytes.
+            while stream.read(STREAM_BUFFER_SIZE):
+                pass
+            return self.offset
+        # Each request has its own handle, so parallel chunks never share a file position.
+        with open(self.part_path, "r+b") as f:
+            f.seek(offset)
+            while True:
+                data = stream.read(min(STREAM_BUFFER_SIZE, expected - written + 1))
+                if not data:
+                    break
+                if written + len(data) > expected:
+                    raise UploadError(f"Chunk at {offset} is longer than {expected} bytes", 413)
+                if verifier:
+                    verifier.update(data)
+                f.write(data)
+                written += len(data)
+        if written != expected:
+            raise UploadError(f"Chunk at {offset} has {written} of {expected} bytes, send it again", 400)
+        if verifier and verifier.digest() != digest:
+            raise UploadError(f"Checksum mismatch for the chunk at {offset}, send it again", 460)
+
+        with self.lock:
+            self.received.add(index)
+            self._advance_hash()
+            self.save()
+            return self.offset
+
+    def finish(self, destination):
+        """Verify the content hash and move the file to destination. Returns the hex digest."""
+        with self.lock:
+            if not self.complete:
+                missing = sorted(set(range(self.chunk_count)) - self.received)
+                raise UploadError(f"Upload {self.id} is missing {len(missing)} chunks, from offset "
+                                  f"{missing[0] * self.state['chunk_size']}", 409)
+            self._advance_hash()
+            digest = self.hasher.hexdigest()
+            if self.state.get("hash") and self.state["hash"].lower() != digest:
+                raise UploadError(f"Upload {self.id} hashes to {digest}, not {self.state['hash']}", 422)
+            os.replace(self.part_path, destination)
+            os.remove(self.sidecar_path)
+            return digest
+
+    def remove(self):
+        for path in (self.part_path, self.sidecar_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class UploadSessions:
+    """All unfinished uploads of one upload folder, reloaded from their sidecars on startup."""
+
+    def __init__(self, upload_folder, chunk_size=UPLOAD_CHUNK_SIZE, ttl=SESSION_TTL, algorithm=DEFAULT_ALGORITHM,
+                 max_size=MAX_UPLOAD_BYTES):
+        self.folder = os.path.join(upload_folder, SESSIONS_FOLDER_NAME)
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.algorithm = algorithm
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.stopped = threading.Event()
+        self.collector = None
+        os.makedirs(self.folder, exist_ok=True)
+        self.load()
+
+    def load(self):
+        for name in os.listdir(self.folder):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.folder, name), "r", encoding="utf-8") as f:
+                    session = UploadSession(self.folder, json.load(f))
+            except (json.JSONDecodeError, KeyError, ValueError, OSError):
+                print(f"Warning: Unreadable upload session {name}. Ignoring it.")
+                continue
+            if os.path.exists(session.part_path):
+                self.sessions[session.id] = session
+
+    def create(self, filename, size, content_hash=None):
+        """Start an upload of size bytes; content_hash (in self.algorithm) is checked when it finishes."""
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise UploadError("size must be a non-negative integer")
+        if self.max_size is not None and size > self.max_size:
+            raise UploadError(f"size {size} is over the {self.max_size} byte upload limit", 413)
+        self.collect_garbage()
+        state = {"id": uuid.uuid4().hex, "filename": filename, "size": size, "chunk_size": self.chunk_size,
+                 "algorithm": self.algorithm, "hash": content_hash, "received": [], "created_at": time.time()}
+        session = UploadSession(self.folder, state)
+        with open(session.part_path, "wb") as f:
+            f.truncate(size)  # Sparse where supported; chunks fill it in any order
+        if size == 0:
+            session.received.add(0)
+        session.save()
+        with self.lock:
+            self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise UploadError(f"No upload {session_id}", 404)
+        return session
+
+    def finish(self, session_id, destination):
+        session = self.get(session_id)
+        digest = session.finish(destination)
+        with self.lock:
+            self.sessions.pop(session_id, None)
+        return digest
+
+    def cancel(self, session_id):
+        session = self.get(session_id)
+        with self.lock:
+            self.sessions.pop(session_id, None)
+        session.remove()
+
+    def collect_garbage(self, now=None):
+        """Remove uploads without activity for longer than the TTL. Returns how many were removed."""
+        cutoff = (now or time.time()) - self.ttl
+        with self.lock:
+            stale = [s for s in self.sessions.values() if s.state.get("updated_at", s.state["created_at"]) < cutoff]
+            for session in stale:
+                del self.sessions[session.id]
+        for session in stale:
+            session.remove()
+        # Leftovers without a readable sidecar (crash between writes) go too, once they are old enough.
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            stem = name.split(".", 1)[0]
+            if stem not in self.sessions and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        return len(stale)
+
+    def start_collector(self, interval=GC_INTERVAL):
+        """Collect abandoned uploads now and then every interval seconds on a daemon thread, until close()."""
+        self.collector = threading.Thread(target=self._collect_periodically, args=(interval,), daemon=True)
+        self.collector.start()
+
+    def _collect_periodically(self, interval):
+        while True:
+            try:
+                self.collect_garbage()
+            except OSError as e:
+                print(f"Warning: Could not remove abandoned uploads: {e}")
+            if self.stopped.wait(interval):
+                return
+
+    def close(self):
+        self.stopped.set()
+        if self.collector is not None:
+            self.collector.join()
+            self.collector = None
@@ -0,0 +1,114 @@
+"""Async (ASGI) serving mode for cloud_server.
+
+    uvicorn cloud_asgi:app --app-dir src --host 0.0.0.0 --port 5000
+
+Downloads are served natively: a slow phone holds an open socket, not a thread.
+Every other route goes to the Flask app through asgiref's WSGI adapter.
+uvicorn doesn't offer the zero-copy extension, so downloads are streamed in
+DOWNLOAD_CHUNK_SIZE reads there; a server that does gets the file to sendfile().
+"""
+import os
+import asyncio
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import safe_join
+from werkzeug.datastructures import Headers
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # Only needed for the non-download routes
+    WsgiToAsgi = None
+
+from downloads import plan_download, DOWNLOAD_CHUNK_SIZE
+
+DOWNLOAD_PREFIX = "/download/"
+READ_WORKERS = 8  # Threads doing blocking disk reads for all downloads together
+ZERO_COPY_EXTENSION = "http.response.zerocopysend"  # ASGI extension: the server sendfile()s an fd
+
+
+class CloudASGI:
+    """ASGI app: GET/HEAD /download/<filename> handled here, the rest by the Flask app."""
+
+    def __init__(self, flask_app):
+        self.upload_folder = flask_app.config["UPLOAD_FOLDER"]
+        self.flask = WsgiToAsgi(flask_app) if WsgiToAsgi else None
+        self.reads = ThreadPoolExecutor(max_workers=READ_WORKERS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if (scope["type"] == "http" and scope["method"] in ("GET", "HEAD")
+                and scope["path"].startswith(DOWNLOAD_PREFIX)):
+            return await self.download(scope, send)
+        if self.flask is None:
+            return await self.respond(send, 501, b"Install asgiref to serve this route in ASGI mode")
+        return await self.flask(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.reads.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def respond(send, status, body, headers=()):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())] + list(headers)})
+        await send({"type": "http.response.body", "body": body})
+
+    async def download(self, scope, send):
+        filename = scope["path"][len(DOWNLOAD_PREFIX):]  # ASGI servers percent-decode the path already
+        # One plain name, like Flask's <filename>: "x/../.uploads/..." must not reach the hidden files
+        if not filename or filename != os.path.basename(filename) or filename.startswith("."):
+            return await self.respond(send, 404, b"File not found")
+        path = safe_join(self.upload_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return await self.respond(send, 404, b"File not found")
+        headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]])
+        inline = bool(parse_qs(scope.get("query_string", b"").decode()).get("inline"))
+        try:
+            plan = plan_download(path, headers, as_attachment=not inline)
+            f = open(path, "rb")
+        except OSError:
+            return await self.respond(send, 404, b"File not found")
+
+        with f:
+            await send({"type": "http.response.start", "status": plan.status,
+                        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1"))
+                                    for k, v in plan.headers.items()]})
+            if scope["method"] == "HEAD" or not plan.length:
+                return await send({"type": "http.response.body", "body": b""})
+            if ZERO_COPY_EXTENSION in scope.get("extensions", {}):
+                # The server copies straight from the page cache to the socket
+                return await send({"type": ZERO_COPY_EXTENSION, "file": f,
+                                   "offset": plan.offset, "count": plan.length})
+            await self.stream(f, plan, send)
+
+    async def stream(self, f, plan, send):
+        loop = asyncio.get_running_loop()
+        f.seek(plan.offset)
+        remaining = plan.length
+        while remaining:
+            data = await loop.run_in_executor(self.reads, f.read, min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not data:  # Truncated while sending; the client sees a short body
+                break
+            remaining -= len(data)
+            # Awaiting send applies the server's backpressure: a slow client just waits here
+            await send({"type": "http.response.body", "body": data, "more_body": bool(remaining)})
+        if remaining:
+            await send({"type": "http.response.body", "body": b""})
+
+
+def __getattr__(name):
+    # Built on first use, so importing this module doesn't start cloud_server (it sets up its folders)
+    if name == "app":
+        import cloud_server
+        globals()["app"] = CloudASGI(cloud_server.app)
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
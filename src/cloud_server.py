@@ -1,11 +1,33 @@
-from flask import Flask, request, send_from_directory, jsonify
+from flask import Flask, request, send_file, jsonify
+from werkzeug.utils import safe_join
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import os
 
+from previews import PreviewStore, PREVIEW_SIZES, default_cache_folder, is_previewable
+from chunked_upload import UploadSessions, UploadError
+from content_index import ContentIndexes, IndexNotReady, MAX_QUERY_FILES, INDEX_RETRY_AFTER
+from file_listing import FileListing, TYPE_EXTENSIONS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, entry_json
+from downloads import file_etag, DOWNLOAD_MAX_AGE
+
 UPLOAD_FOLDER = r"C:\Users\shravan\Documents\Python_Scripts\PicChronicle\data\unorganized\CloudStorage"  # Change this to your 2TB hard drive path
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Behind nginx/Apache, let the proxy send files from disk (X-Sendfile / X-Accel-Redirect via the proxy config)
+USE_X_SENDFILE = False
+PREVIEW_FOLDER = default_cache_folder(UPLOAD_FOLDER)  # Thumbnails/previews keyed by content hash, LRU-bounded
+PREVIEW_MAX_AGE = 24 * 3600  # Browser cache lifetime of /preview responses addressed by file name
+PREVIEW_IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # ...and of responses addressed by content hash (?v=<hash>)
 
 app = Flask(__name__)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+app.config["USE_X_SENDFILE"] = USE_X_SENDFILE
+previews = PreviewStore(PREVIEW_FOLDER)
+preview_pool = ThreadPoolExecutor(max_workers=2)  # Renders previews of new uploads off the request thread
+uploads = UploadSessions(UPLOAD_FOLDER)  # Resumable chunked uploads, see /uploads below
+uploads.start_collector()  # Removes uploads abandoned for SESSION_TTL, at startup and every GC_INTERVAL
+index = ContentIndexes(UPLOAD_FOLDER)  # Content hashes of UPLOAD_FOLDER per algorithm, answers /missing
+listing = FileListing(UPLOAD_FOLDER)  # Sorted, paginated /files, rebuilt when the folder changes
+index.build()  # First scan of a big folder takes a while, /missing answers 503 until it is done
 
 # Route for uploading files
 @app.route("/upload", methods=["POST"])
@@ -15,19 +37,182 @@ def upload_file():
     file = request.files["file"]
     if file.filename == "":
         return jsonify({"error": "No selected file"}), 400
-    file.save(os.path.join(app.config["UPLOAD_FOLDER"], file.filename))
+    path = os.path.join(app.config["UPLOAD_FOLDER"], file.filename)
+    folder_mtime_ns = index.folder_mtime_ns()
+    file.save(path)
+    listing.invalidate()  # Overwriting a file in place doesn't change the folder mtime
+    index.add(path, folder_mtime_ns=folder_mtime_ns)
+    if is_previewable(path):
+        preview_pool.submit(render_upload_previews, path)
     return jsonify({"message": "File uploaded successfully!"}), 200
 
-# Route for listing files
+def render_upload_previews(path):
+    try:
+        previews.render_missing(path)
+    except Exception as e:
+        print(f"Preview generation failed for {path}: {e}")
+
+# Resumable chunked uploads (tus-style): create a session, PATCH chunks by offset, then finish.
+@app.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+def session_info(session):
+    return {"id": session.id, "filename": session.state["filename"], "size": session.state["size"],
+            "chunk_size": session.state["chunk_size"], "offset": session.offset,
+            "received": sorted(session.received), "url": f"/uploads/{session.id}"}
+
+# upload.html is opened from disk, so its fetch() calls are cross-origin
+@app.after_request
+def allow_upload_clients(response):
+    if request.path.startswith(("/uploads", "/missing")):
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PATCH, DELETE"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Upload-Offset, Upload-Checksum"
+        response.headers["Access-Control-Expose-Headers"] = "Location, Upload-Offset, Upload-Length"
+    return response
+
+@app.route("/uploads", methods=["POST"])
+def create_upload():
+    body = request.get_json(silent=True) or {}
+    filename = body.get("filename") or ""
+    if not filename or filename != os.path.basename(filename) or filename.startswith("."):
+        return jsonify({"error": "filename must be a plain file name"}), 400
+    session = uploads.create(filename, body.get("size"), body.get("hash"))
+    response = jsonify(session_info(session))
+    response.status_code = 201
+    response.headers["Location"] = f"/uploads/{session.id}"
+    response.headers["Upload-Offset"] = str(session.offset)
+    return response
+
+# GET (and HEAD) tell a resuming client which chunks the server already has
+@app.route("/uploads/<session_id>", methods=["GET"])
+def upload_status(session_id):
+    session = uploads.get(session_id)
+    response = jsonify(session_info(session))
+    response.headers["Upload-Offset"] = str(session.offset)
+    response.headers["Upload-Length"] = str(session.state["size"])
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@app.route("/uploads/<session_id>", methods=["PATCH"])
+def upload_chunk(session_id):
+    session = uploads.get(session_id)
+    offset = request.headers.get("Upload-Offset", "")
+    if not offset.isdigit():
+        return jsonify({"error": "Upload-Offset header required"}), 400
+    # The body is streamed to disk as it arrives, never held in memory
+    new_offset = session.write_chunk(int(offset), request.stream, request.headers.get("Upload-Checksum"))
+    return "", 204, {"Upload-Offset": str(new_offset)}
+
+@app.route("/uploads/<session_id>/finish", methods=["POST"])
+def finish_upload(session_id):
+    session = uploads.get(session_id)
+    path = os.path.join(app.config["UPLOAD_FOLDER"], session.state["filename"])
+    folder_mtime_ns = index.folder_mtime_ns()
+    content_hash = uploads.finish(session_id, path)
+    listing.invalidate()
+    index.add(path, content_hash, uploads.algorithm, folder_mtime_ns)
+    if is_previewable(path):
+        preview_pool.submit(render_upload_previews, path)
+    return jsonify({"message": "File uploaded successfully!", "hash": content_hash,
+                    "algorithm": uploads.algorithm}), 200
+
+@app.route("/uploads/<session_id>", methods=["DELETE"])
+def cancel_upload(session_id):
+    uploads.cancel(session_id)
+    return "", 204
+
+# Route for asking which files the server still needs, before sending any bytes
+@app.route("/missing", methods=["POST"])
+def missing_files():
+    body = request.get_json(silent=True) or {}
+    files = body.get("files")
+    if not isinstance(files, list) or not all(isinstance(f, dict) for f in files):
+        return jsonify({"error": "files must be a list of {name, size, hash} objects"}), 400
+    if len(files) > MAX_QUERY_FILES:
+        return jsonify({"error": f"At most {MAX_QUERY_FILES} files per request"}), 413
+    algorithm = body.get("algorithm", index.default)
+    try:
+        missing = index.missing(files, algorithm)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except IndexNotReady as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(INDEX_RETRY_AFTER)}
+    return jsonify({"missing": missing, "present": len(files) - len(missing), "algorithm": algorithm})
+
+# Route for listing files, a page at a time:
+# /files?limit=200&sort=name|newest|oldest&type=images,videos&since=2024-06-01&until=2024-06-30&cursor=...
 @app.route("/files", methods=["GET"])
 def list_files():
-    files = os.listdir(app.config["UPLOAD_FOLDER"])
-    return jsonify({"files": files})
+    args = request.args
+    try:
+        limit = min(int(args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        types = set(args["type"].split(",")) if args.get("type") else None
+        if types and not types <= set(TYPE_EXTENSIONS) | {"other"}:
+            raise ValueError(f"type must be among {', '.join(TYPE_EXTENSIONS)}, other")
+        since = datetime.fromisoformat(args["since"]) if args.get("since") else None
+        until = datetime.fromisoformat(args["until"]) if args.get("until") else None
+        if until and len(args["until"]) == 10:  # A bare date includes the whole day
+            until = until.replace(hour=23, minute=59, second=59, microsecond=999999)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-# Route for downloading files
+    # Polling clients get a 304 without the page being built while the folder is unchanged
+    etag = listing.etag(listing.refresh(), request.query_string.decode("utf-8"))
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        try:
+            entries, next_cursor = listing.page(args.get("sort", "name"), args.get("cursor"), limit, types, since, until)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        response = jsonify({"files": [entry_json(entry) for entry in entries], "next_cursor": next_cursor})
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # Always revalidate, it is cheap
+    return response
+
+# Route for downloading files. Range/If-Range (video scrubbing, resumed downloads) and
+# If-None-Match/If-Modified-Since are answered by send_file; ?inline=1 plays in the browser.
+# cloud_asgi.py serves the same route asynchronously.
 @app.route("/download/<filename>", methods=["GET"])
 def download_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename, as_attachment=True)
+    path = safe_join(app.config["UPLOAD_FOLDER"], filename)
+    if path is None or filename.startswith(".") or not os.path.isfile(path):
+        return jsonify({"error": "File not found"}), 404
+    path = os.path.abspath(path)  # send_file resolves relative paths against the app folder
+    st = os.stat(path)
+    return send_file(path, as_attachment=not request.args.get("inline"), etag=file_etag(st),
+                     last_modified=st.st_mtime, max_age=DOWNLOAD_MAX_AGE, conditional=True)
+
+# Route for thumbnails and medium-size previews
+@app.route("/preview/<size>/<filename>", methods=["GET"])
+def preview_file(size, filename):
+    if size not in PREVIEW_SIZES:
+        return jsonify({"error": f"Unknown preview size, expected one of {', '.join(PREVIEW_SIZES)}"}), 404
+    if filename != os.path.basename(filename) or filename.startswith("."):
+        return jsonify({"error": "File not found"}), 404  # Hidden files (indexes, .uploads) aren't served
+    path = safe_join(app.config["UPLOAD_FOLDER"], filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({"error": "File not found"}), 404
+    if not is_previewable(path):
+        return jsonify({"error": "No preview for this file type"}), 415
+    try:
+        preview_path, content_hash = previews.get_or_render(path, size)
+    except Exception as e:
+        return jsonify({"error": f"Cannot render preview: {e}"}), 500
+
+    # The ETag is the content hash, so revalidation is a 304 without touching the original.
+    response = send_file(preview_path, mimetype="image/jpeg", etag=f"{content_hash}-{size}",
+                         max_age=PREVIEW_MAX_AGE, conditional=True)
+    if request.args.get("v") == content_hash:
+        # The URL names the exact content, it can be cached forever.
+        response.cache_control.max_age = PREVIEW_IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    response.headers["X-Content-Hash"] = content_hash
+    return response
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
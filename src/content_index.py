@@ -0,0 +1,189 @@
+import os
+import threading
+from collections import defaultdict
+
+from file_hashing import cached_file_hash, DEFAULT_ALGORITHM
+from hash_manifest import HashManifest
+
+INDEX_DB_NAME = ".content_index.sqlite"  # Stat-keyed hashes of the folder's files, inside the folder
+MAX_QUERY_FILES = 10000  # Files per /missing request
+INDEX_ALGORITHMS = ("md5", "sha256")  # Hashes /missing accepts; sha256 is the one browsers can compute
+INDEX_RETRY_AFTER = 10  # Seconds a client is told to wait while an index is being built
+
+
+class IndexNotReady(Exception):
+    """The folder is still being hashed for the first time; ask again later."""
+
+
+def index_db_name(algorithm):
+    """.content_index.sqlite for the default algorithm, .content_index_<algorithm>.sqlite for others."""
+    return INDEX_DB_NAME if algorithm == DEFAULT_ALGORITHM else f".content_index_{algorithm}.sqlite"
+
+
+class ContentIndex:
+    """Which content a flat folder (the cloud server's UPLOAD_FOLDER) already holds.
+
+    Hashes are cached in a HashManifest keyed by each file's stat, so a refresh
+    only reads files that are new or changed. The folder is rescanned when its
+    mtime changes (a file was added, removed or renamed); files written by the
+    server itself are added directly with the hash computed while receiving them,
+    and only skip that rescan if nothing else changed the folder first.
+    """
+
+    def __init__(self, folder, algorithm=DEFAULT_ALGORITHM, db_path=None):
+        self.folder = folder
+        self.algorithm = algorithm
+        self.manifest = HashManifest(db_path or os.path.join(folder, index_db_name(algorithm)))
+        self.lock = threading.Lock()
+        self.scan_lock = threading.Lock()  # One rescan at a time, concurrent callers wait for it
+        self.by_name = {}  # name -> (size, hash)
+        self.by_hash = defaultdict(set)  # hash -> names
+        self.scanned_mtime_ns = None
+
+    def refresh(self):
+        """Rescan the folder if it changed since the last scan. Returns True if it rescanned."""
+        with self.scan_lock:
+            mtime_ns = os.stat(self.folder).st_mtime_ns
+            if mtime_ns == self.scanned_mtime_ns:
+                return False
+            self._scan(mtime_ns)
+            return True
+
+    def _scan(self, mtime_ns):
+        by_name = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    content_hash = cached_file_hash(entry.path, self.manifest, self.algorithm)
+                    by_name[entry.name] = (entry.stat().st_size, content_hash)
+                except OSError:  # Removed while scanning, the next refresh settles it
+                    continue
+        self.manifest.save()
+        self.manifest.prune(self.folder, {os.path.join(self.folder, name) for name in by_name})
+        by_hash = defaultdict(set)
+        for name, (_, content_hash) in by_name.items():
+            by_hash[content_hash].add(name)
+        with self.lock:
+            self.by_name, self.by_hash = by_name, by_hash
+            self.scanned_mtime_ns = mtime_ns
+
+    def folder_mtime_ns(self):
+        """The folder's mtime; take it before writing a file, to pass to add()."""
+        return os.stat(self.folder).st_mtime_ns
+
+    def add(self, path, content_hash=None, folder_mtime_ns=None):
+        """Record a file the server just wrote; content_hash (self.algorithm) saves reading it again.
+
+        folder_mtime_ns is folder_mtime_ns() from before the write. If it matches
+        the last scan, the folder's new mtime is only our own write and no
+        rescan is needed; otherwise the next refresh() still rescans.
+        """
+        st = os.stat(path)
+        if content_hash:
+            self.manifest.put(path, st, self.algorithm, content_hash)
+        else:
+            content_hash = cached_file_hash(path, self.manifest, self.algorithm)
+        self.manifest.save()
+        name = os.path.basename(path)
+        with self.lock:
+            old = self.by_name.get(name)
+            if old:
+                self.by_hash[old[1]].discard(name)
+            self.by_name[name] = (st.st_size, content_hash)
+            self.by_hash[content_hash].add(name)
+            if folder_mtime_ns is not None and folder_mtime_ns == self.scanned_mtime_ns:
+                self.scanned_mtime_ns = os.stat(self.folder).st_mtime_ns
+        return content_hash
+
+    def has(self, name=None, size=None, content_hash=None):
+        """True if the content is here: by hash under any name, else by name and size."""
+        with self.lock:
+            if content_hash:
+                return bool(self.by_hash.get(content_hash.lower()))
+            known = self.by_name.get(name)
+            return known is not None and known[0] == size
+
+    def missing(self, files):
+        """The subset of [{"name", "size", "hash"}] the folder doesn't hold yet, in the same order."""
+        self.refresh()
+        return [f for f in files if not self.has(f.get("name"), f.get("size"), f.get("hash"))]
+
+    def close(self):
+        self.manifest.close()
+
+
+class ContentIndexes:
+    """A ContentIndex of one folder per algorithm in INDEX_ALGORITHMS, each built when first asked for.
+
+    The first scan of an index hashes the whole folder, so it runs on a
+    background thread (started by build(), or by the first missing() call for
+    that algorithm), and missing() raises IndexNotReady until it is done.
+    """
+
+    def __init__(self, folder, default=DEFAULT_ALGORITHM):
+        self.folder = folder
+        self.default = default
+        self.lock = threading.Lock()
+        self.indexes = {}
+        self.builders = {}  # algorithm -> thread doing the first scan
+
+    def get(self, algorithm=None):
+        algorithm = str(algorithm or self.default).lower()
+        if algorithm not in INDEX_ALGORITHMS:
+            raise ValueError(f"Hashes must be one of {', '.join(INDEX_ALGORITHMS)}, not {algorithm}")
+        with self.lock:
+            if algorithm not in self.indexes:
+                self.indexes[algorithm] = ContentIndex(self.folder, algorithm)
+            return self.indexes[algorithm]
+
+    def build(self, algorithm=None):
+        """The index for algorithm, its first scan started in the background if it hasn't run yet."""
+        index = self.get(algorithm)
+        with self.lock:
+            if index.scanned_mtime_ns is None and index.algorithm not in self.builders:
+                thread = threading.Thread(target=self._build, args=(index,), daemon=True)
+                self.builders[index.algorithm] = thread
+                thread.start()
+        return index
+
+    def _build(self, index):
+        try:
+            index.refresh()
+        except OSError as e:  # Tried again on the next build()
+            print(f"Cannot index {self.folder} ({index.algorithm}): {e}")
+        finally:
+            with self.lock:
+                del self.builders[index.algorithm]
+
+    def folder_mtime_ns(self):
+        """The folder's mtime; take it before writing a file, to pass to add()."""
+        return os.stat(self.folder).st_mtime_ns
+
+    def add(self, path, content_hash=None, algorithm=None, folder_mtime_ns=None):
+        """Record a file the server just wrote in every open index; content_hash is in algorithm."""
+        algorithm = algorithm or self.default
+        with self.lock:
+            indexes = list(self.indexes.values())
+        for index in indexes:
+            index.add(path, content_hash if index.algorithm == algorithm else None, folder_mtime_ns)
+
+    def missing(self, files, algorithm=None):
+        """Like ContentIndex.missing; hashes are in algorithm, name and size use the default index.
+
+        Raises IndexNotReady while that index is still being built.
+        """
+        index = self.build(algorithm if any(f.get("hash") for f in files) else None)
+        if index.scanned_mtime_ns is None:
+            raise IndexNotReady(f"The {index.algorithm} index of the folder is still being built")
+        return index.missing(files)
+
+    def close(self):
+        with self.lock:
+            builders = list(self.builders.values())
+        for thread in builders:
+            thread.join()
+        with self.lock:
+            for index in self.indexes.values():
+                index.close()
@@ -1,73 +1,85 @@
 import os
-import shutil
-import json
+import argparse
 from datetime import datetime
 
+from catalog import Catalog
+from transfer import TransferEngine, TRANSFER_WORKERS, EXPORT_MODES
+from file_hashing import DEFAULT_ALGORITHM
+
 # Configure paths
 SOURCE_FOLDER = r'D:\DCIM\100CANON\organized'  # Your organized directory
 DESTINATION_FOLDER = r'C:\Users\shravan\Documents\Personal\Photos'     # Change this to your desired destination
-METADATA_FILE = os.path.join(SOURCE_FOLDER, "metadata.json")
+DUPLICATES_FOLDER = os.path.join(SOURCE_FOLDER, "duplicates")  # picchronicle.QUARANTINE_FOLDER
 
 # File extensions to include
 SUPPORTED_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.bmp')
 SUPPORTED_VIDEO_EXTENSIONS = ('.mp4', '.mov')
 
+# How files are placed in DESTINATION_FOLDER, override with --mode:
+#   copy     - always a full copy
+#   reflink  - copy-on-write clone when both folders are on one btrfs/XFS volume, else copy
+#   hardlink - hardlink on the same volume (no extra space, but shares edits), else copy
+#   auto     - reflink, then hardlink, then copy
+EXPORT_MODE = "reflink"
+# Per-file record of how each file was exported, kept with the library so it is never uploaded
+EXPORT_LOG_FILE = os.path.join(SOURCE_FOLDER, ".export_log.jsonl")
+# Hash copies while writing them and check them against the catalog's content_hash (--verify).
+# Copies then go through userspace instead of copy_file_range; reflinks and hardlinks are unaffected.
+VERIFY_COPIES = False
+HASH_ALGORITHM = DEFAULT_ALGORITHM  # Must match picchronicle.HASH_ALGORITHM to verify against the catalog
+
 def load_metadata():
-    """Load the existing metadata file if it exists"""
-    if os.path.exists(METADATA_FILE):
-        try:
-            with open(METADATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print("Warning: Corrupt metadata.json file. Will copy based on file structure.")
-    return None
+    """Open the catalog (catalog.jsonl, or a legacy metadata.json) if there is one"""
+    catalog = Catalog(SOURCE_FOLDER)
+    if not len(catalog):
+        print("Warning: No catalog entries found. Will copy based on file structure.")
+        return None
+    return catalog
 
-def copy_from_metadata(metadata):
-    """Copy files based on metadata entries"""
-    if not metadata or "files" not in metadata:
+def copy_from_metadata(catalog, workers=TRANSFER_WORKERS, mode=EXPORT_MODE, verify=VERIFY_COPIES):
+    """Copy files based on catalog entries"""
+    if not catalog:
         return False
 
-    copied_count = 0
-    skipped_count = 0
+    print(f"Starting copy process using the catalog...")
     
-    print(f"Starting copy process using metadata file...")
-    
-    for file_info in metadata["files"]:
-        if file_info.get("file_type") in ["IMAGES", "VIDEOS"]:  # Skip RAW files
-            source_path = file_info.get("filepath")
-            
-            if os.path.exists(source_path):
-                # Create relative path from SOURCE_FOLDER to maintain structure
-                rel_path = os.path.relpath(os.path.dirname(source_path), SOURCE_FOLDER)
-                dest_dir = os.path.join(DESTINATION_FOLDER, rel_path)
-                os.makedirs(dest_dir, exist_ok=True)
-                
-                dest_path = os.path.join(dest_dir, os.path.basename(source_path))
-                
-                # Skip if file already exists at destination
-                if os.path.exists(dest_path):
-                    print(f"Skipping existing file: {dest_path}")
-                    skipped_count += 1
-                    continue
-                
-                try:
-                    shutil.copy2(source_path, dest_path)  # copy2 preserves metadata
-                    copied_count += 1
-                    print(f"Copied: {source_path} -> {dest_path}")
-                except Exception as e:
-                    print(f"Error copying {source_path}: {e}")
+    jobs = []
+    unhashed = []
+    for file_info in catalog.find_by_type("IMAGES", "VIDEOS"):  # Skip RAW files
+        source_path = file_info.get("filepath")
+        if file_info.get("duplicate_of"):
+            continue  # Hardlink to another library file, which is copied instead
+        
+        if os.path.exists(source_path):
+            # Create relative path from SOURCE_FOLDER to maintain structure
+            rel_path = os.path.relpath(os.path.dirname(source_path), SOURCE_FOLDER)
+            dest_path = os.path.join(DESTINATION_FOLDER, rel_path, os.path.basename(source_path))
+            expected_hash = file_info.get("content_hash") if file_info.get("hash_algorithm") == HASH_ALGORITHM else None
+            if not expected_hash:
+                unhashed.append(source_path)
+            jobs.append((source_path, dest_path, expected_hash))
     
+    engine = TransferEngine(workers, mode=mode, log_path=EXPORT_LOG_FILE,
+                            hash_algorithm=HASH_ALGORITHM if verify else None)
+    copied_count, skipped_count, _ = engine.run(jobs)
+
+    # Entries organized before hashes were recorded keep the hash computed by this copy.
+    for source_path in unhashed:
+        if source_path in engine.hashes:
+            st = os.stat(source_path)
+            catalog.update(source_path, content_hash=engine.hashes[source_path], hash_algorithm=HASH_ALGORITHM,
+                           size=st.st_size, mtime_ns=st.st_mtime_ns)
     print(f"Metadata-based copy complete. Copied {copied_count} files, skipped {skipped_count} existing files.")
     return True
 
-def copy_by_directory_structure():
+def copy_by_directory_structure(workers=TRANSFER_WORKERS, mode=EXPORT_MODE):
     """Copy files by traversing directory structure"""
-    copied_count = 0
-    skipped_count = 0
-    
     print(f"Starting copy process by directory structure...")
     
+    jobs = []
     for root, dirs, files in os.walk(SOURCE_FOLDER):
+        # Skip files quarantined as duplicates by picchronicle
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DUPLICATES_FOLDER]
         # Skip raw directories
         if "raw" in os.path.basename(root).lower():
             continue
@@ -77,50 +89,46 @@ def copy_by_directory_structure():
             if file == "metadata.json" or not file.lower().endswith(SUPPORTED_IMAGE_EXTENSIONS + SUPPORTED_VIDEO_EXTENSIONS):
                 continue
                 
-            source_path = os.path.join(root, file)
-            
             # Create relative path from SOURCE_FOLDER to maintain structure
             rel_path = os.path.relpath(root, SOURCE_FOLDER)
-            dest_dir = os.path.join(DESTINATION_FOLDER, rel_path)
-            os.makedirs(dest_dir, exist_ok=True)
-            
-            dest_path = os.path.join(dest_dir, file)
-            
-            # Skip if file already exists at destination
-            if os.path.exists(dest_path):
-                print(f"Skipping existing file: {dest_path}")
-                skipped_count += 1
-                continue
-            
-            try:
-                shutil.copy2(source_path, dest_path)  # copy2 preserves metadata
-                copied_count += 1
-                print(f"Copied: {source_path} -> {dest_path}")
-            except Exception as e:
-                print(f"Error copying {source_path}: {e}")
+            jobs.append((os.path.join(root, file), os.path.join(DESTINATION_FOLDER, rel_path, file)))
     
+    copied_count, skipped_count, _ = TransferEngine(workers, mode=mode, log_path=EXPORT_LOG_FILE).run(jobs)
     print(f"Directory-based copy complete. Copied {copied_count} files, skipped {skipped_count} existing files.")
 
-def main():
+def main(workers=TRANSFER_WORKERS, mode=EXPORT_MODE, verify=VERIFY_COPIES):
     # Create destination folder if it doesn't exist
     os.makedirs(DESTINATION_FOLDER, exist_ok=True)
     
     print(f"Source folder: {SOURCE_FOLDER}")
     print(f"Destination folder: {DESTINATION_FOLDER}")
+    print(f"Export mode: {mode}")
     
     # Try to use metadata file first
     metadata = load_metadata()
     metadata_copy_success = False
     
     if metadata:
-        metadata_copy_success = copy_from_metadata(metadata)
+        metadata_copy_success = copy_from_metadata(metadata, workers, mode, verify)
+        metadata.close()
     
     # Fall back to directory structure if metadata approach fails
     if not metadata_copy_success:
         print("Using directory structure method...")
-        copy_by_directory_structure()
+        copy_by_directory_structure(workers, mode)
     
     print("Copy operation completed.")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Copy cloud-ready photos and videos out of the organized folder.")
+    parser.add_argument("--workers", type=int, default=TRANSFER_WORKERS,
+                        help=f"Files copied in parallel (default: {TRANSFER_WORKERS})")
+    parser.add_argument("--mode", choices=sorted(EXPORT_MODES), default=EXPORT_MODE,
+                        help=f"How to place files in the destination (default: {EXPORT_MODE})")
+    parser.add_argument("--verify", action=argparse.BooleanOptionalAction, default=VERIFY_COPIES,
+                        help="Hash copies against the catalog (slower: copies go through userspace)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(args.workers, args.mode, args.verify)
\ No newline at end of file
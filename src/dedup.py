@@ -0,0 +1,103 @@
+import os
+from collections import defaultdict
+
+from file_hashing import new_hasher, hash_file, DEFAULT_ALGORITHM
+
+PARTIAL_BLOCK_SIZE = 64 * 1024  # Bytes hashed from each end of a file by partial_hash
+DUPLICATE_POLICIES = ("skip", "link", "quarantine", "off")
+
+
+def partial_hash(path, size=None, algorithm=DEFAULT_ALGORITHM, block_size=PARTIAL_BLOCK_SIZE):
+    """Hash of the first and last block of a file (the whole file if it is small).
+
+    Identical files always match; different files of the same size almost never
+    do, since camera files differ in their headers or trailing data.
+    """
+    hasher = new_hasher(algorithm)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size if size is None else size
+        hasher.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(block_size, size - block_size))
+            hasher.update(f.read(block_size))
+    return hasher.hexdigest()
+
+
+class DuplicateIndex:
+    """Finds library files with the same content as a new file, reading as little as possible.
+
+    Candidates are narrowed by size (from the catalog, no I/O), then by a
+    partial hash, and only then confirmed with a full content hash. Catalog
+    entries organized before hashes were recorded get theirs backfilled.
+    """
+
+    def __init__(self, catalog, algorithm=DEFAULT_ALGORITHM):
+        self.catalog = catalog
+        self.algorithm = algorithm
+        self.by_size = defaultdict(list)
+        self.partials = {}
+        self.hashes = {}  # Full hashes find() computed for new files, see pop_hash()
+        self.stats = {"checked": 0, "same_size": 0, "same_partial": 0, "duplicates": 0}
+        for entry in catalog:
+            self.add(entry)
+
+    def add(self, entry):
+        """Make a newly organized file visible to later lookups in this run."""
+        if entry.get("skipped"):  # A duplicate left at its source is not a library file
+            return
+        size = entry.get("size")
+        if size is None:
+            try:
+                size = os.path.getsize(entry["filepath"])
+            except OSError:
+                return
+        self.by_size[size].append(entry["filepath"])
+
+    def _library_partial(self, filepath, size):
+        if filepath not in self.partials:
+            try:
+                self.partials[filepath] = partial_hash(filepath, size, self.algorithm)
+            except OSError:
+                self.partials[filepath] = None
+        return self.partials[filepath]
+
+    def _library_hash(self, filepath):
+        entry = self.catalog.get(filepath)
+        if entry.get("content_hash") and entry.get("hash_algorithm") == self.algorithm:
+            return entry["content_hash"]
+        content_hash = hash_file(filepath, self.algorithm)
+        self.catalog.update(filepath, content_hash=content_hash, hash_algorithm=self.algorithm)
+        return content_hash
+
+    def find(self, path):
+        """Catalog entry of a library file with the same content as path, or None."""
+        self.stats["checked"] += 1
+        size = os.path.getsize(path)
+        candidates = [p for p in self.by_size.get(size, ()) if p in self.catalog]
+        if not candidates:
+            return None
+        self.stats["same_size"] += 1
+
+        partial = partial_hash(path, size, self.algorithm)
+        candidates = [p for p in candidates if self._library_partial(p, size) == partial]
+        if not candidates:
+            return None
+        self.stats["same_partial"] += 1
+
+        content_hash = self.hashes[path] = hash_file(path, self.algorithm)
+        for filepath in candidates:
+            try:
+                if self._library_hash(filepath) == content_hash:
+                    self.stats["duplicates"] += 1
+                    return self.catalog.get(filepath)
+            except OSError:
+                continue
+        return None
+
+    def pop_hash(self, path):
+        """The full hash find() read for path, if it got that far, so it isn't read again."""
+        return self.hashes.pop(path, None)
+
+    def summary(self):
+        return (f"Checked {self.stats['checked']} files for duplicates: {self.stats['same_size']} matched a size, "
+                f"{self.stats['same_partial']} a partial hash, {self.stats['duplicates']} were duplicates.")
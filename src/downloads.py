@@ -0,0 +1,77 @@
+import os
+import mimetypes
+from urllib.parse import quote
+
+from werkzeug.http import http_date, parse_date, parse_etags, parse_if_range_header, parse_range_header, quote_etag
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes per read when the server can't hand the file to the kernel
+DOWNLOAD_MAX_AGE = 3600  # Seconds browsers may reuse a download before revalidating
+
+
+def file_etag(st):
+    """Strong ETag from a stat result; the same in the Flask and ASGI servers."""
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+class DownloadPlan:
+    """What to answer to one GET/HEAD of a file: status, headers and the byte span to send."""
+
+    def __init__(self, status, headers, offset=0, length=0):
+        self.status = status
+        self.headers = headers
+        self.offset = offset
+        self.length = length
+
+
+def plan_download(path, request_headers, as_attachment=True):
+    """Decide the response to a download request, honouring conditional and Range headers.
+
+    request_headers is a mapping with .get() (header names as sent, any case
+    the mapping handles). Raises OSError if path can't be read. Supports
+    If-None-Match / If-Modified-Since (304), a single Range (206, or 416 when
+    unsatisfiable) and If-Range; multi-range requests get the whole file, as
+    the spec allows.
+    """
+    st = os.stat(path)
+    etag = file_etag(st)
+    size = st.st_size
+    headers = {
+        "ETag": quote_etag(etag),
+        "Last-Modified": http_date(st.st_mtime),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"public, max-age={DOWNLOAD_MAX_AGE}",
+    }
+
+    if_none_match = request_headers.get("If-None-Match")
+    if if_none_match:
+        if parse_etags(if_none_match).contains(etag):
+            return DownloadPlan(304, headers)
+    else:
+        since = parse_date(request_headers.get("If-Modified-Since"))
+        if since and int(st.st_mtime) <= since.timestamp():
+            return DownloadPlan(304, headers)
+
+    headers["Content-Type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    name = os.path.basename(path)
+    headers["Content-Disposition"] = (f"{'attachment' if as_attachment else 'inline'}; "
+                                      f"filename*=UTF-8''{quote(name)}")
+
+    ranges = parse_range_header(request_headers.get("Range"))
+    if ranges and request_headers.get("If-Range"):
+        # Resume only if the file is still the one the client has the first part of. A date must be
+        # exactly the Last-Modified sent (RFC 9110 13.1.5), an older one means the file has changed.
+        if_range = parse_if_range_header(request_headers.get("If-Range"))
+        if if_range.etag != etag and not (if_range.date and int(st.st_mtime) == int(if_range.date.timestamp())):
+            ranges = None
+    if ranges and len(ranges.ranges) == 1:
+        span = ranges.range_for_length(size)
+        if span is None:
+            headers["Content-Range"] = f"bytes */{size}"
+            headers["Content-Length"] = "0"
+            return DownloadPlan(416, headers)
+        start, stop = span
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        headers["Content-Length"] = str(stop - start)
+        return DownloadPlan(206, headers, start, stop - start)
+    headers["Content-Length"] = str(size)
+    return DownloadPlan(200, headers, 0, size)
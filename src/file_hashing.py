@@ -0,0 +1,149 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from progress import ThroughputMeter
+
+try:
+    import xxhash
+except ImportError:  # xxhash is optional, hashlib algorithms always work
+    xxhash = None
+
+DEFAULT_ALGORITHM = 'md5'  # Matches the hashes already stored by usb_watcher
+HASH_CHUNK_SIZE = 1024 * 1024  # Bytes read per chunk, bounds memory per file
+HASH_WORKERS = 4  # Concurrent file reads; card readers rarely benefit from more
+
+XXHASH_ALGORITHMS = ('xxh32', 'xxh64', 'xxh3_64', 'xxh3_128', 'xxh128')
+
+
+def available_algorithms():
+    """Return the hash algorithm names usable in this environment."""
+    names = {'md5', 'sha1', 'sha256', 'blake2b', 'blake2s'}
+    if xxhash is not None:
+        names.update(XXHASH_ALGORITHMS)
+    return sorted(names)
+
+
+def new_hasher(algorithm=DEFAULT_ALGORITHM):
+    """Return a hashlib-style object (update/hexdigest) for the algorithm."""
+    algorithm = algorithm.lower()
+    if algorithm in XXHASH_ALGORITHMS:
+        if xxhash is None:
+            raise ValueError(f"Hash algorithm '{algorithm}' requires the xxhash package")
+        return getattr(xxhash, algorithm)()
+    try:
+        return hashlib.new(algorithm)
+    except ValueError:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+
+
+def hash_file(filepath, algorithm=DEFAULT_ALGORITHM, chunk_size=HASH_CHUNK_SIZE):
+    """Stream a file through the hasher in fixed-size chunks and return the hex digest."""
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(filepath, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            # Let the kernel read ahead aggressively, the file is consumed front to back.
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def stat_key(st):
+    """The part of a stat result that decides whether a cached hash is still valid."""
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _hash_with_cache(filepath, cache, algorithm, full_rehash, chunk_size):
+    """Return (hash, stat, from_cache) for a file."""
+    st = os.stat(filepath)
+    if cache is not None and not full_rehash:
+        hash_val = cache.get(filepath, st, algorithm)
+        if hash_val:
+            return hash_val, st, True
+    hash_val = hash_file(filepath, algorithm, chunk_size)
+    if cache is not None:
+        cache.put(filepath, st, algorithm, hash_val)
+    return hash_val, st, False
+
+
+def cached_file_hash(filepath, cache=None, algorithm=DEFAULT_ALGORITHM, full_rehash=False,
+                     chunk_size=HASH_CHUNK_SIZE):
+    """Return the file's hash, reusing the cached value when the file is unchanged."""
+    return _hash_with_cache(filepath, cache, algorithm, full_rehash, chunk_size)[0]
+
+
+def iter_files(folder, exclude=None):
+    """Yield every file path under folder, skipping the exclude folder if given."""
+    exclude = os.path.normpath(exclude) if exclude else None
+    for root, dirs, files in os.walk(folder):
+        if exclude:
+            dirs[:] = [d for d in dirs if os.path.normpath(os.path.join(root, d)) != exclude]
+        for file in files:
+            yield os.path.join(root, file)
+
+
+class HashEngine:
+    """Hashes a folder on a bounded thread pool and yields (path, hash) as files finish.
+
+    At most ``workers * 2`` files are queued at a time so a large card never
+    builds up an unbounded backlog of futures. ``readahead`` is the read size
+    per chunk. Progress (bytes/s, files/s) is printed while hashing and the
+    final figures are available from ``meter``.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, readahead=HASH_CHUNK_SIZE, algorithm=DEFAULT_ALGORITHM,
+                 cache=None, full_rehash=False, label="Hashing", meter=None):
+        self.workers = max(1, workers)
+        self.readahead = readahead
+        self.algorithm = algorithm
+        self.cache = cache
+        self.full_rehash = full_rehash
+        self.meter = meter or ThroughputMeter(label)
+        self.results = {}
+        self.errors = {}
+
+    def _hash_one(self, path):
+        hash_val, st, from_cache = _hash_with_cache(path, self.cache, self.algorithm,
+                                                     self.full_rehash, self.readahead)
+        if from_cache:
+            self.meter.skip()
+        else:
+            self.meter.add(st.st_size)
+        return hash_val
+
+    def iter_hashes(self, folder, exclude=None):
+        """Hash every file under folder (except under exclude), yielding (path, hash) in completion order."""
+        max_pending = self.workers * 2
+        pending = {}
+        paths = iter_files(folder, exclude)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_pending:
+                    path = next(paths, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    pending[pool.submit(self._hash_one, path)] = path
+                if not pending:
+                    break
+                done, _ = wait(pending, timeout=self.meter.interval, return_when=FIRST_COMPLETED)
+                self.meter.maybe_report()
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        hash_val = future.result()
+                    except OSError as e:
+                        self.errors[path] = e
+                        continue
+                    self.results[path] = hash_val
+                    yield path, hash_val
+        if self.cache is not None:
+            self.cache.prune(folder, self.results)
+            self.cache.save()
@@ -0,0 +1,141 @@
+import os
+import json
+import base64
+import bisect
+import hashlib
+import threading
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 200  # Entries per /files page unless ?limit= asks otherwise
+MAX_PAGE_SIZE = 1000
+TYPE_EXTENSIONS = {  # ?type= filter values, named like the catalog's types
+    "images": ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.heic'),
+    "raw": ('.cr3', '.cr2', '.nef', '.arw', '.rw2', '.orf', '.dng'),
+    "videos": ('.mp4', '.mov', '.avi', '.mkv'),
+}
+SORT_ORDERS = ("name", "newest", "oldest")
+
+
+def file_type(name):
+    name = name.lower()
+    for kind, extensions in TYPE_EXTENSIONS.items():
+        if name.endswith(extensions):
+            return kind
+    return "other"
+
+
+def sort_key(entry, order):
+    if order == "newest":
+        return (-entry["mtime_ns"], entry["name"])
+    if order == "oldest":
+        return (entry["mtime_ns"], entry["name"])
+    return (entry["name"],)
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+
+
+class FileListing:
+    """Sorted in-memory listing of a flat folder, for paging through it without re-listing.
+
+    Built from one os.scandir pass (names, sizes, mtimes) and rebuilt when the
+    folder's mtime changes or invalidate() is called, e.g. after the server
+    overwrote a file in place. Pages are keyset-paginated: the cursor is the
+    sort key of the last entry returned, so files added between requests
+    never shift or repeat entries.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.orders = {}  # sort order -> (keys, entries), both sorted by that order
+        self.scanned_mtime_ns = None
+        self.generation = 0  # Bumped by invalidate(), so a scan that started before it isn't kept
+        self.signature = None  # Digest of every (name, size, mtime), the basis of the ETags
+
+    def invalidate(self):
+        with self.lock:
+            self.scanned_mtime_ns = None
+            self.generation += 1
+
+    def refresh(self):
+        """Rebuild the listing if the folder changed. Returns its signature, for ETags."""
+        mtime_ns = os.stat(self.folder).st_mtime_ns
+        with self.lock:
+            if mtime_ns == self.scanned_mtime_ns:
+                return self.signature
+            generation = self.generation
+        entries = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.startswith("."):  # The server's own bookkeeping
+                    continue
+                try:
+                    st = entry.stat()
+                    if entry.is_file():
+                        entries.append({"name": entry.name, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                        "type": file_type(entry.name)})
+                except OSError:  # Removed while listing
+                    continue
+        signature = hashlib.md5()
+        for entry in sorted(entries, key=lambda e: e["name"]):
+            signature.update(f"{entry['name']}\0{entry['size']}\0{entry['mtime_ns']}\n".encode("utf-8"))
+        orders = {}
+        for order in SORT_ORDERS:
+            ordered = sorted(entries, key=lambda e: sort_key(e, order))
+            orders[order] = ([sort_key(e, order) for e in ordered], ordered)
+        with self.lock:
+            self.orders = orders
+            self.signature = signature.hexdigest()
+            # Invalidated while scanning: serve this listing, but scan again on the next request
+            self.scanned_mtime_ns = mtime_ns if generation == self.generation else None
+            return self.signature
+
+    def page(self, order="name", cursor=None, limit=DEFAULT_PAGE_SIZE, types=None, since=None, until=None):
+        """Return (entries, next cursor or None) of the files after cursor matching the filters.
+
+        types is a collection of file_type() names; since/until are datetimes
+        bounding the modification time (inclusive).
+        """
+        if order not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order {order!r}, expected one of {', '.join(SORT_ORDERS)}")
+        self.refresh()
+        with self.lock:
+            keys, ordered = self.orders.get(order, ([], []))
+        try:
+            start = bisect.bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+        except TypeError:  # A cursor from another sort order
+            raise ValueError(f"Cursor {cursor!r} doesn't belong to sort order {order!r}")
+        since_ns = int(since.timestamp() * 1e9) if since else None
+        until_ns = int(until.timestamp() * 1e9) if until else None
+        found = []
+        last = None
+        for index in range(start, len(ordered)):
+            entry = ordered[index]
+            if types and entry["type"] not in types:
+                continue
+            if (since_ns is not None and entry["mtime_ns"] < since_ns) or (until_ns is not None and entry["mtime_ns"] > until_ns):
+                continue
+            if len(found) == limit:  # One more match exists, so there is a next page
+                return found, encode_cursor(keys[last])
+            found.append(entry)
+            last = index
+        return found, None
+
+    @staticmethod
+    def etag(signature, query):
+        """Strong ETag of one page: the same across restarts, different once any file or the query changes."""
+        return hashlib.md5(f"{signature}\0{query}".encode("utf-8")).hexdigest()
+
+
+def entry_json(entry):
+    return {"name": entry["name"], "size": entry["size"], "type": entry["type"],
+            "modified": datetime.fromtimestamp(entry["mtime_ns"] / 1e9).isoformat(timespec="seconds")}
@@ -1,9 +1,13 @@
 import os
 import shutil
-from ftplib import FTP
+from ftplib import FTP, all_errors
 from dotenv import load_dotenv
 from omegaconf import OmegaConf
 
+from ftp_remote import RemoteState
+from ftp_pool import FTPPool, UploadJob, FTP_SESSIONS
+from upload_scheduler import scheduler_from_config, default_stats_path
+
 # Load configuration and environment
 config = OmegaConf.load("src/config.yaml")
 load_dotenv()
@@ -17,6 +21,8 @@ FTP_PASS = os.getenv("FTP_PASS") if config.ftp.use_env_credentials else config.f
 LOCAL_FOLDER = config.ftp.local_folder
 REMOTE_FOLDER = config.ftp.remote_folder
 TRASH_FOLDER = os.path.join(LOCAL_FOLDER, ".trash")
+SESSIONS = config.ftp.get("sessions", FTP_SESSIONS)  # Parallel FTP connections uploading files
+SCHEDULER = config.ftp.get("scheduler")  # Upload order, rate limit and concurrency tuning, see upload_scheduler
 
 def move_to_trash(local_file):
     """Moves a file to .trash, preserving relative folder structure."""
@@ -38,47 +44,54 @@ def move_to_trash(local_file):
     except Exception as e:
         print(f"⚠️ Failed to move to trash: {rel_path}, Error: {e}")
 
-def file_exists_on_ftp(ftp, remote_path):
-    """Check if file exists on FTP server by listing the remote directory."""
-    remote_dir = os.path.dirname(remote_path)
-    file_name = os.path.basename(remote_path)
-
+def file_exists_on_ftp(remote, remote_path, local_size=None):
+    """Check if file exists on FTP server (with the same size, when known) from the cached listing."""
     try:
-        ftp.cwd(remote_dir)
-        files = ftp.nlst()
-        return file_name in files
+        if not remote.exists(remote_path):
+            return False
+        if local_size is None:
+            return True
+        remote_size = remote.size(remote_path)
+        return remote_size is None or remote_size == local_size
     except Exception:
         return False
 
-def upload_file(ftp, local_file, remote_path):
-    """Upload file if it doesn't exist, then move to .trash."""
-    if file_exists_on_ftp(ftp, remote_path):
+def connect_ftp():
+    """Open a logged-in FTP session (the pool calls this once per connection)."""
+    ftp = FTP(FTP_HOST)
+    ftp.login(FTP_USER, FTP_PASS)
+    return ftp
+
+def plan_upload(remote, local_file, remote_path):
+    """UploadJob for a file that isn't on the server yet, or None if it can be skipped."""
+    local_size = os.path.getsize(local_file)
+    if file_exists_on_ftp(remote, remote_path, local_size):
         print(f"⏩ Skipped (already exists): {remote_path}")
-        return
+        return None
 
-    with open(local_file, "rb") as file:
-        ftp.storbinary(f"STOR {remote_path}", file)
-        print(f"✅ Uploaded: {local_file} -> {remote_path}")
+    def uploaded(job):
+        remote.record_upload(job.remote_path, job.size)
+        move_to_trash(job.local_path)
 
-    move_to_trash(local_file)
+    return UploadJob(local_file, remote_path, on_done=uploaded)
 
-def ensure_remote_directory(ftp, remote_path):
+def ensure_remote_directory(remote, remote_path):
     """Create remote directory path recursively if it doesn't exist."""
-    dirs = remote_path.strip("/").split("/")
-    path = ""
-    for dir in dirs:
-        path += f"/{dir}"
-        try:
-            ftp.cwd(path)
-        except Exception:
-            try:
-                ftp.mkd(path)
-                print(f"📂 Created directory: {path}")
-            except Exception as e:
-                print(f"⚠️ Failed to create remote directory: {path}, Error: {e}")
-
-def upload_directory(ftp, local_folder, remote_folder):
-    """Walk through local directory and upload all files."""
+    try:
+        remote.ensure_dir(remote_path, on_create=lambda path: print(f"📂 Created directory: {path}"))
+    except Exception as e:
+        print(f"⚠️ Failed to create remote directory: {remote_path}, Error: {e}")
+
+def upload_directory(ftp, local_folder, remote_folder, sessions=SESSIONS):
+    """Walk through local directory and upload all files.
+
+    Each remote directory is listed once on ftp (see ftp_remote.RemoteState), so
+    the control-channel cost per directory doesn't grow with its number of files.
+    The files to send are then uploaded over a pool of parallel sessions, in
+    the order, at the rate and with the concurrency the scheduler picks.
+    """
+    remote = RemoteState(ftp)
+    jobs = []
     for root, _, files in os.walk(local_folder):
         # Skip the .trash directory
         if TRASH_FOLDER in root:
@@ -87,12 +100,17 @@ def upload_directory(ftp, local_folder, remote_folder):
         relative_path = os.path.relpath(root, LOCAL_FOLDER)
         remote_path = os.path.join(remote_folder, relative_path).replace("\\", "/")
 
-        ensure_remote_directory(ftp, remote_path)
+        ensure_remote_directory(remote, remote_path)
 
         for file in files:
             local_file = os.path.join(root, file)
             remote_file = f"{remote_path}/{file}"
-            upload_file(ftp, local_file, remote_file)
+            job = plan_upload(remote, local_file, remote_file)
+            if job:
+                jobs.append(job)
+    print(f"📡 {remote.commands} listing/mkdir commands for the whole tree, {len(jobs)} files to upload")
+    scheduler = scheduler_from_config(SCHEDULER, sessions, default_stats_path(local_folder))
+    return FTPPool(connect_ftp, scheduler=scheduler).run(jobs)
 
 def is_within_folder(base_folder, target_file):
     base_folder = os.path.abspath(os.path.normcase(os.path.normpath(base_folder)))
@@ -102,15 +120,20 @@ def is_within_folder(base_folder, target_file):
 def main():
     """Main entrypoint."""
     try:
-        ftp = FTP(FTP_HOST)
-        ftp.login(FTP_USER, FTP_PASS)
+        ftp = connect_ftp()
         print(f"✅ Connected to FTP: {FTP_HOST}")
 
         os.makedirs(TRASH_FOLDER, exist_ok=True)
-        upload_directory(ftp, LOCAL_FOLDER, REMOTE_FOLDER)
+        uploaded, failed = upload_directory(ftp, LOCAL_FOLDER, REMOTE_FOLDER)
 
-        ftp.quit()
-        print("🎉 Upload completed. Files moved to .trash.")
+        try:
+            ftp.quit()
+        except all_errors:  # Idle during the uploads, the server may have dropped it
+            ftp.close()
+        if failed:
+            print(f"⚠️ Upload finished with {failed} failed files; run again to retry them.")
+        else:
+            print("🎉 Upload completed. Files moved to .trash.")
     except Exception as e:
         print(f"❌ Error: {e}")
 
@@ -0,0 +1,230 @@
+import os
+import time
+import queue
+import threading
+from ftplib import all_errors, error_perm
+
+from progress import ThroughputMeter, format_size
+
+FTP_SESSIONS = 4  # Logged-in connections uploading at the same time
+UPLOAD_RETRIES = 3  # Attempts per file before it is reported as failed
+RETRY_BACKOFF = 2.0  # Seconds before the first retry, doubled on each further attempt
+STOR_BLOCK_SIZE = 1024 * 1024  # Bytes per data-channel write
+MIN_BLOCK_SIZE = 64 * 1024  # Smallest write when a rate limit shrinks the blocks
+REST_UNSUPPORTED = ("500", "501", "502", "504")  # Replies to REST from servers that can't resume
+
+
+class SessionRefused(Exception):
+    """The server turned down one more login while other sessions were open."""
+
+
+class UploadJob:
+    """One file to store: local path, absolute remote path, and what to do once it is there.
+
+    ``offset`` is how many bytes of it the server already holds; the upload
+    then resumes there with REST instead of starting over. ``mtime`` orders
+    the "newest" policy, and defaults to the local file's.
+    """
+
+    def __init__(self, local_path, remote_path, on_done=None, offset=0, mtime=None):
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.on_done = on_done
+        st = os.stat(local_path)
+        self.size = st.st_size
+        self.mtime = st.st_mtime if mtime is None else mtime
+        self.offset = offset if 0 < offset < self.size else 0
+
+
+class FTPPool:
+    """Uploads a queue of files over several FTP sessions at once.
+
+    ``connect`` returns a logged-in ftplib.FTP or None (e.g. tx_to_mobile's
+    connect_ftp, which retries on its own). Each worker thread owns one
+    session; when a transfer fails the session is dropped, and the file is
+    retried on a fresh one after an exponential backoff. With ``resume``,
+    the retry continues from what the server received (SIZE, then REST)
+    rather than from byte 0; servers that refuse REST get whole files.
+    A login that fails while other sessions are open is taken as the
+    server's limit (phones often allow only a few): that worker stops and
+    its file goes back in the queue for the others.
+    Bytes are counted as they are sent, so the progress line shows the
+    aggregate throughput of all sessions. An upload_scheduler.UploadScheduler
+    given as ``scheduler`` orders the files, limits the rate and decides how
+    many of the sessions send at a time.
+    """
+
+    def __init__(self, connect, sessions=FTP_SESSIONS, retries=UPLOAD_RETRIES, backoff=RETRY_BACKOFF,
+                 label="FTP upload", resume=True, scheduler=None):
+        self.connect = connect
+        self.scheduler = scheduler
+        self.sessions = max(1, scheduler.sessions if scheduler else sessions)
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.label = label
+        self.resume = resume
+        self.block_size = STOR_BLOCK_SIZE
+        if scheduler and scheduler.bucket.rate:  # Smaller blocks keep a rate-limited upload smooth
+            self.block_size = int(min(STOR_BLOCK_SIZE, max(MIN_BLOCK_SIZE, scheduler.bucket.rate / 10)))
+        self.meter = None
+        self.lock = threading.Lock()
+        self.open_sessions = 0
+        self.uploaded = []
+        self.failed = []
+
+    def _store(self, ftp, job):
+        sent = 0
+
+        def count(block):
+            nonlocal sent
+            sent += len(block)
+            self.meter.add(len(block), files=0)
+            if self.scheduler:
+                self.scheduler.transferred(len(block))
+
+        try:
+            with open(job.local_path, "rb") as f:
+                f.seek(job.offset)
+                ftp.storbinary(f"STOR {job.remote_path}", f, self.block_size, callback=count,
+                               rest=job.offset or None)
+        except BaseException as e:
+            self.meter.add(-sent, files=0)  # The retry sends these bytes again
+            if job.offset and isinstance(e, error_perm) and str(e)[:3] in REST_UNSUPPORTED:
+                print(f"⚠️ The server can't resume uploads, sending whole files: {e}")
+                self.resume = False
+                self._set_offset(job, 0)
+            raise
+
+    def _set_offset(self, job, offset):
+        with self.lock:
+            self.meter.total_bytes -= offset - job.offset  # Bytes already on the server aren't sent
+        job.offset = offset
+
+    def _resume_point(self, ftp, job):
+        """Bytes of job the server holds after a failed attempt (0 if unknown or complete)."""
+        try:
+            ftp.voidcmd("TYPE I")  # SIZE is refused in ASCII mode
+            size = ftp.size(job.remote_path)
+        except all_errors:
+            return 0
+        return size if size and size < job.size else 0
+
+    def _open(self):
+        """A new session; raises SessionRefused if the login failed while others are open."""
+        with self.lock:
+            self.open_sessions += 1  # Counted from the start, so logins made at once see each other
+        try:
+            ftp, error = self.connect(), None
+        except all_errors as e:
+            ftp, error = None, e
+        if ftp is not None:
+            return ftp
+        with self.lock:
+            self.open_sessions -= 1
+            others = self.open_sessions
+        if others:
+            if self.scheduler:
+                self.scheduler.refused(others)
+            raise SessionRefused(f"The server refused a session next to {others} open ones")
+        raise error or ConnectionError("Could not connect to the FTP server")
+
+    def _close(self, ftp):
+        with self.lock:
+            self.open_sessions -= 1
+        try:
+            ftp.quit()
+        except all_errors:
+            ftp.close()
+
+    def _upload(self, ftp, job):
+        """Send one job, reconnecting and retrying on errors. Returns the session to keep using."""
+        for attempt in range(1, self.retries + 1):
+            try:
+                if ftp is None:
+                    ftp = self._open()
+                if not self.resume:
+                    self._set_offset(job, 0)
+                elif attempt > 1:
+                    self._set_offset(job, self._resume_point(ftp, job))
+                if job.offset:
+                    print(f"↪️ Resuming {job.local_path} at {format_size(job.offset)}")
+                self._store(ftp, job)
+                self.meter.add(0)
+                with self.lock:
+                    self.uploaded.append(job)
+                if self.scheduler:
+                    self.scheduler.finished(job)
+                print(f"✅ Uploaded: {job.local_path} -> {job.remote_path}")
+                if job.on_done:
+                    job.on_done(job)
+                return ftp
+            except (*all_errors, ConnectionError) as e:
+                if ftp is not None:
+                    self._close(ftp)
+                    ftp = None
+                if attempt == self.retries:
+                    print(f"❌ Giving up on {job.local_path} after {attempt} attempts: {e}")
+                    with self.lock:
+                        self.failed.append((job, e))
+                    return None
+                delay = self.backoff * 2 ** (attempt - 1)
+                print(f"⚠️ Upload of {job.local_path} failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def _worker(self, jobs):
+        ftp = None
+        while True:
+            if self.scheduler:
+                self.scheduler.acquire()  # Waits while the tuned number of transfers is running
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                job = None
+            try:
+                if job is None:
+                    break
+                ftp = self._upload(ftp, job)
+            except SessionRefused as e:
+                print(f"🔌 {e}, going on with those")
+                jobs.put(job)
+                break
+            finally:
+                if self.scheduler:
+                    self.scheduler.release()
+            self.meter.maybe_report()
+        if ftp is not None:
+            self._close(ftp)
+
+    def run(self, jobs):
+        """Upload every UploadJob and return (uploaded, failed) counts."""
+        jobs = self.scheduler.order(jobs) if self.scheduler else list(jobs)
+        work = queue.Queue()
+        for job in jobs:
+            work.put(job)
+        total = sum(job.size - job.offset for job in jobs)
+        self.meter = ThroughputMeter(self.label, total_bytes=total)
+        threads = [threading.Thread(target=self._worker, args=(work,), daemon=True)
+                   for _ in range(min(self.sessions, len(jobs)))]
+        interval = self.meter.interval
+        if self.scheduler:
+            self.scheduler.begin()
+            interval = min(interval, self.scheduler.tune_interval)
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(interval)
+                self.meter.maybe_report()
+                if self.scheduler:
+                    self.scheduler.tick()
+        if not work.empty():  # Put back by a refused worker after the others had finished
+            self._worker(work)
+        print(f"📊 {self.meter.summary()} of {format_size(self.meter.total_bytes)} over {len(threads)} sessions"
+              + (f", {len(self.failed)} failed" if self.failed else ""))
+        if self.scheduler:
+            stats = self.scheduler.run_stats(failed=len(self.failed))
+            if stats["files"]:
+                print(f"🗂️ Policy {stats['policy']}: files waited {stats['mean_file_seconds']:.1f}s on average, "
+                      f"half were done after {stats['half_files_seconds']:.1f}s, "
+                      f"{stats['sessions_final']} sessions at the end")
+        return len(self.uploaded), len(self.failed)
@@ -0,0 +1,150 @@
+import posixpath
+from datetime import datetime, timezone
+from ftplib import error_perm, error_temp
+
+# Reply codes meaning "this server doesn't do MLSD", as opposed to 550/501 for a bad directory
+MLSD_UNSUPPORTED = ("500", "502")
+
+
+def _reply_code(error):
+    return str(error)[:3]
+
+
+def normalize(path):
+    """Absolute, normalized remote path ('/a/./b/' -> '/a/b')."""
+    return posixpath.normpath("/" + path.replace("\\", "/").strip("/"))
+
+
+def parse_modify(value):
+    """MLSD modify fact (YYYYMMDDHHMMSS[.sss], UTC) -> epoch seconds, or None."""
+    try:
+        return datetime.strptime(value[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class RemoteState:
+    """What an FTP session has learned about the remote tree, so each directory is listed once.
+
+    Directories are listed with MLSD (names, types, sizes and mtimes in one
+    command); servers without it fall back to NLST, and sizes are then asked
+    with SIZE only for files that are looked up. Directories known to exist,
+    listed or created here, are never probed again. All paths are absolute,
+    so nothing depends on the session's working directory. ``commands``
+    counts the control-channel commands issued.
+    """
+
+    def __init__(self, ftp, use_mlsd=True):
+        self.ftp = ftp
+        self.use_mlsd = use_mlsd
+        self.listings = {}  # dir -> {name: {"type", "size", "modify"}}, None if the dir doesn't exist
+        self.known_dirs = {"/"}
+        self.binary = False  # SIZE is refused in ASCII mode
+        self.commands = 0
+
+    def _list_mlsd(self, path):
+        self.commands += 1
+        entries = {}
+        for name, facts in self.ftp.mlsd(path, facts=["type", "size", "modify"]):
+            kind = facts.get("type", "file").lower()
+            if kind in ("cdir", "pdir") or name in (".", ".."):
+                continue
+            size = facts.get("size")
+            entries[name] = {"type": "dir" if kind == "dir" else "file",
+                             "size": int(size) if size and size.isdigit() else None,
+                             "modify": parse_modify(facts.get("modify"))}
+        return entries
+
+    def _list_nlst(self, path):
+        self.commands += 1
+        names = self.ftp.nlst(path)
+        # NLST can't tell files from folders; sizes are filled in by size() on demand
+        return {posixpath.basename(name.rstrip("/")): {"type": None, "size": None, "modify": None}
+                for name in names if posixpath.basename(name.rstrip("/")) not in (".", "..", "")}
+
+    def listing(self, path):
+        """{name: facts} of a remote directory, or None if it doesn't exist. Listed once per session."""
+        path = normalize(path)
+        if path in self.listings:
+            return self.listings[path]
+        entries = None
+        try:
+            if self.use_mlsd:
+                try:
+                    entries = self._list_mlsd(path)
+                except error_perm as e:
+                    if _reply_code(e) not in MLSD_UNSUPPORTED:
+                        raise
+                    self.use_mlsd = False
+            if entries is None:
+                try:
+                    entries = self._list_nlst(path)
+                except error_temp as e:
+                    if _reply_code(e) != "450":
+                        raise
+                    entries = {}  # Some servers answer NLST of an empty folder with "450 No files found"
+        except error_perm as e:
+            if not _reply_code(e).startswith("5"):
+                raise
+            entries = None  # 550: no such directory
+        self.listings[path] = entries
+        if entries is not None:
+            self.known_dirs.add(path)
+        return entries
+
+    def entry(self, remote_path):
+        remote_path = normalize(remote_path)
+        entries = self.listing(posixpath.dirname(remote_path))
+        return entries.get(posixpath.basename(remote_path)) if entries else None
+
+    def exists(self, remote_path):
+        return self.entry(remote_path) is not None
+
+    def size(self, remote_path):
+        """Size of a remote file from the cached listing (one SIZE command in NLST mode), or None."""
+        remote_path = normalize(remote_path)
+        entry = self.entry(remote_path)
+        if entry is None or entry["type"] == "dir":
+            return None
+        if entry["size"] is None:
+            if not self.binary:
+                self.commands += 1
+                self.ftp.voidcmd("TYPE I")
+                self.binary = True
+            self.commands += 1
+            try:
+                entry["size"] = self.ftp.size(remote_path)
+            except error_perm:  # A folder, or SIZE isn't allowed here
+                return None
+        return entry["size"]
+
+    def ensure_dir(self, remote_path, on_create=None):
+        """Create remote_path and any missing parents. Costs nothing for folders already known."""
+        remote_path = normalize(remote_path)
+        if remote_path in self.known_dirs:
+            return
+        parent = posixpath.dirname(remote_path)
+        self.ensure_dir(parent, on_create)
+        if not self.exists(remote_path):
+            self.commands += 1
+            self.ftp.mkd(remote_path)
+            self.listings.setdefault(parent, {})[posixpath.basename(remote_path)] = {
+                "type": "dir", "size": None, "modify": None}
+            self.listings[remote_path] = {}
+            if on_create:
+                on_create(remote_path)
+        self.known_dirs.add(remote_path)
+
+    def record_upload(self, remote_path, size):
+        """Remember a file this session stored, so later lookups don't list its folder again."""
+        remote_path = normalize(remote_path)
+        entries = self.listings.get(posixpath.dirname(remote_path))
+        if entries is not None:
+            entries[posixpath.basename(remote_path)] = {"type": "file", "size": size, "modify": None}
+
+    def forget(self, remote_path):
+        """Drop what is known about a file, e.g. after a failed upload left it partial."""
+        remote_path = normalize(remote_path)
+        entries = self.listings.get(posixpath.dirname(remote_path))
+        if entries:
+            entries.pop(posixpath.basename(remote_path), None)
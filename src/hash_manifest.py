@@ -0,0 +1,157 @@
+import os
+import time
+import sqlite3
+import threading
+
+from file_hashing import DEFAULT_ALGORITHM, stat_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER,
+    algorithm TEXT,
+    hash TEXT,
+    ingested_hash TEXT,
+    ingested_algorithm TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files(hash);
+CREATE INDEX IF NOT EXISTS idx_files_ingested_hash ON files(ingested_hash);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class HashManifest:
+    """SQLite manifest of scanned files, indexed by path and content hash.
+
+    Each row holds the stat key and hash from the latest scan (the hash cache
+    used by ``file_hashing.cached_file_hash``) and ``ingested_hash``, the hash
+    the file had when it was last handed to run_all.py, computed with
+    ``ingested_algorithm``. Rows whose content was ingested are kept after the
+    file disappears so that content moved or renamed on the card is still
+    recognised.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.save()
+        self.conn.close()
+
+    # --- hash cache interface ---
+    def get(self, path, st, algorithm=DEFAULT_ALGORITHM):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, inode, algorithm, hash FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row and list(row[:3]) == stat_key(st) and row[3] == algorithm:
+            return row[4]
+        return None
+
+    def put(self, path, st, algorithm, hash_val):
+        with self.lock:
+            self.pending[path] = tuple(stat_key(st)) + (algorithm, hash_val)
+
+    def prune(self, folder, seen_paths):
+        """Drop rows under folder that were not seen, unless their content was ingested."""
+        prefix = os.path.join(folder, '')
+        # Paths sharing the prefix sort between prefix and prefix + U+10FFFF.
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path FROM files WHERE path >= ? AND path < ? AND ingested_hash IS NULL",
+                (prefix, prefix + '\U0010ffff')
+            ).fetchall()
+            stale = [(path,) for (path,) in rows if path not in seen_paths]
+            if stale:
+                with self.conn:
+                    self.conn.executemany("DELETE FROM files WHERE path = ?", stale)
+
+    def save(self):
+        """Upsert the rows hashed since the last save in a single transaction."""
+        with self.lock:
+            if not self.pending:
+                return
+            now = time.time()
+            rows = [(path,) + values + (now,) for path, values in self.pending.items()]
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO files (path, size, mtime_ns, inode, algorithm, hash, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                    "inode = excluded.inode, algorithm = excluded.algorithm, hash = excluded.hash, "
+                    "updated_at = excluded.updated_at",
+                    rows)
+            self.pending.clear()
+
+    # --- ingest tracking ---
+    def is_known(self, hash_val, algorithm=None):
+        """True if content with this hash was ingested before, under any path.
+
+        With an algorithm, only hashes ingested under that algorithm count.
+        """
+        query, params = "SELECT 1 FROM files WHERE ingested_hash = ?", (hash_val,)
+        if algorithm is not None:
+            query, params = query + " AND ingested_algorithm = ?", params + (algorithm,)
+        with self.lock:
+            row = self.conn.execute(query + " LIMIT 1", params).fetchone()
+        return row is not None
+
+    def ingested_hashes(self):
+        """Return {path: ingested_hash} for every ingested row."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, ingested_hash FROM files WHERE ingested_hash IS NOT NULL"
+            ).fetchall()
+        return dict(rows)
+
+    def mark_ingested(self, hashes, algorithm=DEFAULT_ALGORITHM):
+        """Record {path: hash} as ingested, touching only rows whose ingested hash changed."""
+        self.save()
+        now = time.time()
+        rows = [(path, algorithm, hash_val, hash_val, algorithm, now) for path, hash_val in hashes.items()]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO files (path, algorithm, hash, ingested_hash, ingested_algorithm, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET ingested_hash = excluded.ingested_hash, "
+                "ingested_algorithm = excluded.ingested_algorithm, updated_at = excluded.updated_at "
+                "WHERE files.ingested_hash IS NOT excluded.ingested_hash "
+                "OR files.ingested_algorithm IS NOT excluded.ingested_algorithm",
+                rows)
+
+    # --- migration ---
+    def get_meta(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def migrate_text_records(self, record_file, algorithm='md5'):
+        """Import a legacy ``path::hash`` file as ingested rows. Returns the number imported."""
+        if not os.path.exists(record_file) or self.get_meta('migrated:' + os.path.abspath(record_file)):
+            return 0
+        hashes = {}
+        with open(record_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Split on the last separator, hex digests never contain '::' but paths may.
+                path, sep, hash_val = line.rstrip('\n').rpartition('::')
+                if sep and path and hash_val:
+                    hashes[path] = hash_val
+        self.mark_ingested(hashes, algorithm)
+        self.set_meta('migrated:' + os.path.abspath(record_file), str(len(hashes)))
+        return len(hashes)
@@ -0,0 +1,335 @@
+import io
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+# Header-only metadata readers. They read a few KB around the EXIF block instead
+# of decoding the image or walking every tag, and return None when the file does
+# not look like what they expect so callers can fall back to PIL/exifread.
+
+MAX_APP1_SIZE = 64 * 1024  # A JPEG segment length is 16 bits
+MAX_BOX_READ = 1024 * 1024  # Upper bound for metadata boxes we read into memory
+
+# TIFF tags we care about
+TAG_ORIENTATION = 0x0112
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+GPS_TAGS = {1: 'GPSLatitudeRef', 2: 'GPSLatitude', 3: 'GPSLongitudeRef', 4: 'GPSLongitude',
+            5: 'GPSAltitudeRef', 6: 'GPSAltitude'}
+
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+# Canon's CR3 metadata lives in moov/uuid(CANON_UUID)/CMT1..CMT4, each a small TIFF file.
+CANON_UUID = bytes.fromhex('85c0b687820f11e08111f4ce462b6a48')
+# The ~1620x1080 JPEG preview sits in a top-level uuid box: uuid, 8 bytes, then a PRVW box.
+# A 160x120 THMB box sits next to the CMT boxes.
+CANON_PREVIEW_UUID = bytes.fromhex('eaf42b5e1c984b88b9fbb7dc406e4d16')
+MAX_PREVIEW_READ = 16 * 1024 * 1024  # Upper bound for an embedded preview JPEG
+
+# ISO-BMFF times count seconds from 1904-01-01 UTC
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.3gp')
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+CR3_EXTENSIONS = ('.cr3',)
+
+
+class TiffReader:
+    """Reads individual IFD entries from a TIFF structure in a seekable file."""
+
+    def __init__(self, f, base=0):
+        self.f = f
+        self.base = base
+        f.seek(base)
+        header = f.read(8)
+        if len(header) < 8 or header[:2] not in (b'II', b'MM'):
+            raise ValueError("Not a TIFF header")
+        self.endian = '<' if header[:2] == b'II' else '>'
+        magic, self.first_ifd = struct.unpack(self.endian + 'HI', header[2:8])
+        if magic != 42:
+            raise ValueError("Bad TIFF magic")
+
+    def read_at(self, offset, size):
+        self.f.seek(self.base + offset)
+        data = self.f.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated TIFF data")
+        return data
+
+    def read_ifd(self, offset, wanted=None):
+        """Return {tag: value} for the entries of one IFD, optionally only the wanted tags."""
+        count = struct.unpack(self.endian + 'H', self.read_at(offset, 2))[0]
+        entries = self.read_at(offset + 2, count * 12)
+        tags = {}
+        for i in range(count):
+            tag, typ, n, raw = struct.unpack(self.endian + 'HHI4s', entries[i * 12:i * 12 + 12])
+            if (wanted is not None and tag not in wanted) or typ not in TYPE_SIZES:
+                continue
+            size = TYPE_SIZES[typ] * n
+            if size > 4:
+                value_offset = struct.unpack(self.endian + 'I', raw)[0]
+                raw = self.read_at(value_offset, size)
+            tags[tag] = self.decode(typ, n, raw[:size])
+        return tags
+
+    def decode(self, typ, n, raw):
+        if typ == 2:
+            return raw.split(b'\0', 1)[0].decode('ascii', errors='ignore').strip()
+        if typ in (5, 10):
+            fmt = 'I' if typ == 5 else 'i'
+            values = struct.unpack(self.endian + fmt * (2 * n), raw)
+            pairs = tuple(zip(values[0::2], values[1::2]))
+            return pairs if n > 1 else pairs[0]
+        fmt = {1: 'B', 3: 'H', 4: 'I', 7: 'B', 9: 'i'}[typ]
+        values = struct.unpack(self.endian + fmt * n, raw)
+        return values if n > 1 else values[0]
+
+
+def _gps_info(gps_tags):
+    return {tag: value for tag, value in gps_tags.items() if tag in GPS_TAGS}
+
+
+def read_tiff_metadata(f, base=0):
+    """Date, orientation and GPS from a TIFF structure (IFD0 -> Exif IFD / GPS IFD)."""
+    reader = TiffReader(f, base)
+    ifd0 = reader.read_ifd(reader.first_ifd, {TAG_ORIENTATION, TAG_DATETIME, TAG_EXIF_IFD, TAG_GPS_IFD})
+    metadata = {}
+    if TAG_ORIENTATION in ifd0:
+        metadata['Orientation'] = ifd0[TAG_ORIENTATION]
+    if TAG_DATETIME in ifd0:
+        metadata['DateTime'] = ifd0[TAG_DATETIME]
+    if TAG_EXIF_IFD in ifd0:
+        exif = reader.read_ifd(ifd0[TAG_EXIF_IFD], {TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED})
+        if TAG_DATETIME_ORIGINAL in exif:
+            metadata['DateTimeOriginal'] = exif[TAG_DATETIME_ORIGINAL]
+        if TAG_DATETIME_DIGITIZED in exif:
+            metadata['DateTimeDigitized'] = exif[TAG_DATETIME_DIGITIZED]
+    if TAG_GPS_IFD in ifd0:
+        gps = _gps_info(reader.read_ifd(ifd0[TAG_GPS_IFD], set(GPS_TAGS)))
+        if gps:
+            metadata['GPSInfo'] = gps
+    return metadata
+
+
+def find_jpeg_exif(f):
+    """Return the TIFF payload of the JPEG's Exif APP1 segment, or None."""
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        length = struct.unpack('>H', marker[2:])[0]
+        if code == 0xDA or code == 0xD9:  # Start of scan / end of image: no more metadata
+            return None
+        if code == 0xE1 and length > 8:
+            payload = f.read(min(length - 2, MAX_APP1_SIZE))
+            if payload.startswith(b'Exif\0\0'):
+                return payload[6:]
+            continue  # XMP also lives in APP1
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_jpeg_metadata(f):
+    tiff = find_jpeg_exif(f)
+    if tiff is None:
+        return None
+    return read_tiff_metadata(io.BytesIO(tiff))
+
+
+def iter_boxes(f, start, end):
+    """Yield (type, payload_offset, payload_size) for the ISO-BMFF boxes between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack('>Q', large)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type.decode('latin-1'), offset + header_size, size - header_size
+        offset += size
+
+
+def find_box(f, start, end, box_type):
+    for found_type, payload, size in iter_boxes(f, start, end):
+        if found_type == box_type:
+            return payload, size
+    return None
+
+
+def file_size(f):
+    return f.seek(0, os.SEEK_END)
+
+
+def find_canon_uuid(f):
+    """Return (payload_offset, size) of the Canon metadata uuid box inside moov, or None."""
+    moov = find_box(f, 0, file_size(f), 'moov')
+    if moov is None:
+        return None
+    for box_type, payload, size in iter_boxes(f, moov[0], moov[0] + moov[1]):
+        if box_type == 'uuid':
+            f.seek(payload)
+            if f.read(16) == CANON_UUID:
+                return payload + 16, size - 16
+    return None
+
+
+def read_cr3_metadata(f):
+    canon = find_canon_uuid(f)
+    if canon is None:
+        return None
+    metadata = {}
+    for box_type, payload, size in iter_boxes(f, canon[0], canon[0] + canon[1]):
+        if box_type not in ('CMT1', 'CMT2', 'CMT4') or size > MAX_BOX_READ:
+            continue
+        f.seek(payload)
+        reader = TiffReader(io.BytesIO(f.read(size)))
+        if box_type == 'CMT1':
+            ifd0 = reader.read_ifd(reader.first_ifd, {TAG_ORIENTATION, TAG_DATETIME})
+            if TAG_ORIENTATION in ifd0:
+                metadata['Orientation'] = ifd0[TAG_ORIENTATION]
+            if TAG_DATETIME in ifd0:
+                metadata['DateTime'] = ifd0[TAG_DATETIME]
+        elif box_type == 'CMT2':  # The first IFD of CMT2 is the Exif IFD itself
+            exif = reader.read_ifd(reader.first_ifd, {TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED})
+            if TAG_DATETIME_ORIGINAL in exif:
+                metadata['DateTimeOriginal'] = exif[TAG_DATETIME_ORIGINAL]
+            if TAG_DATETIME_DIGITIZED in exif:
+                metadata['DateTimeDigitized'] = exif[TAG_DATETIME_DIGITIZED]
+        else:  # CMT4 holds the GPS IFD
+            gps = _gps_info(reader.read_ifd(reader.first_ifd, set(GPS_TAGS)))
+            if gps:
+                metadata['GPSInfo'] = gps
+    return metadata
+
+
+def _embedded_jpeg(f, payload, size):
+    # A few bytes of dimensions/lengths come first; the JPEG runs to the end of the box.
+    f.seek(payload)
+    start = f.read(min(size, 64)).find(b'\xff\xd8')
+    if start < 0:
+        return None
+    return payload + start, size - start
+
+
+def find_cr3_preview(f):
+    """Return (offset, size) of the largest JPEG embedded in a CR3 (PRVW, else THMB), or None."""
+    for box_type, payload, size in iter_boxes(f, 0, file_size(f)):
+        if box_type == 'uuid':
+            f.seek(payload)
+            if f.read(16) == CANON_PREVIEW_UUID:
+                preview = find_box(f, payload + 24, payload + size, 'PRVW')
+                if preview:
+                    return _embedded_jpeg(f, *preview)
+    canon = find_canon_uuid(f)
+    if canon:
+        thumbnail = find_box(f, canon[0], canon[0] + canon[1], 'THMB')
+        if thumbnail:
+            return _embedded_jpeg(f, *thumbnail)
+    return None
+
+
+def read_cr3_preview(file_path):
+    """JPEG bytes of the preview embedded in a CR3, or None. Avoids decoding the raw data."""
+    try:
+        with open(file_path, 'rb') as f:
+            found = find_cr3_preview(f)
+            if found is None or found[1] > MAX_PREVIEW_READ:
+                return None
+            f.seek(found[0])
+            return f.read(found[1])
+    except (OSError, struct.error):
+        return None
+
+
+def _read_full_box_header(f, payload):
+    f.seek(payload)
+    return f.read(1)[0]  # version, flags are ignored
+
+
+def read_mvhd(f, payload):
+    """Return (creation_time, duration_seconds) from a movie header box."""
+    version = _read_full_box_header(f, payload)
+    f.seek(payload + 4)
+    if version == 1:
+        creation, _, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+    else:
+        creation, _, timescale, duration = struct.unpack('>IIII', f.read(16))
+    creation_time = MP4_EPOCH + timedelta(seconds=creation) if creation else None
+    duration_seconds = duration / timescale if timescale and duration != 0xFFFFFFFF else None
+    return creation_time, duration_seconds
+
+
+def read_tkhd_dimensions(f, payload):
+    """Return (width, height) in pixels from a track header box."""
+    version = _read_full_box_header(f, payload)
+    # creation, modification, track id, reserved, duration, then reserved(8), layer,
+    # alternate group, volume, reserved (2 each) and the 3x3 matrix (36).
+    skip = (8 + 8 + 4 + 4 + 8 if version == 1 else 4 + 4 + 4 + 4 + 4) + 8 + 8 + 36
+    f.seek(payload + 4 + skip)
+    width, height = struct.unpack('>II', f.read(8))
+    return width >> 16, height >> 16  # 16.16 fixed point
+
+
+def read_video_metadata(file_path):
+    """Creation time, duration and dimensions from moov/mvhd and the track headers.
+
+    Only the box headers are read: mdat is skipped by its size, so a multi-GB clip
+    costs a handful of small reads. Returns None if there is no usable moov box.
+    creation_time is a timezone-aware UTC datetime (or None when the camera left it 0).
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            moov = find_box(f, 0, file_size(f), 'moov')
+            if moov is None:
+                return None
+            metadata = {'creation_time': None, 'duration': None, 'width': None, 'height': None}
+            moov_end = moov[0] + moov[1]
+            for box_type, payload, size in iter_boxes(f, moov[0], moov_end):
+                if box_type == 'mvhd':
+                    metadata['creation_time'], metadata['duration'] = read_mvhd(f, payload)
+                elif box_type == 'trak' and not metadata['width']:
+                    tkhd = find_box(f, payload, payload + size, 'tkhd')
+                    if tkhd:
+                        width, height = read_tkhd_dimensions(f, tkhd[0])
+                        if width and height:  # Audio tracks have no dimensions
+                            metadata['width'], metadata['height'] = width, height
+            return metadata
+    except (OSError, ValueError, IndexError, OverflowError, struct.error):
+        return None
+
+
+def read_exif_fast(file_path):
+    """Read date, orientation and GPS tags from the file header.
+
+    Returns a PIL-style dict ('DateTimeOriginal', 'Orientation', 'GPSInfo' keyed by
+    GPS tag id) or None if the format is unsupported or the header can't be parsed.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    try:
+        with open(file_path, 'rb') as f:
+            if ext in JPEG_EXTENSIONS:
+                return read_jpeg_metadata(f)
+            if ext in TIFF_EXTENSIONS:
+                return read_tiff_metadata(f)
+            if ext in CR3_EXTENSIONS:
+                return read_cr3_metadata(f)
+    except (OSError, ValueError, struct.error):
+        return None
+    return None
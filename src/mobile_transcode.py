@@ -0,0 +1,145 @@
+import io
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from file_hashing import cached_file_hash, iter_files
+from hash_manifest import HashManifest
+from previews import PreviewCache, HASH_DB_NAME
+
+MOBILE_LONG_EDGE = 2560  # Longest side in pixels, about a phone screen at 2x zoom
+MOBILE_QUALITY = 85  # JPEG quality of the phone copies
+TRANSCODE_CACHE_MAX_BYTES = 20 * 1024 ** 3  # Least recently used phone copies are removed beyond this
+TRANSCODE_WORKERS = os.cpu_count() or 1  # Processes encoding in parallel
+TRANSCODABLE_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def default_cache_folder(folder):
+    """Phone copies of <folder> live next to it in <folder>_mobile."""
+    return os.path.normpath(folder) + "_mobile"
+
+
+def is_transcodable(path):
+    return path.lower().endswith(TRANSCODABLE_EXTENSIONS)
+
+
+def transcode_jpeg(path, long_edge=MOBILE_LONG_EDGE, quality=MOBILE_QUALITY):
+    """JPEG bytes of path scaled to long_edge and upright, or None if it is already that small.
+
+    The image is decoded at the smallest DCT scale that still covers
+    long_edge. EXIF (minus the orientation, which is applied) and the ICC
+    profile are kept, so the phone's gallery still sorts and colours it right.
+    """
+    img = Image.open(path)
+    if max(img.size) <= long_edge:
+        return None
+    img.draft("RGB", (long_edge, long_edge))
+    img = ImageOps.exif_transpose(img)
+    icc_profile = img.info.get("icc_profile")
+    exif = img.getexif()
+    img = img.convert("RGB")
+    img.thumbnail((long_edge, long_edge), Image.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality, exif=exif, icc_profile=icc_profile)
+    return buffer.getvalue()
+
+
+def _transcode_safely(args):
+    path, long_edge, quality = args
+    try:
+        return transcode_jpeg(path, long_edge, quality)
+    except Exception as e:
+        print(f"Cannot transcode {path}, sending the original: {e}")
+        return None
+
+
+class MobileTranscoder:
+    """Downscaled, re-encoded phone copies of JPEGs, cached by source content hash and settings.
+
+    Copies are kept in a PreviewCache under the variant name ``<long_edge>q<quality>``,
+    so changing the settings produces new copies instead of reusing stale ones,
+    and a repeated sync of the same content never encodes it again.
+    """
+
+    def __init__(self, cache_folder, long_edge=MOBILE_LONG_EDGE, quality=MOBILE_QUALITY,
+                 max_bytes=TRANSCODE_CACHE_MAX_BYTES, workers=TRANSCODE_WORKERS):
+        self.cache = PreviewCache(cache_folder, max_bytes)
+        self.cache_folder = cache_folder
+        self.long_edge = long_edge
+        self.quality = quality
+        self.workers = max(1, workers)
+        self.hashes = None  # Opened on demand, when callers don't pass content hashes
+        self.encoded = 0
+
+    @property
+    def variant(self):
+        return f"{self.long_edge}q{self.quality}"
+
+    def content_hash(self, path):
+        if self.hashes is None:
+            self.hashes = HashManifest(os.path.join(self.cache_folder, HASH_DB_NAME))
+        content_hash = cached_file_hash(path, self.hashes)
+        self.hashes.save()
+        return content_hash
+
+    def transcode_all(self, sources):
+        """{path: phone copy path} for {path: content hash or None}, encoding only uncached ones.
+
+        Files that aren't JPEGs, are already small enough, or fail to decode are
+        left out, so the caller sends their originals. The copies returned stay
+        in the cache until close(), however many more this run encodes.
+        """
+        copies = {}
+        todo = []
+        for path, content_hash in sources.items():
+            if not is_transcodable(path):
+                continue
+            content_hash = content_hash or self.content_hash(path)
+            cached = self.cache.get(content_hash, self.variant)
+            if cached:
+                self.cache.pin(cached)
+                copies[path] = cached
+            else:
+                todo.append((path, content_hash))
+        if not todo:
+            return copies
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(todo))) as pool:
+            jobs = [(path, self.long_edge, self.quality) for path, _ in todo]
+            for (path, content_hash), data in zip(todo, pool.map(_transcode_safely, jobs, chunksize=4)):
+                if data:
+                    copies[path] = self.cache.put(content_hash, self.variant, data)
+                    self.cache.pin(copies[path])
+                    self.encoded += 1
+        return copies
+
+    def close(self):
+        self.cache.unpin_all()
+        if self.hashes is not None:
+            self.hashes.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare downscaled phone copies of a folder of JPEGs.")
+    parser.add_argument("folder", help="Folder of originals, e.g. tx_to_mobile's local_folder")
+    parser.add_argument("--cache", help="Folder of phone copies (default: <folder>_mobile)")
+    parser.add_argument("--long-edge", type=int, default=MOBILE_LONG_EDGE, help="Longest side in pixels")
+    parser.add_argument("--quality", type=int, default=MOBILE_QUALITY, help="JPEG quality")
+    parser.add_argument("--workers", type=int, default=TRANSCODE_WORKERS,
+                        help=f"Processes encoding (default: {TRANSCODE_WORKERS})")
+    args = parser.parse_args()
+
+    transcoder = MobileTranscoder(args.cache or default_cache_folder(args.folder), args.long_edge, args.quality,
+                                  workers=args.workers)
+    paths = [path for path in iter_files(args.folder) if is_transcodable(path)]
+    copies = transcoder.transcode_all({path: None for path in paths})
+    original = sum(os.path.getsize(path) for path in copies)
+    reduced = sum(os.path.getsize(path) for path in copies.values())
+    print(f"{len(copies)} of {len(paths)} JPEGs have phone copies ({transcoder.encoded} encoded now), "
+          f"{original / 1024 ** 2:.1f} MB -> {reduced / 1024 ** 2:.1f} MB.")
+    transcoder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import re
+import sys
+import time
+import select
+import fnmatch
+
+import psutil
+
+POLL_INTERVAL = 3  # Seconds between checks for the polling backend
+PROC_MOUNTS = '/proc/self/mounts'
+
+
+def default_mount_points():
+    """Mount point patterns where camera cards usually appear on this platform."""
+    if os.name == 'nt':
+        return ['D:\\']
+    if sys.platform == 'darwin':
+        return ['/Volumes/*']
+    return ['/media/*/*', '/run/media/*/*']  # Where udisks mounts removable media; /mnt is often permanent
+
+
+def _unescape_mount_field(field):
+    # /proc/self/mounts escapes space, tab, newline and backslash as octal (e.g. \040).
+    field = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), field)
+    return field.encode('latin-1').decode('utf-8', 'replace')
+
+
+class MountDetector:
+    """Reports camera cards mounting and unmounting at the configured mount points.
+
+    ``patterns`` are glob patterns matched against the mount point (or device)
+    of each partition. This portable version re-reads the partition list every
+    ``interval`` seconds; subclasses override wait() to sleep until the system
+    reports a change instead.
+    """
+
+    name = 'polling'
+
+    def __init__(self, patterns, interval=POLL_INTERVAL):
+        self.patterns = [os.path.normcase(p) for p in patterns]
+        self.interval = interval
+
+    def matches(self, mountpoint, device=''):
+        mountpoint, device = os.path.normcase(mountpoint), os.path.normcase(device)
+        return any(fnmatch.fnmatch(mountpoint, p) or fnmatch.fnmatch(device, p) for p in self.patterns)
+
+    def list_mounts(self):
+        """Return [(device, mountpoint)] for every mounted partition."""
+        return [(part.device, part.mountpoint) for part in psutil.disk_partitions()]
+
+    def mounted(self):
+        """Return the set of mount points currently mounted that match a pattern."""
+        return {mountpoint for device, mountpoint in self.list_mounts() if self.matches(mountpoint, device)}
+
+    def wait(self):
+        """Block until the mount table may have changed."""
+        time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+    def events(self):
+        """Yield (added, removed) sets of mount points, starting with what is mounted now."""
+        known = set()
+        try:
+            while True:
+                current = self.mounted()
+                added, removed = current - known, known - current
+                known = current
+                if added or removed:
+                    yield added, removed
+                self.wait()
+        finally:
+            self.close()
+
+
+class LinuxMountDetector(MountDetector):
+    """Sleeps in poll() on /proc/self/mounts, which the kernel wakes on every mount or unmount."""
+
+    name = 'proc-mounts'
+
+    def __init__(self, patterns):
+        super().__init__(patterns)
+        self.mounts_file = open(PROC_MOUNTS, 'r', encoding='latin-1')
+        self.poller = select.poll()
+        self.poller.register(self.mounts_file.fileno(), select.POLLERR | select.POLLPRI)
+
+    def list_mounts(self):
+        # Reading the file also re-arms the poll notification.
+        self.mounts_file.seek(0)
+        mounts = []
+        for line in self.mounts_file.read().splitlines():
+            fields = line.split()
+            if len(fields) >= 2:
+                mounts.append((_unescape_mount_field(fields[0]), _unescape_mount_field(fields[1])))
+        return mounts
+
+    def wait(self):
+        self.poller.poll()
+
+    def close(self):
+        self.mounts_file.close()
+
+
+def create_detector(patterns=None, backend='auto', interval=POLL_INTERVAL):
+    """Pick the event-driven backend where the platform supports it, polling otherwise."""
+    patterns = patterns or default_mount_points()
+    if backend in ('auto', 'proc-mounts') and sys.platform.startswith('linux') and hasattr(select, 'poll'):
+        try:
+            return LinuxMountDetector(patterns)
+        except OSError as e:
+            if backend == 'proc-mounts':
+                raise
+            print(f"⚠️ {PROC_MOUNTS} unavailable ({e}), falling back to polling.")
+    elif backend == 'proc-mounts':
+        raise ValueError("The proc-mounts backend is only available on Linux")
+    return MountDetector(patterns, interval)
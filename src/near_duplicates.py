@@ -0,0 +1,240 @@
+import os
+import json
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from catalog import Catalog
+
+HASH_SIZE = 8  # dHash/pHash grids are 8x8, i.e. 64-bit hashes
+PHASH_SIZE = 32  # pHash takes the DCT of a 32x32 thumbnail
+DECODE_SIZE = 2 * PHASH_SIZE  # JPEGs are decoded at the smallest DCT scale at least this big
+HASHABLE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.bmp')  # What PIL decodes (not CR3)
+HAMMING_THRESHOLD = 7  # Max differing bits for two frames to count as near duplicates
+HASH_WORKERS = os.cpu_count() or 1  # Decoding is CPU bound, use every core
+WORKER_CHUNKSIZE = 64  # Files handed to a worker process at a time
+HASH_BATCH = 4096  # Thumbnails hashed per vectorized batch
+MIH_CHUNKS = 4  # Multi-index hashing splits each 64-bit hash into 4 16-bit keys
+
+if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+    popcount64 = np.bitwise_count
+else:
+    _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount64(values):
+        values = np.ascontiguousarray(values, dtype=np.uint64)
+        return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+
+def decode_thumbnails(path):
+    """Grayscale 32x32 (pHash) and 9x8 (dHash) thumbnails of an image, or None if it can't be read."""
+    try:
+        with Image.open(path) as img:
+            # For JPEGs, decode at 1/2..1/8 scale inside libjpeg instead of full size.
+            img.draft("L", (DECODE_SIZE, DECODE_SIZE))
+            gray = img.convert("L")
+            small = gray.resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR)
+            tiny = small.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+            return np.asarray(small, dtype=np.uint8), np.asarray(tiny, dtype=np.uint8)
+    except Exception as e:
+        print(f"Cannot hash {path}: {e}")
+        return None
+
+
+def _pack_bits(bits):
+    """N x 64 booleans -> N uint64 hashes, first bit most significant."""
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def dhash_batch(tiny):
+    """Difference hashes of N x 8 x 9 grayscale thumbnails: is each pixel brighter than its left neighbour."""
+    tiny = np.asarray(tiny, dtype=np.int16)
+    return _pack_bits((tiny[:, :, 1:] > tiny[:, :, :-1]).reshape(len(tiny), -1))
+
+
+def phash_batch(small):
+    """Perceptual hashes of N x 32 x 32 grayscale thumbnails: low DCT frequencies above their median."""
+    small = np.asarray(small, dtype=np.float32)
+    low = (_DCT @ small @ _DCT.T)[:, :HASH_SIZE, :HASH_SIZE].reshape(len(small), -1)
+    median = np.median(low[:, 1:], axis=1)  # The DC term only says how bright the image is
+    return _pack_bits(low > median[:, None])
+
+
+def compute_hashes(paths, workers=HASH_WORKERS):
+    """Yield (path, dhash, phash) for every readable image; decodes on a process pool."""
+    def hash_batches(decoded):
+        batch = []
+        for path, thumbs in decoded:
+            if thumbs is not None:
+                batch.append((path, thumbs))
+            if len(batch) == HASH_BATCH:
+                yield from _hash_batch(batch)
+                batch = []
+        if batch:
+            yield from _hash_batch(batch)
+
+    if workers <= 1:
+        yield from hash_batches(zip(paths, map(decode_thumbnails, paths)))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from hash_batches(zip(paths, pool.map(decode_thumbnails, paths, chunksize=WORKER_CHUNKSIZE)))
+
+
+def _hash_batch(batch):
+    dhashes = dhash_batch(np.stack([tiny for _, (_, tiny) in batch]))
+    phashes = phash_batch(np.stack([small for _, (small, _) in batch]))
+    for (path, _), dhash, phash in zip(batch, dhashes, phashes):
+        yield path, int(dhash), int(phash)
+
+
+def _flip_masks(bits, radius):
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks.extend(sum(1 << b for b in combo) for combo in itertools.combinations(range(bits), r))
+    return np.array(masks, dtype=np.uint64)
+
+
+def find_similar_pairs(hashes, threshold=HAMMING_THRESHOLD):
+    """Index pairs (i < j) of hashes within threshold bits of each other, as two arrays.
+
+    Multi-index hashing: if two 64-bit hashes differ in at most threshold bits,
+    at least one of their four 16-bit chunks differs in at most threshold // 4
+    bits. Each chunk is sorted once and every hash looks up its chunk with up
+    to that many bits flipped, so only bucket-mates are ever compared, and all
+    lookups for one chunk/flip run as a single vectorized gather.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    chunk_bits = 64 // MIH_CHUNKS
+    chunk_mask = np.uint64((1 << chunk_bits) - 1)
+    masks = _flip_masks(chunk_bits, threshold // MIH_CHUNKS).astype(np.intp)
+    # 32-bit indices halve the memory traffic of the candidate expansion below.
+    index_type = np.int32 if len(hashes) < 2 ** 31 else np.int64
+    index = np.arange(len(hashes), dtype=index_type)
+    found = []
+    for chunk in range(MIH_CHUNKS):
+        keys = ((hashes >> np.uint64(chunk * chunk_bits)) & chunk_mask).astype(np.intp)
+        # Bucket table: the hashes with key k are order[bucket_start[k]:bucket_start[k] + bucket_size[k]]
+        order = np.argsort(keys, kind="stable").astype(index_type)
+        bucket_size = np.bincount(keys, minlength=1 << chunk_bits).astype(index_type)
+        bucket_start = np.cumsum(bucket_size, dtype=index_type) - bucket_size
+        for mask in masks:
+            queries = keys ^ mask
+            lo = bucket_start[queries]
+            counts = bucket_size[queries]
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Expand every query i into (i, each hash in its bucket)
+            starts = np.repeat(lo - (np.cumsum(counts, dtype=index_type) - counts), counts)
+            i = np.repeat(index, counts)
+            j = order[starts + np.arange(total, dtype=index_type)]
+            keep = i < j
+            i, j = i[keep], j[keep]
+            keep = popcount64(hashes[i] ^ hashes[j]) <= threshold
+            found.append(i[keep].astype(np.int64) * len(hashes) + j[keep])
+    if not found:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.unique(np.concatenate(found))  # The same pair can match in several chunks
+    return pairs // len(hashes), pairs % len(hashes)
+
+
+def connected_components(n, i, j):
+    """Component label per node for an undirected graph given as edge arrays."""
+    labels = np.arange(n)
+    while True:
+        smallest = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, smallest)
+        np.minimum.at(updated, j, smallest)
+        updated = updated[updated]  # Pointer jumping, halves the remaining path lengths
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_hashes(hashes, threshold=HAMMING_THRESHOLD):
+    """Groups (lists of indices, 2 or more each) of hashes linked by near-duplicate pairs."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    # Identical hashes (bursts of the same scene, copies) are searched once.
+    unique, inverse = np.unique(hashes, return_inverse=True)
+    i, j = find_similar_pairs(unique, threshold)
+    labels = connected_components(len(unique), i, j)[inverse.ravel()]
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    return [order[start:start + size].tolist() for start, size in zip(starts[sizes > 1], sizes[sizes > 1])]
+
+
+def hashable_entries(catalog):
+    return [entry for entry in catalog.find_by_type("IMAGES")
+            if not entry.get("duplicate_of") and entry["filepath"].lower().endswith(HASHABLE_EXTENSIONS)]
+
+
+def update_catalog_hashes(catalog, workers=HASH_WORKERS):
+    """Compute dhash/phash for catalog images that don't have them yet. Returns how many were added."""
+    paths = [entry["filepath"] for entry in hashable_entries(catalog)
+             if "phash" not in entry and os.path.exists(entry["filepath"])]
+    added = 0
+    for path, dhash, phash in compute_hashes(paths, workers):
+        catalog.update(path, dhash=f"{dhash:016x}", phash=f"{phash:016x}")
+        added += 1
+    return added
+
+
+def find_clusters(catalog, threshold=HAMMING_THRESHOLD, kind="phash"):
+    """Near-duplicate groups of catalog entries, each sorted by capture date."""
+    entries = [entry for entry in hashable_entries(catalog) if kind in entry]
+    hashes = np.array([int(entry[kind], 16) for entry in entries], dtype=np.uint64)
+    clusters = [[entries[index] for index in group] for group in cluster_hashes(hashes, threshold)]
+    for cluster in clusters:
+        cluster.sort(key=lambda entry: entry.get("creation_date") or "")
+    clusters.sort(key=lambda cluster: cluster[0].get("creation_date") or "")
+    return clusters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate photos (bursts, re-edits) in the organized library.")
+    parser.add_argument("folder", help="Organized folder holding catalog.jsonl")
+    parser.add_argument("--threshold", type=int, default=HAMMING_THRESHOLD,
+                        help=f"Max differing hash bits (default: {HAMMING_THRESHOLD})")
+    parser.add_argument("--hash", dest="kind", choices=["phash", "dhash"], default="phash",
+                        help="Hash to compare (default: phash)")
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS,
+                        help=f"Processes decoding images (default: {HASH_WORKERS})")
+    parser.add_argument("--output", help="Write the clusters to this JSON file")
+    args = parser.parse_args()
+
+    catalog = Catalog(args.folder)
+    added = update_catalog_hashes(catalog, args.workers)
+    print(f"Hashed {added} new images.")
+    clusters = find_clusters(catalog, args.threshold, args.kind)
+    catalog.close()
+
+    print(f"Found {len(clusters)} groups of near duplicates "
+          f"({sum(len(cluster) for cluster in clusters)} images).")
+    for cluster in clusters:
+        print(f"  {len(cluster)} images from {cluster[0].get('creation_date')}:")
+        for entry in cluster:
+            print(f"    {entry['filepath']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([[entry["filepath"] for entry in cluster] for cluster in clusters], f, indent=4)
+        print(f"Wrote clusters to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,42 @@
 import os
 import shutil
-import json
+import argparse
 from datetime import datetime
 from PIL import Image, ExifTags
 import exifread
-from fractions import Fraction
-import numbers
-import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import Catalog
+from media_metadata import read_exif_fast, read_video_metadata
+from source_scan import SourceScanner, SNAPSHOT_NAME
+from transfer import move_with_hash, supports_hardlinks
+from dedup import DuplicateIndex, DUPLICATE_POLICIES
+from file_hashing import DEFAULT_ALGORITHM
 
 # Configure paths
-SOURCE_FOLDER = r'D:\DCIM\100CANON'
+SOURCE_FOLDER = r'D:\DCIM\100CANON'  # Default source, override with --source (repeatable, one per card)
 DESTINATION_FOLDER = r'D:\DCIM\100CANON\organized'
-METADATA_FILE = os.path.join(DESTINATION_FOLDER, "metadata.json")
+METADATA_FILE = os.path.join(DESTINATION_FOLDER, "metadata.json")  # Legacy export, see --export-legacy
+QUARANTINE_FOLDER = os.path.join(DESTINATION_FOLDER, "duplicates")  # Where --duplicates quarantine moves them
 
 SUPPORTED_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.cr3')
 SUPPORTED_VIDEO_EXTENSIONS = ('.mp4', '.mov')
+WORKER_CHUNKSIZE = 16  # Files handed to a worker process at a time with --workers
+HASH_ALGORITHM = DEFAULT_ALGORITHM  # Content hash stored per catalog entry; md5 matches usb_watcher
+# What to do with a file whose content is already in the library:
+#   skip       - leave it where it is, recorded in the catalog so later runs don't check it again
+#   link       - hardlink the library copy into the file's dated folder, then remove the file
+#                (quarantine instead when the library's filesystem has no hard links, e.g. FAT/exFAT)
+#   quarantine - move it to QUARANTINE_FOLDER
+#   off        - no duplicate check, organize everything
+DUPLICATE_POLICY = "skip"
+
+# MP4/MOV creation_time is UTC by spec, but some cameras write local time. Set False for those.
+VIDEO_CREATION_TIME_IS_UTC = True
 
-def load_existing_metadata():
-    if os.path.exists(METADATA_FILE):
-        try:
-            with open(METADATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print("Warning: Corrupt metadata.json file. Creating a new one.")
-    return {"files": []}
-
-def convert_metadata_to_json_serializable(metadata):
-    """Converts metadata dictionary to a JSON-serializable format."""
-    def convert_value(value):
-        if isinstance(value, bytes):  # Convert bytes to string
-            return value.decode(errors="ignore")
-        if isinstance(value, (Fraction, numbers.Rational)):  # Convert IFDRational and Fraction to float
-            return float(value)
-        if isinstance(value, dict):  # Recursively process dictionaries
-            return {k: convert_value(v) for k, v in value.items()}
-        if isinstance(value, list):  # Recursively process lists
-            return [convert_value(v) for v in value]
-        return value
-
-    return {k: convert_value(v) for k, v in metadata.items()}
-
-
-def save_metadata(metadata):
-    json_serializable_metadata = convert_metadata_to_json_serializable(metadata)
-    with tempfile.NamedTemporaryFile('w', delete=False, encoding='utf-8', dir=os.path.dirname(METADATA_FILE)) as tmpfile:
-        json.dump(json_serializable_metadata, tmpfile, indent=4)
-        temp_path = tmpfile.name
-    os.replace(temp_path, METADATA_FILE)
+def open_catalog():
+    """Open the append-only catalog; an existing metadata.json is imported on first change."""
+    return Catalog(DESTINATION_FOLDER)
 
 def extract_exif(image):
     exif_data = {}
@@ -76,6 +66,45 @@ def extract_date(exif_data, is_raw=False):
         print(f"Date parsing error: {e}")
     return None
 
+def get_date_taken(exif_data):
+    """Capture date from PIL-style or exifread-style EXIF data, or None."""
+    if 'EXIF DateTimeOriginal' in exif_data:
+        return extract_date(exif_data, is_raw=True)
+    return extract_date(exif_data)
+
+def get_decimal_from_dms(dms, ref):
+    """Convert (degrees, minutes, seconds) rationals to signed decimal degrees."""
+    def to_float(value):
+        if isinstance(value, tuple):
+            return value[0] / value[1] if value[1] else 0.0
+        return float(value)
+
+    degrees, minutes, seconds = (to_float(v) for v in dms)
+    decimal = degrees + minutes / 60 + seconds / 3600
+    return -decimal if ref in ('S', 'W') else decimal
+
+def get_gps_coords(exif_data):
+    """Return (latitude, longitude) from a PIL-style GPSInfo dict keyed by tag id, or None."""
+    gps_info = exif_data.get('GPSInfo')
+    if not isinstance(gps_info, dict):
+        return None
+    gps = {ExifTags.GPSTAGS.get(tag, tag): value for tag, value in gps_info.items()}
+    try:
+        lat = get_decimal_from_dms(gps['GPSLatitude'], gps.get('GPSLatitudeRef', 'N'))
+        lon = get_decimal_from_dms(gps['GPSLongitude'], gps.get('GPSLongitudeRef', 'E'))
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+    return lat, lon
+
+def get_video_date(video_info):
+    """Local capture time from read_video_metadata output, or None."""
+    creation_time = video_info.get("creation_time") if video_info else None
+    if creation_time is None:
+        return None
+    if VIDEO_CREATION_TIME_IS_UTC:
+        return creation_time.astimezone().replace(tzinfo=None)
+    return creation_time.replace(tzinfo=None)
+
 def get_file_date(file_path):
     try:
         timestamp = os.path.getctime(file_path) if os.name == 'nt' else os.path.getmtime(file_path)
@@ -84,7 +113,12 @@ def get_file_date(file_path):
         print(f"File date error for {file_path}: {e}")
     return None
 
-def organize_file(file_path, metadata):
+def extract_file_info(file_path):
+    """Read everything needed to place a file. Pure, so it can run in a worker process.
+
+    Returns a dict with the source path, the destination sub-folder parts and the
+    catalog fields, or None if the file can't be dated.
+    """
     filename = os.path.basename(file_path)
     file_ext = os.path.splitext(filename)[1].lower()
 
@@ -92,61 +126,262 @@ def organize_file(file_path, metadata):
     is_video = file_ext in SUPPORTED_VIDEO_EXTENSIONS
 
     exif_data = {}
+    video_info = None
     date_taken = None
 
     try:
-        if is_raw:
+        # Header-only fast path first, the full PIL/exifread parse only when it finds no date.
+        fast_exif = None if is_video else read_exif_fast(file_path)
+        fast_date = get_date_taken(fast_exif) if fast_exif else None
+        if fast_date:
+            exif_data, date_taken = fast_exif, fast_date
+        elif is_raw:
             exif_data = extract_cr3_exif(file_path)
             date_taken = extract_date(exif_data, is_raw=True) or get_file_date(file_path)
         elif file_ext in SUPPORTED_IMAGE_EXTENSIONS:
             with Image.open(file_path) as img:
                 exif_data = extract_exif(img)
                 date_taken = extract_date(exif_data) or get_file_date(file_path)
+        elif is_video:
+            # mvhd creation_time survives copies, the file timestamps don't.
+            video_info = read_video_metadata(file_path)
+            date_taken = get_video_date(video_info) or get_file_date(file_path)
         else:
-            date_taken = get_file_date(file_path)  # For videos or unknown types
+            date_taken = get_file_date(file_path)  # For unknown types
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
-        return
+        return None
 
     if not date_taken:
         print(f"No date available for {file_path}. Skipping.")
-        return
+        return None
 
     year, month, day = date_taken.strftime('%Y'), date_taken.strftime('%m'), date_taken.strftime('%d')
     category = 'raw' if is_raw else 'videos' if is_video else 'images'
-    dest_folder = os.path.join(DESTINATION_FOLDER, year, month, day, category)
-    os.makedirs(dest_folder, exist_ok=True)
-    destination_path = os.path.join(dest_folder, filename)
+
+    # Everything after filename/filepath in the catalog entry
+    entry = {
+        "creation_date": date_taken.isoformat(),
+        "file_type": category.upper()
+    }
+    if isinstance(exif_data.get('Orientation'), int):
+        entry["orientation"] = exif_data['Orientation']
+    coords = get_gps_coords(exif_data)
+    if coords:
+        entry["gps"] = {"latitude": coords[0], "longitude": coords[1]}
+    if video_info:
+        entry["video"] = {
+            "duration": round(video_info["duration"], 3) if video_info["duration"] else None,
+            "width": video_info["width"],
+            "height": video_info["height"]
+        }
+
+    return {"file_path": file_path, "filename": filename,
+            "folder_parts": (year, month, day, category), "entry": entry}
+
+def destination_for(info, created_dirs=None):
+    """Destination path for a file described by extract_file_info, creating its folder.
+
+    created_dirs caches destination folders already created this run, so each
+    date folder is created once rather than once per file.
+    """
+    dest_folder = os.path.join(DESTINATION_FOLDER, *info["folder_parts"])
+    if created_dirs is None or dest_folder not in created_dirs:
+        os.makedirs(dest_folder, exist_ok=True)
+        if created_dirs is not None:
+            created_dirs.add(dest_folder)
+    return os.path.join(dest_folder, info["filename"])
+
+def place_file(info, catalog, created_dirs=None, content_hash=None):
+    """Move a file described by extract_file_info and record it in the catalog.
+
+    The content hash is computed while the file is moved (see
+    transfer.move_with_hash), unless the duplicate check already read it, and
+    stored with its size and mtime, so later stages never need to read the file
+    again to know its content. Returns the catalog entry, or None if the move failed.
+    """
+    destination_path = destination_for(info, created_dirs)
+    file_path = info["file_path"]
+
+    entry = {"filename": info["filename"], "filepath": os.path.abspath(destination_path)}
+    entry.update(info["entry"])
 
     try:
-        shutil.move(file_path, destination_path)
-        metadata["files"].append({
-            "filename": filename,
-            "filepath": os.path.abspath(destination_path),
-            "creation_date": date_taken.isoformat(),
-            "file_type": category.upper()
-        })
+        content_hash = move_with_hash(file_path, destination_path, HASH_ALGORITHM, content_hash)
+        st = os.stat(destination_path)
+        entry.update(content_hash=content_hash, hash_algorithm=HASH_ALGORITHM,
+                     size=st.st_size, mtime_ns=st.st_mtime_ns)
+        catalog.add(entry)
         print(f"Organized {file_path} -> {destination_path}")
+        return entry
     except Exception as e:
         print(f"Failed to move {file_path}: {e}")
+        return None
+
+def handle_duplicate(info, original, catalog, policy, created_dirs=None, content_hash=None):
+    """Apply the duplicate policy to a file whose content matches the library entry original."""
+    file_path = info["file_path"]
+    original_path = original.get("duplicate_of") or original["filepath"]
+    try:
+        if policy == "skip":
+            # Recorded under its own path, so the next run doesn't hash it again while it is unchanged
+            st = os.stat(file_path)
+            entry = {"filename": info["filename"], "filepath": os.path.abspath(file_path)}
+            entry.update(info["entry"])
+            entry.update(content_hash=content_hash or original.get("content_hash"), hash_algorithm=HASH_ALGORITHM,
+                         size=st.st_size, mtime_ns=st.st_mtime_ns, duplicate_of=original_path, skipped=True)
+            catalog.add(entry)
+            print(f"Duplicate of {original_path}, leaving {file_path} in place")
+        elif policy == "quarantine":
+            os.makedirs(QUARANTINE_FOLDER, exist_ok=True)
+            name, ext = os.path.splitext(info["filename"])
+            destination_path = os.path.join(QUARANTINE_FOLDER, info["filename"])
+            counter = 1
+            while os.path.exists(destination_path):
+                destination_path = os.path.join(QUARANTINE_FOLDER, f"{name}_{counter}{ext}")
+                counter += 1
+            shutil.move(file_path, destination_path)
+            print(f"Duplicate of {original_path}, quarantined {file_path} -> {destination_path}")
+        elif policy == "link":
+            destination_path = destination_for(info, created_dirs)
+            if os.path.exists(destination_path):
+                if not os.path.samefile(destination_path, original_path):
+                    raise FileExistsError(f"{destination_path} already exists")
+                # Same name and date as the library copy: already in place
+                os.remove(file_path)
+                print(f"Duplicate of {original_path}, removed {file_path}")
+                return
+            os.link(original_path, destination_path)
+            os.remove(file_path)
+            entry = {"filename": info["filename"], "filepath": os.path.abspath(destination_path)}
+            entry.update(info["entry"])
+            entry.update((key, original[key]) for key in ("content_hash", "hash_algorithm", "size", "mtime_ns")
+                         if key in original)
+            entry["duplicate_of"] = original_path
+            catalog.add(entry)
+            print(f"Duplicate of {original_path}, linked {file_path} -> {destination_path}")
+    except Exception as e:
+        print(f"Failed to handle duplicate {file_path}: {e}")
+
+def organize_file(file_path, catalog, created_dirs=None):
+    info = extract_file_info(file_path)
+    if info:
+        place_file(info, catalog, created_dirs)
 
 def is_supported_file(filename):
     return filename.lower().endswith(SUPPORTED_IMAGE_EXTENSIONS + SUPPORTED_VIDEO_EXTENSIONS)
 
-def main():
-    metadata = load_existing_metadata()
-    already_processed = set(os.path.abspath(entry["filepath"]) for entry in metadata.get("files", []))
+def processed_paths(catalog):
+    """Catalog paths not to organize again.
+
+    Duplicates left in place by the skip policy only count while their size and
+    mtime are unchanged, since cameras reuse file names on a freshly formatted card.
+    """
+    paths = set()
+    for entry in catalog:
+        if entry.get("skipped"):
+            try:
+                st = os.stat(entry["filepath"])
+            except OSError:
+                continue
+            if (st.st_size, st.st_mtime_ns) != (entry.get("size"), entry.get("mtime_ns")):
+                continue
+        paths.add(os.path.abspath(entry["filepath"]))
+    return paths
 
-    for root, _, files in os.walk(SOURCE_FOLDER):
-        for file in files:
-            full_path = os.path.abspath(os.path.join(root, file))
-            if is_supported_file(file) and full_path not in already_processed:
-                organize_file(full_path, metadata)
+def find_new_files(source_folders, already_processed):
+    """Supported files in the sources that are not in the catalog yet.
+
+    The organized destination is excluded and directories unchanged since the
+    last run are not listed again (see source_scan.SourceScanner).
+    """
+    scanner = SourceScanner(os.path.join(DESTINATION_FOLDER, SNAPSHOT_NAME),
+                            exclude=[DESTINATION_FOLDER], file_filter=is_supported_file)
+    new_files = []
+    skipped = 0
+    for source_folder in source_folders:
+        print(f"Organizing files from {source_folder}")
+        for full_path in scanner.scan(source_folder):
+            if full_path in already_processed:
+                skipped += 1
             else:
-                print(f"Skipping already organized file: {full_path}")
+                new_files.append(full_path)
+    scanner.save()
+    print(f"Scanned {scanner.listed} changed and {scanner.reused} unchanged folders: "
+          f"{len(new_files)} new files, skipped {skipped} already organized.")
+    return new_files
+
+def place_files(infos, catalog, duplicates=None, duplicate_policy=DUPLICATE_POLICY):
+    """Place files in input order, checking each against the library first when duplicates is given."""
+    created_dirs = set()
+    for info in infos:
+        if not info:
+            continue
+        previous = catalog.get(info["file_path"])
+        if previous and previous.get("skipped"):  # Skipped before but changed since, check it again
+            catalog.remove(info["file_path"])
+        original = content_hash = None
+        if duplicates is not None:
+            try:
+                original = duplicates.find(info["file_path"])
+            except OSError as e:
+                print(f"Duplicate check failed for {info['file_path']}: {e}")
+            content_hash = duplicates.pop_hash(info["file_path"])
+        if original:
+            handle_duplicate(info, original, catalog, duplicate_policy, created_dirs, content_hash)
+            continue
+        entry = place_file(info, catalog, created_dirs, content_hash)
+        if entry and duplicates is not None:
+            duplicates.add(entry)  # Catches the same shot on two cards in one run
+
+def organize_files(file_paths, catalog, workers=1, duplicate_policy=DUPLICATE_POLICY):
+    """Organize files, extracting metadata on a process pool when workers > 1.
+
+    Moves and catalog updates always happen here, one file at a time and in
+    input order, so the catalog is identical to a serial run.
+    """
+    if duplicate_policy == "link":
+        os.makedirs(DESTINATION_FOLDER, exist_ok=True)
+        if not supports_hardlinks(DESTINATION_FOLDER):
+            print(f"{DESTINATION_FOLDER} doesn't support hard links, quarantining duplicates instead")
+            duplicate_policy = "quarantine"
+    duplicates = None if duplicate_policy == "off" else DuplicateIndex(catalog, HASH_ALGORITHM)
+    if workers <= 1:
+        place_files(map(extract_file_info, file_paths), catalog, duplicates, duplicate_policy)
+    else:
+        # Small chunks keep every worker busy on short runs, larger ones cut IPC on big cards.
+        chunksize = max(1, min(WORKER_CHUNKSIZE, len(file_paths) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            place_files(pool.map(extract_file_info, file_paths, chunksize=chunksize),
+                        catalog, duplicates, duplicate_policy)
+    if duplicates is not None and file_paths:
+        print(duplicates.summary())
+
+def main(source_folders=None, workers=1, export_legacy=False, duplicate_policy=DUPLICATE_POLICY):
+    catalog = open_catalog()
+    already_processed = processed_paths(catalog)
+
+    new_files = find_new_files(source_folders or [SOURCE_FOLDER], already_processed)
+    organize_files(new_files, catalog, workers, duplicate_policy)
+
+    catalog.close()
+    if export_legacy:
+        catalog.export_legacy(METADATA_FILE)
+        print(f"Exported catalog to {METADATA_FILE}")
 
-    save_metadata(metadata)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Organize photos and videos into dated folders.")
+    parser.add_argument("--source", action="append", dest="source_folders", metavar="DIR",
+                        help=f"Folder to organize, repeatable for several cards (default: {SOURCE_FOLDER})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"Processes extracting metadata in parallel (default: 1, serial; try {os.cpu_count()})")
+    parser.add_argument("--export-legacy", action="store_true",
+                        help="Also write the full catalog to metadata.json for older tools")
+    parser.add_argument("--duplicates", choices=DUPLICATE_POLICIES, default=DUPLICATE_POLICY,
+                        help=f"What to do with files already in the library (default: {DUPLICATE_POLICY})")
+    return parser.parse_args()
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    main(args.source_folders, args.workers, args.export_legacy, args.duplicates)
     print("Finished organizing files.")
@@ -0,0 +1,230 @@
+import io
+import os
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from file_hashing import cached_file_hash, iter_files, DEFAULT_ALGORITHM
+from hash_manifest import HashManifest
+from media_metadata import read_cr3_preview, read_exif_fast
+
+PREVIEW_SIZES = {"thumb": 320, "medium": 1600}  # Longest side in pixels
+PREVIEW_QUALITY = 80  # JPEG quality of generated previews
+CACHE_MAX_BYTES = 2 * 1024 ** 3  # Least recently used previews are removed beyond this
+PREVIEW_WORKERS = os.cpu_count() or 1  # Processes rendering previews in bulk
+PREVIEWABLE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.cr3')
+HASH_DB_NAME = "hashes.sqlite"  # Stat-keyed content hashes of the originals, inside the cache folder
+
+# EXIF orientation -> transpose that puts the image upright (as ImageOps.exif_transpose)
+ORIENTATION_TRANSPOSE = {2: Image.FLIP_LEFT_RIGHT, 3: Image.ROTATE_180, 4: Image.FLIP_TOP_BOTTOM,
+                         5: Image.TRANSPOSE, 6: Image.ROTATE_270, 7: Image.TRANSVERSE, 8: Image.ROTATE_90}
+
+
+def default_cache_folder(folder):
+    """Previews of <folder> live next to it in <folder>_previews, so listings of folder stay clean."""
+    return os.path.normpath(folder) + "_previews"
+
+
+def is_previewable(path):
+    return path.lower().endswith(PREVIEWABLE_EXTENSIONS)
+
+
+def open_upright(path, max_side):
+    """Open an image for previewing at roughly max_side, upright.
+
+    JPEGs are decoded at the smallest DCT scale (1/2..1/8) that still covers
+    max_side; CR3 files use their embedded JPEG preview instead of the raw data.
+    """
+    if path.lower().endswith('.cr3'):
+        data = read_cr3_preview(path)
+        if data is None:
+            raise ValueError(f"No embedded preview in {path}")
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", (max_side, max_side))
+        orientation = (read_exif_fast(path) or {}).get('Orientation')
+        if orientation in ORIENTATION_TRANSPOSE:
+            return img.transpose(ORIENTATION_TRANSPOSE[orientation])
+        return img
+    img = Image.open(path)
+    img.draft("RGB", (max_side, max_side))
+    return ImageOps.exif_transpose(img)
+
+
+def render_previews(path, sizes=None):
+    """JPEG bytes of every requested preview size, {name: bytes}, decoding the image once."""
+    sizes = sorted(sizes or PREVIEW_SIZES, key=lambda name: PREVIEW_SIZES[name], reverse=True)
+    img = open_upright(path, PREVIEW_SIZES[sizes[0]]).convert("RGB")
+    previews = {}
+    for name in sizes:  # Largest first, each smaller one is scaled down from the previous
+        side = PREVIEW_SIZES[name]
+        img.thumbnail((side, side))
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=PREVIEW_QUALITY)
+        previews[name] = buffer.getvalue()
+    return previews
+
+
+def _render_safely(path):
+    try:
+        return render_previews(path)
+    except Exception as e:
+        print(f"Cannot render previews of {path}: {e}")
+        return None
+
+
+class PreviewCache:
+    """Preview files on disk keyed by content hash and size, evicted least recently used first.
+
+    Recency is the file mtime, refreshed on every hit, so the LRU order
+    survives restarts. The index is rebuilt from the folder on startup.
+    Pinned files are never evicted, while the caller still needs them.
+    """
+
+    def __init__(self, folder, max_bytes=CACHE_MAX_BYTES):
+        self.folder = os.path.abspath(folder)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # path -> size, least recently used first
+        self.pinned = set()
+        self.total_bytes = 0
+        os.makedirs(folder, exist_ok=True)
+        self.load()
+
+    def load(self):
+        found = []
+        for path in iter_files(self.folder):
+            if path.endswith(".jpg"):
+                st = os.stat(path)
+                found.append((st.st_mtime_ns, path, st.st_size))
+        for _, path, size in sorted(found):
+            self.entries[path] = size
+            self.total_bytes += size
+
+    def path_for(self, content_hash, size_name):
+        return os.path.join(self.folder, content_hash[:2], f"{content_hash}_{size_name}.jpg")
+
+    def get(self, content_hash, size_name):
+        """Path of a cached preview, or None."""
+        path = self.path_for(content_hash, size_name)
+        with self.lock:
+            if path not in self.entries:
+                return None
+            self.entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:  # Deleted behind our back
+            with self.lock:
+                self.total_bytes -= self.entries.pop(path, 0)
+            return None
+        return path
+
+    def put(self, content_hash, size_name, data):
+        path = self.path_for(content_hash, size_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", delete=False, dir=os.path.dirname(path), suffix=".tmp") as tmpfile:
+            tmpfile.write(data)
+        os.replace(tmpfile.name, path)
+        evicted = []
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(path, 0)
+            self.entries[path] = len(data)
+            for old_path in list(self.entries):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if old_path == path or old_path in self.pinned:
+                    continue
+                self.total_bytes -= self.entries.pop(old_path)
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        return path
+
+    def pin(self, path):
+        with self.lock:
+            self.pinned.add(path)
+
+    def unpin_all(self):
+        with self.lock:
+            self.pinned.clear()
+
+
+class PreviewStore:
+    """Previews of original files: content hashes (stat-cached) plus the PreviewCache."""
+
+    def __init__(self, folder, max_bytes=CACHE_MAX_BYTES, algorithm=DEFAULT_ALGORITHM):
+        self.cache = PreviewCache(folder, max_bytes)
+        self.hashes = HashManifest(os.path.join(folder, HASH_DB_NAME))
+        self.algorithm = algorithm
+
+    def content_hash(self, path):
+        content_hash = cached_file_hash(path, self.hashes, self.algorithm)
+        self.hashes.save()
+        return content_hash
+
+    def missing_sizes(self, content_hash):
+        return [name for name in PREVIEW_SIZES if self.cache.get(content_hash, name) is None]
+
+    def store(self, content_hash, previews):
+        return {name: self.cache.put(content_hash, name, data) for name, data in previews.items()}
+
+    def get_or_render(self, path, size_name, content_hash=None):
+        """Return (preview path, content hash), rendering every missing size on a miss."""
+        content_hash = content_hash or self.content_hash(path)
+        cached = self.cache.get(content_hash, size_name)
+        if cached:
+            return cached, content_hash
+        paths = self.store(content_hash, render_previews(path, self.missing_sizes(content_hash) or [size_name]))
+        return paths[size_name], content_hash
+
+    def render_missing(self, path):
+        """Render whatever previews of path are not cached yet (used right after an upload)."""
+        content_hash = self.content_hash(path)
+        missing = self.missing_sizes(content_hash)
+        if missing:
+            self.store(content_hash, render_previews(path, missing))
+
+    def close(self):
+        self.hashes.close()
+
+
+def generate_previews(paths, store, workers=PREVIEW_WORKERS):
+    """Render all missing previews of paths on a process pool. Returns how many files were rendered."""
+    todo = []
+    for path in paths:
+        content_hash = store.content_hash(path)
+        if store.missing_sizes(content_hash):
+            todo.append((path, content_hash))
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for (path, content_hash), previews in zip(todo, pool.map(_render_safely, [p for p, _ in todo], chunksize=4)):
+            if previews:
+                store.store(content_hash, previews)
+                rendered += 1
+    return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render thumbnails and previews for a folder of photos.")
+    parser.add_argument("folder", help="Folder of originals, e.g. the cloud server's UPLOAD_FOLDER")
+    parser.add_argument("--cache", help="Preview cache folder (default: <folder>_previews)")
+    parser.add_argument("--workers", type=int, default=PREVIEW_WORKERS,
+                        help=f"Processes rendering previews (default: {PREVIEW_WORKERS})")
+    args = parser.parse_args()
+
+    store = PreviewStore(args.cache or default_cache_folder(args.folder))
+    paths = [path for path in iter_files(args.folder) if is_previewable(path)]
+    rendered = generate_previews(paths, store, args.workers)
+    print(f"Rendered previews for {rendered} of {len(paths)} images "
+          f"({len(store.cache.entries)} previews, {store.cache.total_bytes / 1024 ** 2:.1f} MB cached).")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import time
+import threading
+
+PROGRESS_INTERVAL = 2.0  # Seconds between periodic progress lines
+
+
+def format_size(num_bytes):
+    """Human readable byte count, e.g. 1.5 GB."""
+    size = float(num_bytes)
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds):
+    """Compact duration, e.g. 1h 02m, 3m 05s or 12s."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ThroughputMeter:
+    """Thread-safe counter of files/bytes processed with periodic rate reporting."""
+
+    def __init__(self, label="", interval=PROGRESS_INTERVAL, group=None, total_bytes=None):
+        self.label = label
+        self.interval = interval
+        self.group = group
+        self.total_bytes = total_bytes  # Enables the ETA in summaries when known
+        self.lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.start = time.monotonic()
+        self.last_report = self.start
+
+    def add(self, num_bytes, files=1):
+        with self.lock:
+            self.files += files
+            self.bytes += num_bytes
+
+    def skip(self, files=1):
+        with self.lock:
+            self.skipped += files
+
+    def elapsed(self):
+        return max(time.monotonic() - self.start, 1e-9)
+
+    def rates(self):
+        """Return (bytes per second, files per second) since the meter started."""
+        elapsed = self.elapsed()
+        return self.bytes / elapsed, self.files / elapsed
+
+    def summary(self):
+        bytes_per_sec, files_per_sec = self.rates()
+        text = (f"{self.files} files, {format_size(self.bytes)} in {self.elapsed():.1f}s "
+                f"({format_size(bytes_per_sec)}/s, {files_per_sec:.1f} files/s)")
+        if self.skipped:
+            text += f", {self.skipped} unchanged"
+        if self.total_bytes and bytes_per_sec > 0 and self.bytes < self.total_bytes:
+            text += f", ETA {format_duration((self.total_bytes - self.bytes) / bytes_per_sec)}"
+        return f"{self.label}: {text}" if self.label else text
+
+    def maybe_report(self):
+        """Print a progress line if the report interval has passed."""
+        if self.group is not None:
+            return self.group.maybe_report()
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_report < self.interval:
+                return
+            self.last_report = now
+        print(f"⏳ {self.summary()}")
+
+
+class MeterGroup(ThroughputMeter):
+    """Combines several meters (e.g. one per card) into a single progress line."""
+
+    def __init__(self, label="All devices", interval=PROGRESS_INTERVAL):
+        super().__init__(label, interval)
+        self.meters = []
+
+    def meter(self, label):
+        """Create a child meter whose periodic reports go through this group."""
+        meter = ThroughputMeter(label, self.interval, group=self)
+        with self.lock:
+            self.meters.append(meter)
+        return meter
+
+    def totals(self):
+        with self.lock:
+            meters = list(self.meters)
+        files = num_bytes = skipped = 0
+        for meter in meters:
+            with meter.lock:
+                files, num_bytes, skipped = files + meter.files, num_bytes + meter.bytes, skipped + meter.skipped
+        return files, num_bytes, skipped, meters
+
+    def summary(self):
+        files, num_bytes, skipped, meters = self.totals()
+        with self.lock:
+            self.files, self.bytes, self.skipped = files, num_bytes, skipped
+        parts = [super().summary()]
+        for meter in meters:
+            bytes_per_sec, _ = meter.rates()
+            parts.append(f"{meter.label}: {format_size(meter.bytes)} @ {format_size(bytes_per_sec)}/s")
+        return " | ".join(parts)
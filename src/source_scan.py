@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import tempfile
+
+SNAPSHOT_NAME = ".scan_snapshot.json"
+# Directory mtimes this close to the snapshot time can't be trusted: a file added in the
+# same timestamp tick (2s on FAT cards) would leave the mtime unchanged.
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class SourceScanner:
+    """Incremental walk of source folders backed by per-directory snapshots.
+
+    For every directory the snapshot stores its mtime, entry count, matching files
+    and sub-directories. A directory whose mtime is unchanged is not listed again;
+    only its sub-directories are stat'ed to look for changes further down. Excluded
+    trees (e.g. the organized destination inside the source) are never entered.
+    """
+
+    def __init__(self, snapshot_path, exclude=(), file_filter=None):
+        self.snapshot_path = snapshot_path
+        self.exclude = [_norm(path) for path in exclude]
+        self.file_filter = file_filter or (lambda name: True)
+        self.snapshot = {}
+        self.listed = 0
+        self.reused = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                self.snapshot = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print("Warning: Unreadable scan snapshot. Doing a full scan.")
+            self.snapshot = {}
+
+    def save(self):
+        folder = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(folder, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8", dir=folder) as tmpfile:
+            json.dump(self.snapshot, tmpfile)
+            temp_path = tmpfile.name
+        os.replace(temp_path, self.snapshot_path)
+
+    def is_excluded(self, path):
+        path = _norm(path)
+        return any(path == excluded or path.startswith(os.path.join(excluded, "")) for excluded in self.exclude)
+
+    def _list_directory(self, path, st, scan_started_ns):
+        files, dirs, entries = [], [], 0
+        with os.scandir(path) as it:
+            for entry in it:
+                entries += 1
+                # DirEntry caches the type from the directory listing, no extra stat per file.
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif entry.is_file() and self.file_filter(entry.name):
+                    files.append(entry.name)
+        self.listed += 1
+        return {"mtime_ns": st.st_mtime_ns, "entries": entries, "files": sorted(files),
+                "dirs": sorted(dirs), "scanned_ns": scan_started_ns}
+
+    def scan(self, root):
+        """Yield matching file paths under root, reusing snapshots of unchanged directories."""
+        root = os.path.abspath(root)
+        scan_started_ns = time.time_ns()
+        visited = set()
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            if self.is_excluded(path):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snap = self.snapshot.get(path)
+            if (snap and snap["mtime_ns"] == st.st_mtime_ns
+                    and st.st_mtime_ns < snap["scanned_ns"] - RACY_WINDOW_NS):
+                self.reused += 1
+            else:
+                try:
+                    snap = self._list_directory(path, st, scan_started_ns)
+                except OSError as e:
+                    print(f"Warning: Cannot list {path}: {e}")
+                    continue
+                self.snapshot[path] = snap
+            visited.add(path)
+            for name in snap["files"]:
+                yield os.path.join(path, name)
+            stack.extend(os.path.join(path, name) for name in reversed(snap["dirs"]))
+
+        # Forget directories under root that no longer exist or are now excluded.
+        prefix = os.path.join(root, "")
+        for path in [p for p in self.snapshot if (p == root or p.startswith(prefix)) and p not in visited]:
+            del self.snapshot[path]
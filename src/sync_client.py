@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import argparse
+import urllib.error
+import urllib.request
+
+from file_hashing import HashEngine, DEFAULT_ALGORITHM
+from hash_manifest import HashManifest
+from chunked_upload import UPLOAD_CHUNK_SIZE
+from content_index import MAX_QUERY_FILES
+
+SYNC_MANIFEST_SUFFIX = "_sync.sqlite"  # Stat-keyed hashes of a local folder, stored next to it
+REQUEST_TIMEOUT = 60  # Seconds per HTTP request
+CHUNK_RETRIES = 5  # Attempts per chunk before giving up on a file
+INDEX_WAIT_SECONDS = 600  # How long to wait for the server to finish indexing its folder
+
+
+def call(server, method, path, body=None, headers=None):
+    """One request to the cloud server; JSON bodies in and out. Raises urllib.error.URLError."""
+    headers = dict(headers or {})
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(server.rstrip("/") + path, data=body, method=method, headers=headers)
+    with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+        data = response.read()
+    return json.loads(data) if data else None
+
+
+def default_manifest_path(folder):
+    return os.path.normpath(folder) + SYNC_MANIFEST_SUFFIX
+
+
+def local_hashes(folder, algorithm=DEFAULT_ALGORITHM, manifest_path=None, exclude=None):
+    """{path: hash} of every file under folder, only reading files changed since the last sync."""
+    manifest = HashManifest(manifest_path or default_manifest_path(folder))
+    try:
+        engine = HashEngine(algorithm=algorithm, cache=manifest, label="Sync scan")
+        return dict(engine.iter_hashes(folder, exclude))
+    finally:
+        manifest.close()
+
+
+def ask_missing(server, body):
+    """POST /missing, waiting while the server answers 503 because it is still indexing its folder."""
+    deadline = time.monotonic() + INDEX_WAIT_SECONDS
+    while True:
+        try:
+            return call(server, "POST", "/missing", body)
+        except urllib.error.HTTPError as e:
+            if e.code != 503 or time.monotonic() > deadline:
+                raise
+            retry_after = e.headers.get("Retry-After", "")
+            delay = int(retry_after) if retry_after.isdigit() else 10
+            print(f"⏳ The server is still indexing its folder, asking again in {delay}s")
+            time.sleep(delay)
+
+
+def find_missing(server, hashes, algorithm=DEFAULT_ALGORITHM):
+    """The paths of {path: hash} whose content the server doesn't hold, one request per batch."""
+    paths = {}  # (name, hash) -> local paths; only names, sizes and hashes are sent
+    for path, hash_val in hashes.items():
+        paths.setdefault((os.path.basename(path), hash_val), []).append(path)
+    items = [{"name": name, "size": os.path.getsize(group[0]), "hash": hash_val}
+             for (name, hash_val), group in paths.items()]
+    missing = []
+    for start in range(0, len(items), MAX_QUERY_FILES):
+        answer = ask_missing(server, {"algorithm": algorithm, "files": items[start:start + MAX_QUERY_FILES]})
+        for item in answer["missing"]:
+            missing.extend(paths[(item["name"], item["hash"])])
+    return missing
+
+
+def _send_chunk(server, url, offset, data):
+    checksum = "sha256 " + base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+    for attempt in range(1, CHUNK_RETRIES + 1):
+        try:
+            return call(server, "PATCH", url, data, {"Upload-Offset": str(offset), "Upload-Checksum": checksum,
+                                                     "Content-Type": "application/offset+octet-stream"})
+        except urllib.error.HTTPError as e:
+            if attempt == CHUNK_RETRIES or (e.code < 500 and e.code != 460):
+                raise
+        except urllib.error.URLError:
+            if attempt == CHUNK_RETRIES:
+                raise
+        time.sleep(2 ** attempt)
+
+
+def upload_file(server, path, content_hash=None, name=None):
+    """Upload one file through the resumable /uploads API. Returns the server's hash of it."""
+    size = os.path.getsize(path)
+    session = call(server, "POST", "/uploads",
+                   {"filename": name or os.path.basename(path), "size": size, "hash": content_hash})
+    chunk_size = session.get("chunk_size", UPLOAD_CHUNK_SIZE)
+    with open(path, "rb") as f:
+        for offset in range(0, size, chunk_size):
+            _send_chunk(server, session["url"], offset, f.read(chunk_size))
+    return call(server, "POST", session["url"] + "/finish")["hash"]
+
+
+def sync_folder(server, folder, algorithm=DEFAULT_ALGORITHM):
+    """Upload the files of folder the server doesn't have yet. Returns (uploaded, already there, errors)."""
+    hashes = local_hashes(folder, algorithm)
+    missing = find_missing(server, hashes, algorithm)
+    print(f"🔎 {len(hashes) - len(missing)} of {len(hashes)} files are already on {server}")
+    uploaded = errors = 0
+    for path in missing:
+        try:
+            upload_file(server, path, hashes[path])
+            uploaded += 1
+            print(f"✅ Uploaded: {path}")
+        except (urllib.error.URLError, OSError) as e:
+            errors += 1
+            print(f"⚠️ Failed to upload {path}: {e}")
+    return uploaded, len(hashes) - len(missing), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload only the files the cloud server doesn't hold yet.")
+    parser.add_argument("folder", help="Local folder to sync")
+    parser.add_argument("--server", required=True, help="Cloud server URL, e.g. http://192.168.1.10:5000")
+    args = parser.parse_args()
+
+    uploaded, present, errors = sync_folder(args.server, args.folder)
+    print(f"🎉 Sync completed: {uploaded} uploaded, {present} already there, {errors} failed.")
+
+
+if __name__ == "__main__":
+    main()
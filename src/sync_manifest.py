@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import threading
+
+from file_hashing import hash_file, DEFAULT_ALGORITHM
+
+SYNC_MANIFEST_SUFFIX = "_mobile_sync.sqlite"  # Next to the local folder, so it is never uploaded itself
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    local_path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    algorithm TEXT,
+    hash TEXT,
+    remote_path TEXT,
+    variant TEXT DEFAULT '',
+    state TEXT,
+    updated_at REAL
+);
+"""
+
+DONE = "done"  # The remote file is complete
+SENDING = "sending"  # An upload was started; a shorter remote file is our partial copy
+
+
+def default_manifest_path(folder):
+    return os.path.normpath(folder) + SYNC_MANIFEST_SUFFIX
+
+
+class SyncManifest:
+    """SQLite record of which local files were sent where, so a re-run is diffed locally.
+
+    Each row maps a local path and its (size, mtime, hash) to the remote path
+    it was uploaded to and whether that upload finished. Files whose row says
+    done are skipped without asking the server; a file whose stat changed is
+    hashed, and still skipped if its content didn't. A row left in the
+    sending state vouches that a shorter remote file holds the start of this
+    same content, so the upload can resume there. ``variant`` names the
+    form the file was sent in ('' for the original, else e.g. the
+    mobile_transcode settings), and must match as well.
+    """
+
+    def __init__(self, db_path, algorithm=DEFAULT_ALGORITHM):
+        self.db_path = db_path
+        self.algorithm = algorithm
+        self.lock = threading.Lock()  # Pool workers record finished uploads concurrently
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(uploads)")]
+        if "variant" not in columns:  # Manifests written before phone copies existed
+            self.conn.execute("ALTER TABLE uploads ADD COLUMN variant TEXT DEFAULT ''")
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, local_path):
+        """The row for local_path as a dict, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, algorithm, hash, remote_path, variant, state FROM uploads "
+                "WHERE local_path = ?", (local_path,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("size", "mtime_ns", "algorithm", "hash", "remote_path", "variant", "state"), row))
+
+    def content_hash(self, local_path, st, row=None):
+        """Hash of the file, reusing the recorded one while its size and mtime are unchanged."""
+        row = row if row is not None else self.get(local_path)
+        if (row and row["hash"] and row["algorithm"] == self.algorithm
+                and (row["size"], row["mtime_ns"]) == (st.st_size, st.st_mtime_ns)):
+            return row["hash"]
+        return hash_file(local_path, self.algorithm)
+
+    def sync_state(self, local_path, st, remote_path, variants=("",)):
+        """(synced, hash): whether this content was fully uploaded to remote_path, and the file's hash.
+
+        variants are the forms that count as uploaded. The file is only read if
+        it was touched since its row was written, and then at most once, so a
+        changed file's hash can be passed on to the upload.
+        """
+        row = self.get(local_path)
+        content_hash = self.content_hash(local_path, st, row)
+        if (not row or row["state"] != DONE or row["remote_path"] != remote_path
+                or row["variant"] not in variants or content_hash != row["hash"]):
+            return False, content_hash
+        if row["mtime_ns"] != st.st_mtime_ns:  # Only the mtime changed
+            self._put(local_path, st, content_hash, remote_path, row["variant"], DONE)
+        return True, content_hash
+
+    def resume_offset(self, local_path, content_hash, remote_path, remote_size, sent_size=None, variant=""):
+        """Bytes of this upload already on the server, if the remote file is our own partial copy.
+
+        sent_size is the size of what is being sent, when that isn't the local file itself.
+        """
+        row = self.get(local_path)
+        if (not row or row["state"] != SENDING or (row["remote_path"], row["variant"]) != (remote_path, variant)
+                or row["hash"] != content_hash or not remote_size or remote_size >= (sent_size or row["size"])):
+            return 0
+        return remote_size
+
+    def mark_sending(self, local_path, st, content_hash, remote_path, variant=""):
+        self._put(local_path, st, content_hash, remote_path, variant, SENDING)
+
+    def mark_done(self, local_path, st, content_hash, remote_path, variant=""):
+        self._put(local_path, st, content_hash, remote_path, variant, DONE)
+
+    def _put(self, local_path, st, content_hash, remote_path, variant, state):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO uploads (local_path, size, mtime_ns, algorithm, hash, remote_path, variant, "
+                "state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (local_path, st.st_size, st.st_mtime_ns, self.algorithm, content_hash, remote_path, variant, state,
+                 time.time()))
+
+    def forget(self, local_path):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM uploads WHERE local_path = ?", (local_path,))
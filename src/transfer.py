@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import errno
+import shutil
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from progress import ThroughputMeter, format_size
+from file_hashing import new_hasher, hash_file, DEFAULT_ALGORITHM
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks
+    fcntl = None
+
+TRANSFER_WORKERS = 4  # Files copied concurrently
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per kernel copy call / userspace buffer
+PARTIAL_SUFFIX = ".part"  # Copies land here first so an interrupted file is never mistaken for done
+FICLONE = 0x40049409  # Linux ioctl: share all extents of one file with another (btrfs, XFS, bcachefs)
+
+# How each export mode places a file, tried in order. Every mode ends with a real copy.
+# Reflinks are copy-on-write, so they behave exactly like a copy; hardlinks share the
+# inode, so editing the exported file in place also edits the library file.
+EXPORT_MODES = {
+    "copy": ("copy",),
+    "reflink": ("reflink", "copy"),
+    "hardlink": ("hardlink", "copy"),
+    "auto": ("reflink", "hardlink", "copy"),
+}
+
+# errnos meaning "this kernel copy primitive doesn't apply here", not a real I/O failure
+# (ENOTSOCK: sendfile() outside Linux only writes to sockets)
+_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF,
+                    errno.ENOTSOCK}
+# errnos meaning "can't reflink/hardlink here" (other volume, FAT/exFAT/NTFS, link limit, policy)
+_LINK_FALLBACK_ERRNOS = _FALLBACK_ERRNOS | {errno.ENOTTY, errno.EPERM, errno.EACCES, errno.EMLINK}
+
+
+class HashMismatchError(OSError):
+    """The bytes copied don't hash to the value recorded for the source."""
+
+
+class DirectoryCache:
+    """Creates each destination directory once per run, however many files land in it."""
+
+    def __init__(self):
+        self.created = set()
+        self.lock = threading.Lock()
+
+    def ensure(self, path):
+        if path in self.created:
+            return
+        os.makedirs(path, exist_ok=True)
+        with self.lock:
+            self.created.add(path)
+
+
+def _copy_file_range(fsrc, fdst, size):
+    offset = 0
+    while offset < size:
+        sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(COPY_CHUNK_SIZE, size - offset))
+        if sent == 0:
+            break
+        offset += sent
+    return offset
+
+
+def _sendfile(fsrc, fdst, size):
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, min(COPY_CHUNK_SIZE, size - offset))
+        if sent == 0:
+            break
+        offset += sent
+    return offset
+
+
+def kernel_copiers():
+    """The zero-copy primitives available on this platform, best first."""
+    copiers = []
+    if hasattr(os, "copy_file_range"):  # Linux, may also reflink or copy server-side
+        copiers.append(("copy_file_range", _copy_file_range))
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):  # Elsewhere it only writes to sockets
+        copiers.append(("sendfile", _sendfile))
+    return copiers
+
+
+def copy_file_data(src, dst):
+    """Copy file contents, in the kernel where possible. Returns the method used."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        for method, copier in (kernel_copiers() if size else []):
+            try:
+                if copier(fsrc, fdst, size) == size:
+                    return method
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+            # Not supported here (e.g. across filesystems on old kernels): start over
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+        return "copy"
+
+
+def reflink_file(src, dst):
+    """Clone src into dst without copying data. Raises OSError where unsupported."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def copy_with_hash(src, dst, algorithm=DEFAULT_ALGORITHM):
+    """Copy src to dst through one userspace buffer, hashing the bytes as they are written.
+
+    Returns the hex digest.
+    """
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(COPY_CHUNK_SIZE)
+    view = memoryview(buffer)
+    written = 0
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "wb", buffering=0) as fdst:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fsrc.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        size = os.fstat(fsrc.fileno()).st_size
+        while True:
+            n = fsrc.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+            offset = 0
+            while offset < n:
+                offset += fdst.write(view[offset:n])
+            written += n
+    if written != size:
+        raise OSError(errno.EIO, f"Short copy of {src}: {written} of {size} bytes")
+    return hasher.hexdigest()
+
+
+def _place_partial(src, partial, method, algorithm=None):
+    if method == "hardlink":
+        if os.path.lexists(partial):  # Left over from an interrupted run
+            os.remove(partial)
+        os.link(src, partial)  # Same inode, timestamps already match
+        return method, None
+    digest = None
+    if method == "reflink":
+        reflink_file(src, partial)
+    elif algorithm:
+        digest = copy_with_hash(src, partial, algorithm)
+        method = "copy+hash"
+    else:
+        method = copy_file_data(src, partial)
+    shutil.copystat(src, partial)
+    return method, digest
+
+
+def transfer_file(src, dst, mode="copy", algorithm=None, expected_hash=None):
+    """Place src at dst like shutil.copy2 (data + timestamps), via a .part file.
+
+    mode picks the strategies to try (see EXPORT_MODES). With an algorithm, real
+    copies are hashed while they are written and checked against expected_hash
+    if one is given. Returns (method, hex digest or None).
+    """
+    partial = dst + PARTIAL_SUFFIX
+    strategies = EXPORT_MODES[mode]
+    try:
+        for strategy in strategies:
+            try:
+                method, digest = _place_partial(src, partial, strategy, algorithm)
+                break
+            except OSError as e:
+                if strategy == strategies[-1] or e.errno not in _LINK_FALLBACK_ERRNOS:
+                    raise
+                if os.path.exists(partial):
+                    os.remove(partial)
+        if expected_hash and digest and digest != expected_hash:
+            raise HashMismatchError(errno.EIO, f"Hash mismatch copying {src}: {digest} != {expected_hash}")
+        os.replace(partial, dst)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return method, digest
+
+
+def copy_file(src, dst, mode="copy"):
+    """Like transfer_file without hashing; returns the method used."""
+    return transfer_file(src, dst, mode)[0]
+
+
+def same_volume(src, dst):
+    """True if src can be renamed to dst (whose folder must exist) without copying."""
+    return os.stat(src).st_dev == os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+
+
+def supports_hardlinks(folder):
+    """True if files in folder (which must exist) can be hardlinked; FAT and exFAT can't."""
+    probe = os.path.join(folder, f".hardlink_probe_{os.getpid()}")
+    link = probe + ".link"
+    try:
+        with open(probe, "wb"):
+            pass
+        os.link(probe, link)
+        return True
+    except OSError as e:
+        if e.errno not in _LINK_FALLBACK_ERRNOS:
+            raise
+        return False
+    finally:
+        for path in (link, probe):
+            if os.path.lexists(path):
+                os.remove(path)
+
+
+def move_with_hash(src, dst, algorithm=DEFAULT_ALGORITHM, content_hash=None):
+    """Move src to dst like shutil.move and return the content hash.
+
+    Within a volume the file is hashed, then renamed; a content_hash already
+    computed by the caller saves that read. Across volumes it is hashed while
+    it is copied (and checked against content_hash), and the source is only
+    removed once the copy is on disk.
+    """
+    if same_volume(src, dst):
+        digest = content_hash or hash_file(src, algorithm)
+        os.rename(src, dst)
+        return digest
+    digest = transfer_file(src, dst, algorithm=algorithm, expected_hash=content_hash)[1]
+    with open(dst, "rb") as f:
+        os.fsync(f.fileno())  # The copy is the only one left once src is removed
+    os.remove(src)
+    return digest
+
+
+class TransferEngine:
+    """Copies (src, dst) jobs on a bounded thread pool.
+
+    Destination directories are created once through a shared DirectoryCache,
+    files that already exist at the destination are skipped, and a throughput
+    line with an ETA is printed while copying plus a summary at the end. With
+    log_path, every placed file is appended there as a JSON line with the
+    method used. With hash_algorithm, copies are hashed as they are written
+    (see transfer_file); a job may then be (src, dst, expected_hash) and the
+    digests end up in .hashes by source path.
+    """
+
+    def __init__(self, workers=TRANSFER_WORKERS, label="Copy", mode="copy", log_path=None,
+                 hash_algorithm=None):
+        if mode not in EXPORT_MODES:
+            raise ValueError(f"Unknown export mode {mode!r}, expected one of {', '.join(EXPORT_MODES)}")
+        self.workers = max(1, workers)
+        self.label = label
+        self.mode = mode
+        self.log_path = log_path
+        self.hash_algorithm = hash_algorithm
+        self.hashes = {}
+        self.dirs = DirectoryCache()
+        self.meter = None
+        self.copied = []
+        self.skipped = []
+        self.errors = []
+        self.methods = {}
+
+    def _transfer(self, src, dst, expected_hash=None):
+        if os.path.exists(dst):
+            print(f"Skipping existing file: {dst}")
+            self.meter.skip()
+            return "skipped", dst, None, None
+        self.dirs.ensure(os.path.dirname(dst))
+        method, digest = transfer_file(src, dst, self.mode, self.hash_algorithm, expected_hash)
+        self.meter.add(os.path.getsize(dst))
+        print(f"Copied ({method}): {src} -> {dst}")
+        return "copied", dst, method, digest
+
+    def run(self, jobs):
+        """Run every (src, dst[, expected_hash]) job and return (copied, skipped, errors) counts."""
+        jobs = list(jobs)
+        total = 0
+        for src, *_ in jobs:
+            try:
+                total += os.path.getsize(src)
+            except OSError:
+                pass
+        self.meter = ThroughputMeter(self.label, total_bytes=total)
+
+        pending = {}
+        job_iter = iter(jobs)
+        log = open(self.log_path, "a", encoding="utf-8") if self.log_path else nullcontext()
+        with log, ThreadPoolExecutor(max_workers=self.workers) as pool:
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < self.workers * 2:
+                    job = next(job_iter, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    pending[pool.submit(self._transfer, *job)] = job
+                if not pending:
+                    break
+                done, _ = wait(pending, timeout=self.meter.interval, return_when=FIRST_COMPLETED)
+                self.meter.maybe_report()
+                for future in done:
+                    src = pending.pop(future)[0]
+                    try:
+                        status, dst, method, digest = future.result()
+                    except Exception as e:
+                        print(f"Error copying {src}: {e}")
+                        self.errors.append((src, e))
+                        continue
+                    if status == "skipped":
+                        self.skipped.append(dst)
+                    else:
+                        self.copied.append(dst)
+                        self.methods[method] = self.methods.get(method, 0) + 1
+                        if digest:
+                            self.hashes[src] = digest
+                        if self.log_path:
+                            log.write(json.dumps({"source": src, "destination": dst, "method": method}) + "\n")
+        self.report(total)
+        return len(self.copied), len(self.skipped), len(self.errors)
+
+    def report(self, total):
+        methods = ", ".join(f"{name}: {count}" for name, count in sorted(self.methods.items()))
+        print(f"📊 {self.meter.summary()} of {format_size(total)} planned"
+              + (f" [{methods}]" if methods else ""))
@@ -1,9 +1,17 @@
 import os
 import time
+import posixpath
 import yaml
 from ftplib import FTP, error_perm, all_errors
 from dotenv import load_dotenv
 
+from ftp_pool import FTPPool, UploadJob, FTP_SESSIONS
+from ftp_remote import RemoteState, normalize
+from sync_manifest import SyncManifest, default_manifest_path
+from upload_scheduler import scheduler_from_config, default_stats_path
+from mobile_transcode import (MobileTranscoder, is_transcodable, default_cache_folder, MOBILE_LONG_EDGE,
+                              MOBILE_QUALITY)
+
 # === Load credentials and config ===
 load_dotenv()
 
@@ -18,6 +26,10 @@ FTP_PASS = os.getenv("MOBILE_FTP_PASS")
 
 LOCAL_FOLDER = ftp_config.get("local_folder", ".")
 REMOTE_ROOT = ftp_config.get("remote_root", "/")
+# Local record of what is already on the phone (outside LOCAL_FOLDER by default)
+MANIFEST_PATH = ftp_config.get("manifest", default_manifest_path(LOCAL_FOLDER))
+# Optional phone copies of JPEGs: true, or {long_edge, quality, cache}; unset sends the originals
+TRANSCODE = ftp_config.get("transcode")
 
 # === Enable/Disable dry run (True = no uploads) ===
 DRY_RUN = True
@@ -25,23 +37,26 @@ DRY_RUN = True
 USE_PASSIVE_MODE = True
 # === Retry attempts on connection issues ===
 MAX_RETRIES = 3
+# === Parallel FTP sessions uploading files ===
+SESSIONS = ftp_config.get("sessions", FTP_SESSIONS)
+# === Upload order, rate limit and concurrency tuning (see upload_scheduler) ===
+SCHEDULER = ftp_config.get("scheduler")
+# === Ask the phone about every file, even those the manifest says it has ===
+VERIFY_REMOTE = False
 
 
-def ensure_ftp_path(ftp, path):
+def ensure_ftp_path(remote, path):
     """Ensure directory path exists on FTP server."""
-    for part in path.strip("/").split("/"):
-        try:
-            if part not in ftp.nlst():
-                if DRY_RUN:
-                    print(f"🧪 [Dry Run] Would create directory: {part}")
-                else:
-                    ftp.mkd(part)
-                    print(f"📂 Created: {part}")
-            ftp.cwd(part)
-        except error_perm as e:
-            if not str(e).startswith("550"):
-                raise
-            print(f"⚠️  Cannot create or access '{part}': {e}")
+    try:
+        if DRY_RUN:
+            if remote.listing(path) is None:
+                print(f"🧪 [Dry Run] Would create directory: {path}")
+        else:
+            remote.ensure_dir(path, on_create=lambda created: print(f"📂 Created: {created}"))
+    except error_perm as e:
+        if not str(e).startswith("550"):
+            raise
+        print(f"⚠️  Cannot create or access '{path}': {e}")
 
 
 def connect_ftp():
@@ -63,51 +78,117 @@ def connect_ftp():
     return None
 
 
-def upload_folder():
-    ftp = connect_ftp()
-    if not ftp:
-        return
+def make_transcoder():
+    """MobileTranscoder for the TRANSCODE settings, or None when phone copies are off."""
+    if not TRANSCODE:
+        return None
+    settings = TRANSCODE if isinstance(TRANSCODE, dict) else {}
+    return MobileTranscoder(settings.get("cache", default_cache_folder(LOCAL_FOLDER)),
+                            settings.get("long_edge", MOBILE_LONG_EDGE), settings.get("quality", MOBILE_QUALITY))
+
+
+def changed_files(manifest, transcoder=None):
+    """(local file, remote path, stat, hash, variant) of every file the manifest doesn't show as on the phone.
+
+    variant names the phone-copy settings for JPEGs when transcoding, so
+    changing them sends new copies; it is '' for files sent as they are. A
+    JPEG already sent as it is (too small to shrink, or undecodable) counts
+    as on the phone either way.
+    """
+    changed = []
+    for root, _, files in os.walk(LOCAL_FOLDER):
+        rel_path = os.path.relpath(root, LOCAL_FOLDER)
+        for file in files:
+            local_file = os.path.join(root, file)
+            remote_file = normalize(f"{REMOTE_ROOT}/{rel_path}/{file}")
+            variant = transcoder.variant if transcoder and is_transcodable(local_file) else ""
+            st = os.stat(local_file)
+            synced, content_hash = manifest.sync_state(local_file, st, remote_file, (variant, ""))
+            if synced and not VERIFY_REMOTE:
+                continue
+            changed.append((local_file, remote_file, st, content_hash, variant))
+    return changed
+
+
+def plan_upload(remote, manifest, local_file, remote_file, st, content_hash, variant="", send_path=None):
+    """UploadJob for a changed file, resuming a partial copy we left; None if the phone has it.
+
+    send_path is the phone copy to transmit instead of local_file, if there is
+    one. Without it the original is sent, and recorded as variant ''.
+    """
+    if send_path and not os.path.isfile(send_path):
+        print(f"⚠️  The phone copy of {local_file} left the cache, sending the original")
+        send_path = None
+    if not send_path:
+        send_path, variant = local_file, ""
+    send_size = os.path.getsize(send_path)
+    remote_size = remote.size(remote_file)
+    if remote_size == send_size:
+        print(f"⏭️  Skipping {remote_file} (already uploaded)")
+        if not DRY_RUN:
+            manifest.mark_done(local_file, st, content_hash, remote_file, variant)
+        return None
+    offset = manifest.resume_offset(local_file, content_hash, remote_file, remote_size, send_size, variant)
+    if DRY_RUN:
+        resume = f" (resuming at {offset} bytes)" if offset else ""
+        print(f"🧪 [Dry Run] Would upload {send_path} to {remote_file}{resume}")
+        return None
+    manifest.mark_sending(local_file, st, content_hash, remote_file, variant)
+
+    def uploaded(job):
+        manifest.mark_done(local_file, st, content_hash, job.remote_path, variant)
+
+    return UploadJob(send_path, remote_file, on_done=uploaded, offset=offset, mtime=st.st_mtime)
+
 
+def upload_folder():
+    manifest = SyncManifest(MANIFEST_PATH)
+    transcoder = make_transcoder()
     try:
-        for root, _, files in os.walk(LOCAL_FOLDER):
-            rel_path = os.path.relpath(root, LOCAL_FOLDER)
-            ftp_path = os.path.join(REMOTE_ROOT, rel_path).replace("\\", "/")
-
-            ftp.cwd("/")  # Reset to root before creating path
-            ensure_ftp_path(ftp, ftp_path)
-
-            remote_files = []
-            try:
-                remote_files = ftp.nlst()
-            except all_errors as e:
-                print(f"⚠️  Couldn't list files in {ftp.pwd()}: {e}")
-
-            for file in files:
-                local_file = os.path.join(root, file)
-
-                # Skip if file already exists with same size
-                if file in remote_files:
-                    try:
-                        remote_size = ftp.size(file)
-                        local_size = os.path.getsize(local_file)
-                        if remote_size == local_size:
-                            print(f"⏭️  Skipping {file} (already uploaded)")
-                            continue
-                    except Exception as e:
-                        print(f"⚠️  Could not compare sizes for {file}: {e}")
-
-                if DRY_RUN:
-                    print(f"🧪 [Dry Run] Would upload {file} to {ftp.pwd()}/")
-                else:
-                    with open(local_file, "rb") as f:
-                        print(f"📤 Uploading {file} to {ftp.pwd()}/")
-                        ftp.storbinary(f"STOR {file}", f)
-
-        ftp.quit()
+        # Diffed (and hashed) before logging in: the phone is only asked about files that changed
+        changed = changed_files(manifest, transcoder)
+        if not changed:
+            print("✅ Nothing new to upload.")
+            return
+        print(f"🔎 {len(changed)} new or changed files")
+
+        copies = {}
+        if transcoder:
+            copies = transcoder.transcode_all({entry[0]: entry[3] for entry in changed if entry[4]})
+            print(f"🗜️  {len(copies)} phone copies at {transcoder.variant} ({transcoder.encoded} encoded now)")
+
+        ftp = connect_ftp()
+        if not ftp:
+            return
+
+        jobs = []
+        try:
+            remote = RemoteState(ftp)  # Each remote folder is listed once
+            remote_dirs = set()
+            for local_file, remote_file, st, content_hash, variant in changed:
+                remote_dir = posixpath.dirname(remote_file)
+                if remote_dir not in remote_dirs:
+                    ensure_ftp_path(remote, remote_dir)
+                    remote_dirs.add(remote_dir)
+                job = plan_upload(remote, manifest, local_file, remote_file, st, content_hash, variant,
+                                  copies.get(local_file))
+                if job:
+                    jobs.append(job)
+            ftp.quit()
+        except all_errors as e:
+            print(f"❌ FTP Error during upload: {e}")
+            return
+
+        # The files are sent over several sessions at once, each reconnecting and retrying on errors
+        if jobs:
+            scheduler = scheduler_from_config(SCHEDULER, SESSIONS, default_stats_path(LOCAL_FOLDER))
+            print(f"📤 Uploading {len(jobs)} files, {scheduler.policy} first, over up to {scheduler.sessions} sessions")
+            FTPPool(connect_ftp, scheduler=scheduler).run(jobs)
         print("✅ Upload complete.")
-
-    except all_errors as e:
-        print(f"❌ FTP Error during upload: {e}")
+    finally:
+        manifest.close()
+        if transcoder:
+            transcoder.close()
 
 
 if __name__ == "__main__":
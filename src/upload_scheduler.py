@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import argparse
+import threading
+from collections import defaultdict
+
+from file_listing import file_type
+from progress import format_size, format_duration
+
+UPLOAD_POLICIES = ("newest", "smallest", "type", "fifo")  # Orders the queue of files to send
+DEFAULT_POLICY = "newest"
+TYPE_PRIORITY = ("images", "other", "raw", "videos")  # Policy "type": photos first, big videos last
+MAX_SESSIONS = 8  # Default upper bound when the concurrency is tuned automatically
+TUNE_INTERVAL = 5.0  # Seconds of transfers measured before each concurrency decision
+TUNE_TOLERANCE = 0.15  # Per-transfer slowdown still counted as "holding up" when a session is added
+TUNE_HOLD = 6  # Windows to stay put after stepping back, before probing one more session again
+STATS_SUFFIX = "_upload_stats.jsonl"  # Next to the local folder: one line per run, for comparing policies
+
+
+def default_stats_path(folder):
+    return os.path.normpath(folder) + STATS_SUFFIX
+
+
+def priority_key(policy):
+    """Sort key for UploadJobs under a policy (lower goes first)."""
+    if policy == "newest":
+        return lambda job: -job.mtime
+    if policy == "smallest":
+        return lambda job: job.size
+    if policy == "type":
+        return lambda job: (TYPE_PRIORITY.index(file_type(job.remote_path)), job.size)
+    if policy == "fifo":
+        return lambda job: 0
+    raise ValueError(f"Unknown upload policy {policy!r}, expected one of {', '.join(UPLOAD_POLICIES)}")
+
+
+class TokenBucket:
+    """Limits the combined rate of all transfers to ``rate`` bytes/s (0 = unlimited).
+
+    Up to ``burst`` bytes (one second's worth by default) may go out at once;
+    beyond that, consume() sleeps the calling transfer until its bytes are
+    paid for. The bucket may go into debt, so one large block never stalls forever.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or rate
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def consume(self, num_bytes):
+        if not self.rate:
+            return
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - num_bytes
+            self.updated = now
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+class ConcurrencyTuner:
+    """AIMD-style choice of how many transfers run at once, from measured per-transfer throughput.
+
+    While adding a session leaves each transfer about as fast as before
+    (within TUNE_TOLERANCE), the bottleneck is per connection (Wi-Fi, TCP
+    window, a slow phone), so one more session is tried. When transfers slow
+    down, the extra session only split a saturated link: step back one and
+    hold there for TUNE_HOLD windows. If the combined rate collapses, halve.
+    """
+
+    def __init__(self, sessions, min_sessions=1, max_sessions=MAX_SESSIONS):
+        self.min_sessions = min_sessions
+        self.max_sessions = max(min_sessions, max_sessions)
+        self.limit = min(max(sessions, min_sessions), self.max_sessions)
+        self.reference = None  # Per-transfer rate before the last added session
+        self.previous = None  # (limit, per transfer, aggregate) of the last window
+        self.hold = 0
+        self.history = []  # (limit, per transfer, aggregate, new limit) per window
+
+    def update(self, per_transfer, aggregate):
+        """Take one window's measurements (bytes/s) and return the new limit."""
+        limit = self.limit
+        if self.previous and aggregate < self.previous[2] * (1 - 2 * TUNE_TOLERANCE) and limit > 1:
+            limit = max(self.min_sessions, limit // 2)  # Collapse: back off hard, re-measure from there
+            self.reference, self.hold = None, TUNE_HOLD
+        elif self.hold:
+            self.hold -= 1
+        elif self.reference is None or per_transfer >= self.reference * (1 - TUNE_TOLERANCE):
+            self.reference = max(per_transfer, self.reference or 0)
+            limit = min(self.max_sessions, limit + 1)
+        else:
+            limit = max(self.min_sessions, limit - 1)  # Each transfer got slower: the link is shared
+            self.reference, self.hold = None, TUNE_HOLD
+        self.history.append((self.limit, per_transfer, aggregate, limit))
+        self.previous = (self.limit, per_transfer, aggregate)
+        self.limit = limit
+        return limit
+
+    def refused(self, sessions):
+        """The server turned down a login next to ``sessions`` open ones: never go above that again."""
+        self.max_sessions = max(self.min_sessions, min(self.max_sessions, sessions))
+        self.limit = min(self.limit, self.max_sessions)
+        self.reference, self.hold = None, TUNE_HOLD
+        return self.limit
+
+
+class UploadScheduler:
+    """Decides the order, rate and concurrency of an FTPPool's uploads, and keeps stats per policy.
+
+    The pool starts ``sessions`` workers, each calling acquire() before it
+    sends a file. With ``auto_tune`` it starts ``max_sessions`` (default the
+    larger of sessions and MAX_SESSIONS) and the tuner moves how many get
+    through, starting at ``sessions``. A login the server refuses lowers the
+    limit for the rest of the run either way. Every block sent goes through
+    the token bucket. run_stats() summarises a run, and is appended to
+    ``stats_file`` so policies can be compared over time.
+    """
+
+    def __init__(self, policy=DEFAULT_POLICY, rate_limit=0, sessions=4, max_sessions=None,
+                 auto_tune=False, stats_file=None, tune_interval=TUNE_INTERVAL):
+        priority_key(policy)  # Validates the name
+        self.policy = policy
+        self.bucket = TokenBucket(rate_limit)
+        self.auto_tune = auto_tune
+        if not auto_tune:
+            max_sessions = sessions
+        elif max_sessions is None:
+            max_sessions = max(sessions, MAX_SESSIONS)
+        self.tuner = ConcurrencyTuner(sessions, max_sessions=max_sessions)
+        self.stats_file = stats_file
+        self.tune_interval = tune_interval
+        self.condition = threading.Condition()
+        self.active = 0
+        self.busy_seconds = 0.0  # Sum over transfers of the time they were running, this window
+        self.window_bytes = 0
+        self.completions = []  # (seconds since start, bytes) per finished file
+        self.peak = 0
+        self.begin()
+
+    def begin(self):
+        """Start the clocks; the pool calls this when its run starts."""
+        self.start = self.window_start = self.last_change = time.monotonic()
+
+    @property
+    def sessions(self):
+        """Workers the pool should start."""
+        return self.tuner.max_sessions
+
+    def order(self, jobs):
+        return sorted(jobs, key=priority_key(self.policy))
+
+    def _account(self, now):
+        self.busy_seconds += self.active * (now - self.last_change)
+        self.last_change = now
+
+    def acquire(self):
+        with self.condition:
+            while self.active >= self.tuner.limit:
+                self.condition.wait()
+            self._account(time.monotonic())
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def release(self):
+        with self.condition:
+            self._account(time.monotonic())
+            self.active -= 1
+            self.condition.notify_all()
+
+    def transferred(self, num_bytes):
+        """Called for every block sent: rate limit, then count it for tuning."""
+        self.bucket.consume(num_bytes)
+        with self.condition:
+            self.window_bytes += num_bytes
+
+    def finished(self, job):
+        with self.condition:
+            self.completions.append((time.monotonic() - self.start, job.size))
+
+    def refused(self, sessions):
+        """Called by the pool when a login failed while ``sessions`` others were open: step back to those."""
+        with self.condition:
+            self.tuner.refused(sessions)
+
+    def tick(self):
+        """Called periodically by the pool: closes a measurement window and retunes."""
+        now = time.monotonic()
+        with self.condition:
+            if now - self.window_start < self.tune_interval:
+                return
+            self._account(now)
+            busy, sent, elapsed = self.busy_seconds, self.window_bytes, now - self.window_start
+            self.busy_seconds, self.window_bytes, self.window_start = 0.0, 0, now
+            if not self.auto_tune or busy <= 0 or not sent:
+                return
+            old = self.tuner.limit
+            new = self.tuner.update(sent / busy, sent / elapsed)
+            if new > old:
+                self.condition.notify_all()
+        if new != old:
+            print(f"🎛️ Concurrency {old} -> {new} ({format_size(sent / busy)}/s per transfer, "
+                  f"{format_size(sent / elapsed)}/s in total)")
+
+    def run_stats(self, failed=0):
+        """This run's numbers, appended to stats_file when there is one."""
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        done = sorted(self.completions)
+        total = sum(size for _, size in done)
+        stats = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "policy": self.policy,
+            "files": len(done),
+            "failed": failed,
+            "bytes": total,
+            "seconds": round(elapsed, 3),
+            "bytes_per_second": round(total / elapsed),
+            # How long files waited on average, and until half of them were there: what the order changes
+            "mean_file_seconds": round(sum(t for t, _ in done) / len(done), 3) if done else None,
+            "half_files_seconds": round(done[(len(done) - 1) // 2][0], 3) if done else None,
+            "rate_limit": self.bucket.rate,
+            "sessions_peak": self.peak,
+            "sessions_final": self.tuner.limit,
+        }
+        if self.stats_file and done:
+            with open(self.stats_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(stats) + "\n")
+        return stats
+
+
+def scheduler_from_config(settings, sessions, stats_file=None):
+    """UploadScheduler from a config mapping (policy, rate_limit in MB/s, max_sessions, auto_tune)."""
+    settings = settings or {}
+    return UploadScheduler(policy=settings.get("policy", DEFAULT_POLICY),
+                           rate_limit=int(float(settings.get("rate_limit", 0)) * 1024 * 1024),
+                           sessions=sessions, max_sessions=settings.get("max_sessions"),
+                           auto_tune=settings.get("auto_tune", False), stats_file=stats_file)
+
+
+def summarize(stats_file):
+    """{policy: averages over its runs} from a stats file."""
+    runs = defaultdict(list)
+    with open(stats_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                stats = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            runs[stats.get("policy")].append(stats)
+    summary = {}
+    for policy, entries in runs.items():
+        def average(key):
+            values = [entry[key] for entry in entries if entry.get(key) is not None]
+            return sum(values) / len(values) if values else None
+        summary[policy] = {"runs": len(entries), "files": sum(entry["files"] for entry in entries),
+                           "bytes_per_second": average("bytes_per_second"),
+                           "mean_file_seconds": average("mean_file_seconds"),
+                           "half_files_seconds": average("half_files_seconds"),
+                           "sessions_final": average("sessions_final")}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare upload policies from a stats file.")
+    parser.add_argument("stats_file", help=f"A <folder>{STATS_SUFFIX} file written by the FTP upload scripts")
+    args = parser.parse_args()
+    for policy, stats in sorted(summarize(args.stats_file).items()):
+        mean = stats["mean_file_seconds"]
+        half = stats["half_files_seconds"]
+        print(f"{policy:>8}: {stats['runs']} runs, {stats['files']} files, "
+              f"{format_size(stats['bytes_per_second'])}/s, "
+              f"mean wait {format_duration(mean) if mean is not None else '-'}, "
+              f"half done after {format_duration(half) if half is not None else '-'}, "
+              f"{stats['sessions_final']:.1f} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""A local pyftpdlib server for the FTP tests (skipped when pyftpdlib is missing)."""
+import threading
+
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.ioloop import IOLoop
+    from pyftpdlib.servers import ThreadedFTPServer
+except ImportError:
+    FTPHandler = None
+
+HAVE_PYFTPDLIB = FTPHandler is not None
+
+
+def start_ftp_server(test, root, mlsd=True, rest=True):
+    """Serve root as user/pass on a free port until the test ends. Returns the port.
+
+    mlsd=False and rest=False emulate servers without those commands.
+    """
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("user", "pass", root, perm="elradfmw")
+    handler = type("Handler", (FTPHandler,), {"authorizer": authorizer})
+    disabled = {name for name, enabled in (("MLSD", mlsd), ("REST", rest)) if not enabled}
+    if disabled:
+        handler.proto_cmds = {k: v for k, v in FTPHandler.proto_cmds.items() if k not in disabled}
+    server = ThreadedFTPServer(("127.0.0.1", 0), handler, ioloop=IOLoop())
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            server.serve_forever(timeout=0.05, blocking=False, handle_exit=False)
+        server.close_all()  # On the serving thread: closing from another one races its poll on reused fds
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    test.addCleanup(thread.join)
+    test.addCleanup(stop.set)
+    return server.address[1]
@@ -0,0 +1,22 @@
+"""Small media files for the tests, built on the fly."""
+import os
+import struct
+
+from PIL import Image
+
+
+def make_card(folder, count=3, days=1):
+    """A card folder of count dated JPEGs spread over days, all different. Returns their sorted paths."""
+    os.makedirs(folder)
+    for i in range(count):
+        exif = Image.Exif()
+        exif.get_ifd(0x8769)[0x9003] = f"2025:06:{20 + i % days:02d} 10:00:{i:02d}"
+        path = os.path.join(folder, f"IMG_{i:04d}.JPG")
+        Image.new("RGB", (32, 32), (i, 0, 0)).save(path, exif=exif)
+        os.utime(path, (1750400000 + i, 1750400000 + i))  # Catalog entries record mtime_ns
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder))
+
+
+def box(box_type, payload):
+    """An ISO BMFF (MP4/MOV/CR3) box: 32-bit size, four character type, payload."""
+    return struct.pack('>I', len(payload) + 8) + box_type.encode('latin-1') + payload
@@ -0,0 +1,83 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from src import catalog as catalog_module
+from src.catalog import Catalog
+
+
+def make_entry(folder, name, file_type="IMAGES", date="2025-06-27T10:00:00", content_hash=None):
+    entry = {"filename": name, "filepath": os.path.join(folder, name),
+             "creation_date": date, "file_type": file_type}
+    if content_hash:
+        entry["content_hash"] = content_hash
+    return entry
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_journal_replay_and_indexes(self):
+        catalog = Catalog(self.folder)
+        catalog.add(make_entry(self.folder, "IMG_1.JPG", content_hash="aa"))
+        catalog.add(make_entry(self.folder, "MVI_1.MP4", file_type="VIDEOS", date="2025-06-28T09:00:00"))
+        catalog.add(make_entry(self.folder, "IMG_2.JPG"))
+        catalog.remove(os.path.join(self.folder, "IMG_2.JPG"))
+        catalog.close()
+
+        reopened = Catalog(self.folder)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.records, 4)
+        self.assertEqual([e["filename"] for e in reopened.find_by_hash("aa")], ["IMG_1.JPG"])
+        self.assertEqual([e["filename"] for e in reopened.find_by_date("2025-06-28")], ["MVI_1.MP4"])
+        self.assertEqual([e["filename"] for e in reopened.find_by_type("IMAGES", "VIDEOS")],
+                         ["IMG_1.JPG", "MVI_1.MP4"])
+
+    def test_truncated_last_line_is_ignored(self):
+        catalog = Catalog(self.folder)
+        catalog.add(make_entry(self.folder, "IMG_1.JPG"))
+        catalog.close()
+        with open(catalog.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "put", "entry": {"filen')
+        self.assertEqual(len(Catalog(self.folder)), 1)
+
+    def test_legacy_metadata_imported_on_first_change_and_exported(self):
+        legacy = {"files": [make_entry(self.folder, "IMG_1.JPG")]}
+        with open(os.path.join(self.folder, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(legacy, f)
+
+        catalog = Catalog(self.folder)
+        self.assertEqual(len(catalog), 1)
+        self.assertFalse(os.path.exists(catalog.journal_path))  # Read-only until changed
+
+        catalog.add(make_entry(self.folder, "IMG_2.JPG"))
+        catalog.close()
+        self.assertEqual(len(Catalog(self.folder)), 2)
+
+        exported = os.path.join(self.folder, "export.json")
+        Catalog(self.folder).export_legacy(exported)
+        with open(exported, encoding="utf-8") as f:
+            self.assertEqual([e["filename"] for e in json.load(f)["files"]], ["IMG_1.JPG", "IMG_2.JPG"])
+
+    def test_compaction_drops_superseded_records(self):
+        catalog = Catalog(self.folder)
+        for i in range(5):
+            catalog.update(os.path.join(self.folder, "IMG_1.JPG"), filename="IMG_1.JPG", revision=i)
+        with mock.patch.object(catalog_module, "COMPACT_MIN_RECORDS", 3):
+            self.assertTrue(catalog.maybe_compact())
+        catalog.close()
+
+        with open(catalog.journal_path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(Catalog(self.folder).get(os.path.join(self.folder, "IMG_1.JPG"))["revision"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import io
+import os
+import base64
+import hashlib
+import tempfile
+import time
+import unittest
+
+from src.chunked_upload import UploadSessions, UploadError
+
+
+def checksum(data):
+    return "sha256 " + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+class TestChunkedUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = self.tmpdir.name
+        self.data = os.urandom(2500)
+        self.sessions = UploadSessions(self.folder, chunk_size=1000)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def send(self, session, index, data=None):
+        chunk = self.data[index * 1000:(index + 1) * 1000]
+        return session.write_chunk(index * 1000, io.BytesIO(chunk if data is None else data), checksum(chunk))
+
+    def test_out_of_order_chunks_and_hash(self):
+        session = self.sessions.create("clip.mp4", len(self.data), hashlib.md5(self.data).hexdigest())
+        self.assertEqual(self.send(session, 2), 0)
+        self.assertEqual(self.send(session, 0), 1000)
+        self.assertEqual(self.send(session, 1), 2500)
+        destination = os.path.join(self.folder, "clip.mp4")
+        self.assertEqual(self.sessions.finish(session.id, destination), hashlib.md5(self.data).hexdigest())
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.listdir(self.sessions.folder), [])
+
+    def test_rejects_bad_chunks(self):
+        session = self.sessions.create("clip.mp4", len(self.data))
+        with self.assertRaises(UploadError) as raised:
+            self.send(session, 0, data=b"x" * 1000)
+        self.assertEqual(raised.exception.status, 460)
+        with self.assertRaises(UploadError):
+            self.send(session, 0, data=self.data[:999])  # Short body
+        with self.assertRaises(UploadError):
+            session.write_chunk(500, io.BytesIO(self.data[500:1500]))  # Not on a chunk boundary
+        with self.assertRaises(UploadError) as raised:
+            self.sessions.finish(session.id, os.path.join(self.folder, "clip.mp4"))
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(session.offset, 0)
+
+    def test_declared_hash_is_checked(self):
+        session = self.sessions.create("clip.mp4", len(self.data), hashlib.md5(b"other").hexdigest())
+        for index in range(3):
+            self.send(session, index)
+        with self.assertRaises(UploadError) as raised:
+            self.sessions.finish(session.id, os.path.join(self.folder, "clip.mp4"))
+        self.assertEqual(raised.exception.status, 422)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "clip.mp4")))
+
+    def test_resume_after_restart(self):
+        session = self.sessions.create("clip.mp4", len(self.data))
+        self.send(session, 0)
+        self.send(session, 2)
+
+        reloaded = UploadSessions(self.folder, chunk_size=1000).get(session.id)
+        self.assertEqual((reloaded.offset, sorted(reloaded.received)), (1000, [0, 2]))
+        self.send(reloaded, 1)
+        destination = os.path.join(self.folder, "clip.mp4")
+        self.assertEqual(reloaded.finish(destination), hashlib.md5(self.data).hexdigest())
+
+    def test_abandoned_sessions_are_collected(self):
+        old = self.sessions.create("old.mp4", 10)
+        new = self.sessions.create("new.mp4", 10)
+        old.state["updated_at"] = 0
+        self.assertEqual(self.sessions.collect_garbage(), 1)
+        self.assertFalse(os.path.exists(old.part_path))
+        self.assertIs(self.sessions.get(new.id), new)
+        with self.assertRaises(UploadError):
+            self.sessions.get(old.id)
+
+    def test_collector_removes_abandoned_sessions_while_idle(self):
+        old = self.sessions.create("old.mp4", 10)
+        old.state["updated_at"] = 0
+        self.sessions.start_collector(interval=0.01)
+        try:
+            for _ in range(500):
+                if not os.path.exists(old.part_path):
+                    break
+                time.sleep(0.01)
+        finally:
+            self.sessions.close()
+        self.assertFalse(os.path.exists(old.part_path))
+        self.assertIsNone(self.sessions.collector)
+
+    def test_rejects_sizes_over_the_limit(self):
+        sessions = UploadSessions(self.folder, chunk_size=1000, max_size=5000)
+        sessions.create("fits.mp4", 5000)
+        with self.assertRaises(UploadError) as raised:
+            sessions.create("huge.mp4", 5001)
+        self.assertEqual(raised.exception.status, 413)
+        for size in (-1, "10", True, None):
+            with self.assertRaises(UploadError) as raised:
+                sessions.create("bad.mp4", size)
+            self.assertEqual(raised.exception.status, 400)
+        self.assertEqual(len(os.listdir(sessions.folder)), 2)  # Only fits.mp4's .part and .json
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from src import cloud_asgi
+from src.cloud_asgi import CloudASGI, ZERO_COPY_EXTENSION
+
+
+class TestCloudASGI(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = self.tmpdir.name
+        self.data = bytes(range(256)) * 40
+        os.makedirs(os.path.join(self.folder, ".uploads"))
+        for name in ("IMG_0001.JPG", "a%20b.jpg", "my photo.jpg", ".content_index.sqlite", ".uploads/abc.part"):
+            with open(os.path.join(self.folder, name), "wb") as f:
+                f.write(self.data)
+        flask_app = Flask(__name__)
+        flask_app.config["UPLOAD_FOLDER"] = self.folder
+        self.app = CloudASGI(flask_app)
+
+    def tearDown(self):
+        self.app.reads.shutdown()
+        self.tmpdir.cleanup()
+
+    def call(self, path, method="GET", headers=(), extensions=None, messages=()):
+        scope = {"type": "http", "method": method, "path": path, "query_string": b"",
+                 "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]}
+        if extensions is not None:
+            scope["extensions"] = extensions
+        received = list(messages)
+        sent = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.app(scope, receive, send))
+        return sent
+
+    def response(self, *args, **kwargs):
+        sent = self.call(*args, **kwargs)
+        start, bodies = sent[0], sent[1:]
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in start["headers"]}
+        return start["status"], headers, bodies
+
+    def test_streams_whole_file(self):
+        with mock.patch.object(cloud_asgi, "DOWNLOAD_CHUNK_SIZE", 4096):
+            status, headers, bodies = self.response("/download/IMG_0001.JPG")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-length"], str(len(self.data)))
+        self.assertEqual(b"".join(body["body"] for body in bodies), self.data)
+        self.assertEqual(len(bodies), 3)  # 10240 bytes in 4096-byte reads
+        self.assertEqual([body["more_body"] for body in bodies], [True, True, False])
+
+    def test_range_and_unsatisfiable_range(self):
+        status, headers, bodies = self.response("/download/IMG_0001.JPG", headers=[("Range", "bytes=100-199")])
+        self.assertEqual(status, 206)
+        self.assertEqual(headers["content-range"], f"bytes 100-199/{len(self.data)}")
+        self.assertEqual(b"".join(body["body"] for body in bodies), self.data[100:200])
+
+        status, headers, bodies = self.response("/download/IMG_0001.JPG", headers=[("Range", "bytes=999999-")])
+        self.assertEqual(status, 416)
+        self.assertEqual(headers["content-range"], f"bytes */{len(self.data)}")
+        self.assertEqual(bodies, [{"type": "http.response.body", "body": b""}])
+
+    def test_head_sends_headers_only(self):
+        status, headers, bodies = self.response("/download/IMG_0001.JPG", method="HEAD")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-length"], str(len(self.data)))
+        self.assertEqual(bodies, [{"type": "http.response.body", "body": b""}])
+
+    def test_path_is_not_decoded_twice(self):
+        # The server already decoded "%2520" to "%20" and "%20" to " "
+        for name in ("a%20b.jpg", "my photo.jpg"):
+            status, headers, _ = self.response("/download/" + name)
+            self.assertEqual(status, 200, name)
+        self.assertEqual(self.response("/download/a b.jpg")[0], 404)
+
+    def test_hidden_and_outside_files_are_not_served(self):
+        for path in ("/download/.content_index.sqlite", "/download/../etc/passwd", "/download/missing.jpg",
+                     "/download/x/../.content_index.sqlite", "/download/.uploads/abc.part",
+                     "/download/x/../.uploads/abc.part", "/download/"):
+            self.assertEqual(self.response(path)[0], 404, path)
+
+    def test_zero_copy_extension(self):
+        status, headers, bodies = self.response("/download/IMG_0001.JPG", headers=[("Range", "bytes=10-")],
+                                                extensions={ZERO_COPY_EXTENSION: {}})
+        self.assertEqual(status, 206)
+        self.assertEqual(len(bodies), 1)
+        self.assertEqual(bodies[0]["type"], ZERO_COPY_EXTENSION)
+        self.assertEqual((bodies[0]["offset"], bodies[0]["count"]), (10, len(self.data) - 10))
+        self.assertTrue(bodies[0]["file"].closed)  # Closed once the server is done with it
+
+        # Without the extension (uvicorn) the same request is streamed
+        status, _, bodies = self.response("/download/IMG_0001.JPG", headers=[("Range", "bytes=10-")],
+                                          extensions={})
+        self.assertEqual(status, 206)
+        self.assertEqual(b"".join(body["body"] for body in bodies), self.data[10:])
+
+    def test_other_routes_go_to_flask(self):
+        calls = []
+
+        async def flask(scope, receive, send):
+            calls.append((scope["method"], scope["path"]))
+
+        self.app.flask = flask
+        self.call("/files")
+        self.call("/download/IMG_0001.JPG", method="DELETE")
+        self.assertEqual(calls, [("GET", "/files"), ("DELETE", "/download/IMG_0001.JPG")])
+
+        self.app.flask = None  # asgiref missing
+        status, _, bodies = self.response("/files")
+        self.assertEqual(status, 501)
+
+    def test_lifespan(self):
+        received = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(self.app({"type": "lifespan"}, receive, send))
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+
+    def test_app_is_built_lazily(self):
+        self.assertNotIn("app", vars(cloud_asgi))
+        with self.assertRaises(AttributeError):
+            cloud_asgi.missing_attribute
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import hashlib
+import tempfile
+import unittest
+
+import threading
+from unittest import mock
+
+from src import content_index
+from src.content_index import ContentIndex, ContentIndexes, IndexNotReady
+
+
+class TestContentIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = self.tmpdir.name
+        self.write("IMG_1.JPG", b"photo one")
+        self.index = ContentIndex(self.folder)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmpdir.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.folder, name), "wb") as f:
+            f.write(data)
+
+    def test_missing_by_hash_or_name_and_size(self):
+        files = [
+            {"name": "renamed.jpg", "size": 9, "hash": hashlib.md5(b"photo one").hexdigest()},
+            {"name": "IMG_2.JPG", "size": 9, "hash": hashlib.md5(b"photo two").hexdigest()},
+            {"name": "IMG_1.JPG", "size": 9},
+            {"name": "IMG_1.JPG", "size": 10},
+        ]
+        self.assertEqual(self.index.missing(files), files[1:2] + files[3:])
+
+    def test_rescans_only_when_folder_changes(self):
+        self.assertTrue(self.index.refresh())
+        self.assertFalse(self.index.refresh())
+        self.write("IMG_2.JPG", b"photo two")
+        self.assertTrue(self.index.has(content_hash=hashlib.md5(b"photo one").hexdigest()))
+        self.assertTrue(self.index.refresh())
+        self.assertTrue(self.index.has(content_hash=hashlib.md5(b"photo two").hexdigest()))
+        self.assertNotIn(".content_index.sqlite", self.index.by_name)
+
+        os.remove(os.path.join(self.folder, "IMG_1.JPG"))
+        self.assertEqual(len(self.index.missing([{"hash": hashlib.md5(b"photo one").hexdigest()}])), 1)
+
+    def test_add_uses_given_hash(self):
+        self.index.refresh()
+        before = self.index.folder_mtime_ns()
+        self.write("upload.bin", b"uploaded")
+        self.index.add(os.path.join(self.folder, "upload.bin"), "given", before)
+        self.assertTrue(self.index.has(content_hash="given"))
+        self.assertFalse(self.index.refresh())  # The server's own write doesn't force a rescan
+
+        reopened = ContentIndex(self.folder)
+        self.addCleanup(reopened.close)
+        reopened.refresh()  # Served from the manifest, the file isn't read again
+        self.assertTrue(reopened.has(content_hash="given"))
+
+    def test_add_keeps_changes_from_outside(self):
+        self.index.refresh()
+        os.remove(os.path.join(self.folder, "IMG_1.JPG"))
+        # Coarse filesystem timestamps could leave the mtime as it was within one tick
+        os.utime(self.folder, ns=(self.index.scanned_mtime_ns + 10 ** 9, self.index.scanned_mtime_ns + 10 ** 9))
+
+        before = self.index.folder_mtime_ns()
+        self.write("upload.bin", b"uploaded")
+        self.index.add(os.path.join(self.folder, "upload.bin"), folder_mtime_ns=before)
+        self.assertTrue(self.index.refresh())  # The deletion isn't hidden behind the server's write
+        self.assertFalse(self.index.has("IMG_1.JPG", 9))
+        self.assertTrue(self.index.has("upload.bin", 8))
+
+
+class TestContentIndexes(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = self.tmpdir.name
+        with open(os.path.join(self.folder, "IMG_1.JPG"), "wb") as f:
+            f.write(b"photo one")
+        self.indexes = ContentIndexes(self.folder)
+
+    def tearDown(self):
+        self.indexes.close()
+        self.tmpdir.cleanup()
+
+    def wait_for_builds(self):
+        for thread in list(self.indexes.builders.values()):
+            thread.join()
+
+    def test_sha256_index_built_on_first_use(self):
+        self.assertEqual(list(self.indexes.indexes), [])
+        same = {"name": "IMG_1.JPG", "size": 9, "hash": hashlib.sha256(b"photo one").hexdigest()}
+        # Another photo with the same name and size is only told apart by its hash
+        other = {"name": "IMG_1.JPG", "size": 9, "hash": hashlib.sha256(b"photo 1!!").hexdigest()}
+        self.indexes.build()
+        self.wait_for_builds()
+        with self.assertRaises(IndexNotReady):  # The first ask only starts hashing the folder
+            self.indexes.missing([same, other], "sha256")
+        self.wait_for_builds()
+        self.assertEqual(self.indexes.missing([same, other], "sha256"), [other])
+        self.assertEqual(self.indexes.missing([{"name": "IMG_1.JPG", "size": 9}], "sha256"), [])
+        self.assertEqual(sorted(self.indexes.indexes), ["md5", "sha256"])
+        self.assertTrue(os.path.exists(os.path.join(self.folder, ".content_index_sha256.sqlite")))
+        with self.assertRaises(ValueError):
+            self.indexes.missing([same], "crc32")
+
+    def test_answers_not_ready_while_building(self):
+        scanning, release = threading.Event(), threading.Event()
+        real_hash = content_index.cached_file_hash
+
+        def slow_hash(*args):
+            scanning.set()
+            release.wait(5)
+            return real_hash(*args)
+
+        with mock.patch.object(content_index, "cached_file_hash", slow_hash):
+            self.indexes.build()
+            self.assertTrue(scanning.wait(5))
+            with self.assertRaises(IndexNotReady):
+                self.indexes.missing([{"name": "IMG_1.JPG", "size": 9}])
+            release.set()
+            self.wait_for_builds()
+        self.assertEqual(self.indexes.missing([{"name": "IMG_1.JPG", "size": 9}]), [])
+        self.assertEqual(self.indexes.builders, {})
+
+    def test_add_updates_every_index(self):
+        md5, sha256 = self.indexes.get(), self.indexes.get("sha256")
+        md5.refresh()
+        sha256.refresh()
+        before = self.indexes.folder_mtime_ns()
+        path = os.path.join(self.folder, "upload.bin")
+        with open(path, "wb") as f:
+            f.write(b"uploaded")
+        self.indexes.add(path, "given", "md5", before)
+        self.assertTrue(md5.has(content_hash="given"))
+        self.assertTrue(sha256.has(content_hash=hashlib.sha256(b"uploaded").hexdigest()))
+        self.assertFalse(md5.refresh())
+        self.assertFalse(sha256.refresh())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from src import dedup, picchronicle
+from src.catalog import Catalog
+from src.dedup import DuplicateIndex, partial_hash
+from src.file_hashing import hash_file
+from sample_media import make_card
+
+
+class TestDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.library = os.path.join(self.tmpdir.name, "organized")
+        os.makedirs(self.library)
+        self.catalog = Catalog(self.library)
+        self.originals = {}
+        for name, data in (("a.jpg", b"A" * 200000), ("b.jpg", b"B" * 200000), ("c.jpg", b"C" * 10)):
+            path = self.write(os.path.join(self.library, name), data)
+            entry = {"filename": name, "filepath": path, "file_type": "IMAGES"}
+            if name != "b.jpg":  # b.jpg is an entry from before hashes were recorded
+                entry.update(content_hash=hash_file(path), hash_algorithm="md5", size=len(data))
+            self.catalog.add(entry)
+            self.originals[name] = path
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmpdir.cleanup()
+
+    def write(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+        return os.path.abspath(path)
+
+    def test_partial_hash_covers_both_ends(self):
+        head = self.write(os.path.join(self.tmpdir.name, "head"), b"x" + b"A" * 199999)
+        tail = self.write(os.path.join(self.tmpdir.name, "tail"), b"A" * 199999 + b"x")
+        middle = self.write(os.path.join(self.tmpdir.name, "middle"), b"A" * 100000 + b"x" + b"A" * 99999)
+        reference = partial_hash(self.originals["a.jpg"])
+        self.assertNotEqual(partial_hash(head), reference)
+        self.assertNotEqual(partial_hash(tail), reference)
+        self.assertEqual(partial_hash(middle), reference)  # Only the full hash tells these apart
+
+    def test_find_narrows_by_size_partial_then_full_hash(self):
+        index = DuplicateIndex(self.catalog)
+        with mock.patch.object(dedup, "hash_file", wraps=hash_file) as full_hash:
+            self.assertIsNone(index.find(self.write(os.path.join(self.tmpdir.name, "new"), b"N" * 5)))
+            self.assertIsNone(index.find(self.write(os.path.join(self.tmpdir.name, "new"), b"N" * 200000)))
+            self.assertEqual(full_hash.call_count, 0)
+
+            middle = b"A" * 100000 + b"x" + b"A" * 99999
+            self.assertIsNone(index.find(self.write(os.path.join(self.tmpdir.name, "new"), middle)))
+            copy = self.write(os.path.join(self.tmpdir.name, "copy"), b"B" * 200000)
+            self.assertEqual(index.find(copy)["filepath"], self.originals["b.jpg"])
+        self.assertEqual(index.stats, {"checked": 4, "same_size": 3, "same_partial": 2, "duplicates": 1})
+        # The hash computed for the older entry is kept in the catalog
+        self.assertEqual(self.catalog.get(self.originals["b.jpg"])["content_hash"], hash_file(copy))
+
+
+class TestDuplicatePolicies(unittest.TestCase):
+    def organize(self, root, policy):
+        destination = os.path.join(root, "organized")
+        card = make_card(os.path.join(root, "card"))
+        # Same shots again from a second card, one of them renamed
+        second = os.path.join(root, "card2")
+        shutil.copytree(os.path.join(root, "card"), second)
+        os.rename(os.path.join(second, "IMG_0002.JPG"), os.path.join(second, "IMG_9999.JPG"))
+        with mock.patch.object(picchronicle, "DESTINATION_FOLDER", destination), \
+                mock.patch.object(picchronicle, "QUARANTINE_FOLDER", os.path.join(destination, "duplicates")):
+            catalog = picchronicle.open_catalog()
+            picchronicle.organize_files(card + sorted(os.path.join(second, f) for f in os.listdir(second)),
+                                        catalog, duplicate_policy=policy)
+            catalog.close()
+        return destination, second, Catalog(destination)
+
+    def test_skip(self):
+        with tempfile.TemporaryDirectory() as root:
+            destination, second, catalog = self.organize(root, "skip")
+            self.assertEqual(len([entry for entry in catalog if not entry.get("skipped")]), 3)
+            self.assertEqual(len(os.listdir(second)), 3)
+            # The duplicates are recorded, so the next run leaves them alone without hashing them
+            skipped = sorted(entry["filepath"] for entry in catalog if entry.get("skipped"))
+            self.assertEqual(skipped, sorted(os.path.join(second, f) for f in os.listdir(second)))
+            self.assertTrue(set(skipped) <= picchronicle.processed_paths(catalog))
+            # Until the file at that path changes, e.g. a new shot on a reformatted card
+            with open(skipped[0], "ab") as f:
+                f.write(b"new")
+            self.assertNotIn(skipped[0], picchronicle.processed_paths(catalog))
+
+    def test_link_without_hardlinks_quarantines(self):
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.object(picchronicle, "supports_hardlinks", return_value=False):
+            destination, second, catalog = self.organize(root, "link")
+            self.assertEqual(os.listdir(second), [])
+            self.assertEqual(len(catalog), 3)
+            self.assertEqual(len(os.listdir(os.path.join(destination, "duplicates"))), 3)
+
+    def test_full_hash_read_once(self):
+        with tempfile.TemporaryDirectory() as root:
+            library = os.path.join(root, "organized")
+            os.makedirs(os.path.join(root, "card"))
+            # Same size and both ends as the first file, different in the middle: only the full hash differs
+            data = bytearray(os.urandom(300000))
+            infos = []
+            for i in range(3):
+                path = os.path.join(root, "card", f"IMG_{i:04d}.JPG")
+                with open(path, "wb") as f:
+                    f.write(data)
+                data[150000] = (data[150000] + 1) % 256
+                infos.append({"file_path": path, "filename": f"IMG_{i:04d}.JPG",
+                              "folder_parts": ("2025", "06", "20", "images"), "entry": {"file_type": "IMAGES"}})
+            with mock.patch.object(picchronicle, "DESTINATION_FOLDER", library), \
+                    mock.patch.object(dedup, "hash_file", wraps=hash_file) as dedup_hash, \
+                    mock.patch.object(picchronicle, "move_with_hash", wraps=picchronicle.move_with_hash) as move:
+                catalog = picchronicle.open_catalog()
+                picchronicle.place_files(infos, catalog, DuplicateIndex(catalog), "skip")
+                self.assertEqual(len(catalog), 3)
+                catalog.close()
+            # The second and third file are read in full by the duplicate check, which hands the hash to the move
+            self.assertEqual(dedup_hash.call_count, 2)
+            passed = [call.args[3] for call in move.call_args_list]
+            self.assertEqual(passed, [None, hash_file(move.call_args_list[1].args[1]),
+                                      hash_file(move.call_args_list[2].args[1])])
+
+    def test_link(self):
+        with tempfile.TemporaryDirectory() as root:
+            destination, second, catalog = self.organize(root, "link")
+            self.assertEqual(os.listdir(second), [])
+            self.assertEqual(len(catalog), 4)  # IMG_9999.JPG is a new name for IMG_0002.JPG
+            linked = [entry for entry in catalog if entry.get("duplicate_of")]
+            self.assertEqual([entry["filename"] for entry in linked], ["IMG_9999.JPG"])
+            self.assertTrue(os.path.samefile(linked[0]["filepath"], linked[0]["duplicate_of"]))
+
+    def test_quarantine(self):
+        with tempfile.TemporaryDirectory() as root:
+            destination, second, catalog = self.organize(root, "quarantine")
+            self.assertEqual(len(catalog), 3)
+            self.assertEqual(sorted(os.listdir(os.path.join(destination, "duplicates"))),
+                             ["IMG_0000.JPG", "IMG_0001.JPG", "IMG_9999.JPG"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from werkzeug.http import http_date
+
+from src.downloads import plan_download, file_etag
+
+
+class TestDownloads(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "MVI_0001.MP4")
+        with open(self.path, "wb") as f:
+            f.write(b"x" * 1000)
+        os.utime(self.path, (1718000000, 1718000000))
+        self.etag = file_etag(os.stat(self.path))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_full_and_ranged(self):
+        plan = plan_download(self.path, {})
+        self.assertEqual((plan.status, plan.offset, plan.length), (200, 0, 1000))
+        self.assertEqual(plan.headers["Content-Type"], "video/mp4")
+        self.assertTrue(plan.headers["Content-Disposition"].startswith("attachment"))
+
+        plan = plan_download(self.path, {"Range": "bytes=100-"}, as_attachment=False)
+        self.assertEqual((plan.status, plan.offset, plan.length), (206, 100, 900))
+        self.assertEqual(plan.headers["Content-Range"], "bytes 100-999/1000")
+        self.assertTrue(plan.headers["Content-Disposition"].startswith("inline"))
+
+        plan = plan_download(self.path, {"Range": "bytes=2000-"})
+        self.assertEqual((plan.status, plan.headers["Content-Range"]), (416, "bytes */1000"))
+        # Several ranges: the whole file is a valid answer
+        self.assertEqual(plan_download(self.path, {"Range": "bytes=0-1,5-6"}).status, 200)
+
+    def test_conditional_requests(self):
+        self.assertEqual(plan_download(self.path, {"If-None-Match": f'"{self.etag}"'}).status, 304)
+        self.assertEqual(plan_download(self.path, {"If-None-Match": '"other"'}).status, 200)
+        self.assertEqual(plan_download(self.path, {"If-Modified-Since": http_date(1718000000)}).status, 304)
+        self.assertEqual(plan_download(self.path, {"If-Modified-Since": http_date(1717000000)}).status, 200)
+
+    def test_if_range_only_resumes_same_file(self):
+        resume = {"Range": "bytes=500-", "If-Range": f'"{self.etag}"'}
+        self.assertEqual(plan_download(self.path, resume).status, 206)
+        with open(self.path, "ab") as f:
+            f.write(b"changed")
+        self.assertEqual(plan_download(self.path, resume).status, 200)
+
+    def test_if_range_date_must_match_exactly(self):
+        resume = {"Range": "bytes=500-", "If-Range": http_date(1718000000)}
+        self.assertEqual(plan_download(self.path, resume).status, 206)
+        for date in (1717000000, 1719000000):  # Older: the file changed since; newer: not what was sent
+            resume["If-Range"] = http_date(date)
+            plan = plan_download(self.path, resume)
+            self.assertEqual((plan.status, plan.offset, plan.length), (200, 0, 1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import hashlib
+import tempfile
+import unittest
+
+from src.file_hashing import HashEngine, hash_file, cached_file_hash
+from src.hash_manifest import HashManifest
+
+
+class TestFileHashing(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'IMG_0001.JPG')
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 2500)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hash_file_streams_in_chunks(self):
+        # A chunk size smaller than the file must give the same digest as one read.
+        expected = hashlib.md5(b'x' * 2500).hexdigest()
+        self.assertEqual(hash_file(self.path, 'md5', chunk_size=1024), expected)
+
+    def test_hash_file_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            hash_file(self.path, 'not-a-hash')
+
+    def open_cache(self, folder=None):
+        cache = HashManifest(os.path.join(folder or self.tmpdir.name, 'cache.sqlite'))
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_cache_reused_until_file_changes(self):
+        cache = self.open_cache()
+        first = cached_file_hash(self.path, cache)
+
+        # Poison the cached value: an unchanged file must return it without re-reading.
+        cache.put(self.path, os.stat(self.path), 'md5', 'cached')
+        cache.save()
+        self.assertEqual(cached_file_hash(self.path, cache), 'cached')
+        self.assertEqual(cached_file_hash(self.path, cache, full_rehash=True), first)
+
+        with open(self.path, 'ab') as f:
+            f.write(b'y')
+        self.assertNotEqual(cached_file_hash(self.path, cache), first)
+
+    def test_cache_persists_and_prunes(self):
+        cache = self.open_cache()
+        first = cached_file_hash(self.path, cache)
+        cache.close()
+
+        reloaded = self.open_cache()
+        st = os.stat(self.path)
+        self.assertEqual(reloaded.get(self.path, st), first)
+        reloaded.prune(self.tmpdir.name, set())
+        self.assertIsNone(reloaded.get(self.path, st))
+
+    def test_engine_hashes_folder_in_parallel(self):
+        paths = [self.path]
+        for i in range(5):
+            path = os.path.join(self.tmpdir.name, 'sub', f'MVI_{i}.MP4')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(bytes([i]) * 4096)
+            paths.append(path)
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        cache = self.open_cache(cache_dir.name)
+        engine = HashEngine(workers=3, readahead=1024, cache=cache)
+        results = dict(engine.iter_hashes(self.tmpdir.name))
+        self.assertEqual(sorted(results), sorted(paths))
+        self.assertEqual(results[self.path], hash_file(self.path))
+        self.assertEqual(engine.meter.files, len(paths))
+
+        # A second scan is served entirely from the cache.
+        rescan = HashEngine(workers=3, cache=cache)
+        self.assertEqual(dict(rescan.iter_hashes(self.tmpdir.name)), results)
+        self.assertEqual(rescan.meter.files, 0)
+        self.assertEqual(rescan.meter.skipped, len(paths))
+
+        excluded = HashEngine(workers=3, cache=cache)
+        self.assertEqual(sorted(dict(excluded.iter_hashes(self.tmpdir.name, exclude=os.path.join(self.tmpdir.name, 'sub')))),
+                         [self.path])
+
+
+if __name__ == '__main__':
+    unittest.main()
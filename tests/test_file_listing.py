@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from src import file_listing
+from src.file_listing import FileListing
+
+
+class TestFileListing(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = self.tmpdir.name
+        for day in range(1, 6):
+            self.write(f"IMG_{day}.JPG" if day % 2 else f"MVI_{day}.MP4", day)
+        os.makedirs(os.path.join(self.folder, ".uploads"))
+        self.listing = FileListing(self.folder)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, day):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * day)
+        mtime = datetime(2024, 6, day, 12).timestamp()
+        os.utime(path, (mtime, mtime))
+
+    def names(self, entries):
+        return [entry["name"] for entry in entries]
+
+    def test_cursor_pages_survive_new_files(self):
+        first, cursor = self.listing.page(limit=2)
+        self.assertEqual(self.names(first), ["IMG_1.JPG", "IMG_3.JPG"])
+        self.write("AAA.JPG", 1)  # Sorts before the cursor, must not shift the next page
+        second, cursor = self.listing.page(cursor=cursor, limit=2)
+        self.assertEqual(self.names(second), ["IMG_5.JPG", "MVI_2.MP4"])
+        third, cursor = self.listing.page(cursor=cursor, limit=2)
+        self.assertEqual((self.names(third), cursor), (["MVI_4.MP4"], None))
+
+    def test_filters_and_sort_orders(self):
+        entries, _ = self.listing.page("newest", types={"videos"})
+        self.assertEqual(self.names(entries), ["MVI_4.MP4", "MVI_2.MP4"])
+        entries, _ = self.listing.page("oldest", since=datetime(2024, 6, 2), until=datetime(2024, 6, 4, 23))
+        self.assertEqual(self.names(entries), ["MVI_2.MP4", "IMG_3.JPG", "MVI_4.MP4"])
+        self.assertEqual(entries[0]["size"], 2)
+        with self.assertRaises(ValueError):
+            self.listing.page("newest", cursor=self.listing.page(limit=1)[1])
+
+    def test_signature_tracks_changes(self):
+        signature = self.listing.refresh()
+        self.assertEqual(FileListing(self.folder).refresh(), signature)  # Stable across restarts
+        with open(os.path.join(self.folder, "IMG_1.JPG"), "ab") as f:
+            f.write(b"more")  # In place: the folder mtime doesn't change
+        self.assertEqual(self.listing.refresh(), signature)
+        self.listing.invalidate()
+        self.assertNotEqual(self.listing.refresh(), signature)
+
+    def test_invalidate_during_scan_is_kept(self):
+        self.listing.refresh()
+        real_file_type = file_listing.file_type
+        listed = []
+
+        def file_type_then_overwrite(name):
+            listed.append(name)
+            if len(listed) == 5:  # Every file is stat'ed: the server overwrites one and invalidates
+                with open(os.path.join(self.folder, "IMG_1.JPG"), "ab") as f:
+                    f.write(b"more")
+                self.listing.invalidate()
+            return real_file_type(name)
+
+        self.listing.invalidate()
+        with mock.patch.object(file_listing, "file_type", side_effect=file_type_then_overwrite):
+            stale = self.listing.refresh()
+        self.assertIsNone(self.listing.scanned_mtime_ns)
+        self.assertNotEqual(self.listing.refresh(), stale)  # Scanned again, now with the new size
+        self.assertEqual(self.listing.refresh(), FileListing(self.folder).refresh())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import tempfile
+import threading
+import unittest
+from ftplib import FTP
+
+from src.ftp_pool import FTPPool, UploadJob
+from src.upload_scheduler import UploadScheduler
+from ftp_test_server import HAVE_PYFTPDLIB, start_ftp_server
+
+
+@unittest.skipIf(not HAVE_PYFTPDLIB, "pyftpdlib is not installed")
+class TestFTPPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.local = os.path.join(self.tmpdir.name, "local")
+        self.remote = os.path.join(self.tmpdir.name, "remote")
+        os.makedirs(self.local)
+        os.makedirs(os.path.join(self.remote, "photos"))
+        self.port = start_ftp_server(self, self.remote)
+        self.connects = 0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def connect(self):
+        self.connects += 1
+        ftp = FTP()
+        ftp.connect("127.0.0.1", self.port)
+        ftp.login("user", "pass")
+        return ftp
+
+    def jobs(self, count, folder="/photos"):
+        jobs = []
+        for i in range(count):
+            path = os.path.join(self.local, f"IMG_{i}.JPG")
+            with open(path, "wb") as f:
+                f.write(os.urandom(1000 + i))
+            jobs.append(UploadJob(path, f"{folder}/IMG_{i}.JPG"))
+        return jobs
+
+    def test_uploads_over_several_sessions(self):
+        done = []
+        jobs = self.jobs(12)
+        for job in jobs:
+            job.on_done = done.append
+        pool = FTPPool(self.connect, sessions=3)
+        self.assertEqual(pool.run(jobs), (12, 0))
+        self.assertEqual(self.connects, 3)  # One login per session, not per file
+        self.assertEqual(len(done), 12)
+        for i in range(12):
+            with open(os.path.join(self.remote, "photos", f"IMG_{i}.JPG"), "rb") as remote, \
+                    open(os.path.join(self.local, f"IMG_{i}.JPG"), "rb") as local:
+                self.assertEqual(remote.read(), local.read())
+        self.assertEqual(pool.meter.bytes, sum(job.size for job in jobs))
+
+    def test_reconnects_and_gives_up(self):
+        attempts = []
+
+        def flaky_connect():
+            attempts.append(1)
+            return None if len(attempts) == 1 else self.connect()  # The first login fails
+
+        pool = FTPPool(flaky_connect, sessions=1, retries=3, backoff=0)
+        jobs = self.jobs(2) + self.jobs(1, folder="/no/such/folder")
+        self.assertEqual(pool.run(jobs), (2, 1))
+        self.assertEqual(pool.failed[0][0].remote_path, "/no/such/folder/IMG_0.JPG")
+        self.assertEqual(len(attempts), 4)  # The failed login, then a fresh session after each failed STOR
+
+    def test_refused_login_steps_back(self):
+        logins = []
+        lock = threading.Lock()
+        refused = threading.Event()
+
+        def phone_connect():  # A phone that takes two logins at a time
+            with lock:
+                if sum(ftp.sock is not None for ftp in logins) >= 2:
+                    refused.set()
+                    return None
+                ftp = self.connect()
+                logins.append(ftp)
+            refused.wait(5)  # Keep both sessions busy until the third login was tried
+            return ftp
+
+        scheduler = UploadScheduler("fifo", sessions=3)
+        pool = FTPPool(phone_connect, scheduler=scheduler, backoff=0)
+        self.assertEqual(pool.run(self.jobs(8)), (8, 0))  # The refused worker's file went to the others
+        self.assertTrue(refused.is_set())
+        self.assertEqual(self.connects, 2)
+        self.assertEqual((scheduler.tuner.limit, scheduler.tuner.max_sessions), (2, 2))
+        self.assertEqual(len(os.listdir(os.path.join(self.remote, "photos"))), 8)
+
+
+    def partial_job(self, rest=True):
+        data = os.urandom(50000)
+        path = os.path.join(self.local, "MVI_1.MP4")
+        with open(path, "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.remote, "photos", "MVI_1.MP4"), "wb") as f:
+            f.write(data[:20000])  # Left by an interrupted upload
+        if not rest:
+            self.port = start_ftp_server(self, self.remote, rest=False)
+        return data, UploadJob(path, "/photos/MVI_1.MP4", offset=20000)
+
+    def test_resumes_at_offset(self):
+        data, job = self.partial_job()
+        pool = FTPPool(self.connect, sessions=1)
+        self.assertEqual(pool.run([job]), (1, 0))
+        with open(os.path.join(self.remote, "photos", "MVI_1.MP4"), "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(pool.meter.bytes, 30000)  # Only the missing part was sent
+
+    def test_retry_continues_where_the_failed_attempt_stopped(self):
+        path = os.path.join(self.local, "MVI_2.MP4")
+        data = os.urandom(3 * 1024 * 1024)
+        with open(path, "wb") as f:
+            f.write(data)
+        failures = []
+
+        def dropping_connect():
+            ftp = self.connect()
+            if not failures:
+                store = ftp.storbinary
+
+                def storbinary(cmd, fp, blocksize, callback=None, rest=None):
+                    def drop(block):
+                        failures.append(1)
+                        raise ConnectionResetError("Wi-Fi dropped")
+                    return store(cmd, fp, blocksize, callback=drop, rest=rest)
+                ftp.storbinary = storbinary  # The first session dies after its first block
+            return ftp
+
+        job = UploadJob(path, "/photos/MVI_2.MP4")
+        pool = FTPPool(dropping_connect, sessions=1, backoff=0)
+        self.assertEqual(pool.run([job]), (1, 0))
+        self.assertEqual(len(failures), 1)
+        with open(os.path.join(self.remote, "photos", "MVI_2.MP4"), "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(pool.meter.bytes, job.size - job.offset)
+
+    def test_sends_whole_file_without_rest(self):
+        data, job = self.partial_job(rest=False)
+        pool = FTPPool(self.connect, sessions=1, backoff=0)
+        self.assertEqual(pool.run([job]), (1, 0))
+        with open(os.path.join(self.remote, "photos", "MVI_1.MP4"), "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(pool.resume)
+
+
+if __name__ == "__main__":
+    unittest.main()
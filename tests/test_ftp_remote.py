@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from ftplib import FTP
+
+from src.ftp_remote import RemoteState
+from ftp_test_server import HAVE_PYFTPDLIB, start_ftp_server
+
+
+@unittest.skipIf(not HAVE_PYFTPDLIB, "pyftpdlib is not installed")
+class TestRemoteState(unittest.TestCase):
+    def start_server(self, mlsd=True):
+        ftp = FTP()
+        ftp.connect("127.0.0.1", start_ftp_server(self, self.root, mlsd))
+        ftp.login("user", "pass")
+        self.addCleanup(ftp.close)
+        return ftp
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        os.makedirs(os.path.join(self.root, "photos", "2024"))
+        for i in range(50):
+            with open(os.path.join(self.root, "photos", "2024", f"IMG_{i}.JPG"), "wb") as f:
+                f.write(b"x" * i)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def check_lookups(self, remote):
+        for i in range(50):
+            self.assertTrue(remote.exists(f"/photos/2024/IMG_{i}.JPG"))
+        self.assertFalse(remote.exists("/photos/2024/IMG_99.JPG"))
+        self.assertFalse(remote.exists("/missing/IMG_0.JPG"))
+        self.assertEqual(remote.size("/photos/./2024/IMG_7.JPG"), 7)
+
+    def test_mlsd_lists_each_folder_once(self):
+        remote = RemoteState(self.start_server())
+        self.check_lookups(remote)
+        self.assertEqual(remote.commands, 2)  # /photos/2024 and /missing
+        self.assertEqual(remote.entry("/photos/2024")["type"], "dir")
+
+    def test_nlst_fallback(self):
+        remote = RemoteState(self.start_server(mlsd=False))
+        self.check_lookups(remote)
+        self.assertFalse(remote.use_mlsd)
+        self.assertEqual(remote.commands, 5)  # The failed MLSD, two NLSTs, TYPE I and one SIZE
+
+    def test_ensure_dir_creates_once(self):
+        ftp = self.start_server()
+        remote = RemoteState(ftp)
+        created = []
+        remote.ensure_dir("/photos/2025/06", on_create=created.append)
+        remote.ensure_dir("/photos/2025/06")
+        remote.ensure_dir("/photos/2024")
+        self.assertEqual(created, ["/photos/2025", "/photos/2025/06"])
+        self.assertTrue(os.path.isdir(os.path.join(self.root, "photos", "2025", "06")))
+        commands = remote.commands
+        remote.record_upload("/photos/2025/06/IMG_1.JPG", 10)
+        self.assertEqual(remote.size("/photos/2025/06/IMG_1.JPG"), 10)
+        self.assertEqual(remote.commands, commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
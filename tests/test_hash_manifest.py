@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from src.hash_manifest import HashManifest
+from usb_watcher import classify_new_files
+
+
+class TestHashManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manifest = HashManifest(os.path.join(self.tmpdir.name, 'manifest.sqlite'))
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmpdir.cleanup()
+
+    def test_migrates_baseline_record_file(self):
+        # The usb_file_hashes.txt the baseline usb_watcher wrote: one path::md5 line per file
+        record_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'usb_file_hashes.txt')
+        with open(record_file, 'r', encoding='utf-8') as f:
+            records = dict(line.strip().split('::') for line in f if '::' in line)  # As the baseline read it
+
+        self.assertEqual(self.manifest.migrate_text_records(record_file), len(records))
+        self.assertEqual(self.manifest.ingested_hashes(), records)
+        path, hash_val = next(iter(records.items()))
+        self.assertTrue(self.manifest.is_known(hash_val, 'md5'))
+        self.assertEqual(classify_new_files({path: hash_val, '/card/new.JPG': 'f' * 32}, self.manifest)[0],
+                         {'/card/new.JPG': 'f' * 32})
+
+    def test_migrate_text_records(self):
+        record_file = os.path.join(self.tmpdir.name, 'usb_file_hashes.txt')
+        with open(record_file, 'w', encoding='utf-8') as f:
+            f.write("D:\\DCIM\\100CANON\\IMG_0001.JPG::aaa\n")
+            f.write("D:\\DCIM\\odd::name.JPG::bbb\n")
+
+        self.assertEqual(self.manifest.migrate_text_records(record_file), 2)
+        self.assertEqual(self.manifest.ingested_hashes(), {
+            "D:\\DCIM\\100CANON\\IMG_0001.JPG": "aaa",
+            "D:\\DCIM\\odd::name.JPG": "bbb",
+        })
+        # Migration only runs once.
+        self.assertEqual(self.manifest.migrate_text_records(record_file), 0)
+
+    def test_cache_roundtrip_and_content_lookup(self):
+        path = os.path.join(self.tmpdir.name, 'IMG_0002.JPG')
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        st = os.stat(path)
+
+        self.manifest.put(path, st, 'md5', 'ccc')
+        self.manifest.save()
+        self.assertEqual(self.manifest.get(path, st, 'md5'), 'ccc')
+        self.assertIsNone(self.manifest.get(path, st, 'blake2b'))
+
+        self.assertFalse(self.manifest.is_known('ccc'))
+        self.manifest.mark_ingested({path: 'ccc'})
+        self.assertTrue(self.manifest.is_known('ccc'))
+
+        # Ingested rows survive a scan that no longer sees the file.
+        self.manifest.prune(self.tmpdir.name, set())
+        self.assertTrue(self.manifest.is_known('ccc'))
+
+    def test_is_known_by_algorithm(self):
+        self.manifest.mark_ingested({'/card/IMG_0003.JPG': 'ddd'}, 'md5')
+        self.assertTrue(self.manifest.is_known('ddd', 'md5'))
+        self.assertFalse(self.manifest.is_known('ddd', 'blake2b'))
+
+        # Re-ingesting under another algorithm replaces the recorded one.
+        self.manifest.mark_ingested({'/card/IMG_0003.JPG': 'ddd'}, 'blake2b')
+        self.assertTrue(self.manifest.is_known('ddd', 'blake2b'))
+        self.assertFalse(self.manifest.is_known('ddd', 'md5'))
+
+    def test_classify_new_files_uses_manifest(self):
+        self.manifest.mark_ingested({'/card/DCIM/IMG_0004.JPG': 'fff'}, 'md5')
+        current = {'/card/DCIM/organized/IMG_0004.JPG': 'fff', '/card/DCIM/IMG_0005.CR2': 'ggg'}
+
+        new_files, stats = classify_new_files(current, self.manifest, 'md5')
+        self.assertEqual(new_files, {'/card/DCIM/IMG_0005.CR2': 'ggg'})
+        self.assertEqual(stats['RAW'], 1)
+        # Content hashed with another algorithm is never taken as already ingested.
+        new_files, _ = classify_new_files(current, self.manifest, 'blake2b')
+        self.assertEqual(len(new_files), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
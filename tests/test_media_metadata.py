@@ -0,0 +1,157 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from datetime import datetime, timezone
+
+from src.media_metadata import (CANON_PREVIEW_UUID, CANON_UUID, read_cr3_preview, read_exif_fast,
+                                read_video_metadata)
+from sample_media import box
+
+
+def build_ifd(entries, offset, endian='<'):
+    """Serialize one IFD placed at offset; entries are (tag, type, count, raw value bytes)."""
+    data_offset = offset + 2 + len(entries) * 12 + 4
+    body, extra = struct.pack(endian + 'H', len(entries)), b''
+    for tag, typ, count, raw in entries:
+        if len(raw) <= 4:
+            body += struct.pack(endian + 'HHI', tag, typ, count) + raw.ljust(4, b'\0')
+        else:
+            body += struct.pack(endian + 'HHII', tag, typ, count, data_offset + len(extra))
+            extra += raw
+    return body + b'\0\0\0\0' + extra
+
+
+def ascii_entry(tag, text):
+    raw = text.encode('ascii') + b'\0'
+    return (tag, 2, len(raw), raw)
+
+
+def rationals(*pairs, endian='<'):
+    return b''.join(struct.pack(endian + 'II', num, den) for num, den in pairs)
+
+
+def build_tiff(endian='<'):
+    """A TIFF with Orientation, an Exif IFD with DateTimeOriginal and a GPS IFD."""
+    header = (b'II' if endian == '<' else b'MM') + struct.pack(endian + 'HI', 42, 8)
+    ifd0_size = 2 + 3 * 12 + 4
+    exif_offset = 8 + ifd0_size
+    exif = build_ifd([ascii_entry(0x9003, '2025:06:27 10:11:12')], exif_offset, endian)
+    gps_offset = exif_offset + len(exif)
+    gps = build_ifd([
+        (1, 2, 2, b'N\0'),
+        (2, 5, 3, rationals((10, 1), (20, 1), (30, 1), endian=endian)),
+        (3, 2, 2, b'W\0'),
+        (4, 5, 3, rationals((40, 1), (50, 1), (60, 1), endian=endian)),
+    ], gps_offset, endian)
+    ifd0 = build_ifd([
+        (0x0112, 3, 1, struct.pack(endian + 'H', 6)),
+        (0x8769, 4, 1, struct.pack(endian + 'I', exif_offset)),
+        (0x8825, 4, 1, struct.pack(endian + 'I', gps_offset)),
+    ], 8, endian)
+    return header + ifd0 + exif + gps
+
+
+def full_box(box_type, version, payload):
+    return box(box_type, bytes([version, 0, 0, 0]) + payload)
+
+
+def build_mp4(version=0, large_mdat=False):
+    """ftyp, mdat, then moov (as most cameras write it) with mvhd and video + audio tracks."""
+    creation = int((datetime(2025, 6, 27, 10, 0, 0, tzinfo=timezone.utc)
+                    - datetime(1904, 1, 1, tzinfo=timezone.utc)).total_seconds())
+    if version == 1:
+        mvhd = full_box('mvhd', 1, struct.pack('>QQIQ', creation, creation, 1000, 12500) + b'\0' * 80)
+        tkhd_times = struct.pack('>QQIIQ', creation, creation, 1, 0, 12500)
+    else:
+        mvhd = full_box('mvhd', 0, struct.pack('>IIII', creation, creation, 1000, 12500) + b'\0' * 80)
+        tkhd_times = struct.pack('>IIIII', creation, creation, 1, 0, 12500)
+    matrix = b'\0' * 36
+    video = full_box('tkhd', version, tkhd_times + b'\0' * 16 + matrix + struct.pack('>II', 1920 << 16, 1080 << 16))
+    audio = full_box('tkhd', version, tkhd_times + b'\0' * 16 + matrix + struct.pack('>II', 0, 0))
+    moov = box('moov', mvhd + box('trak', audio) + box('trak', video))
+    frames = b'\0' * 4096
+    if large_mdat:
+        mdat = struct.pack('>I', 1) + b'mdat' + struct.pack('>Q', len(frames) + 16) + frames
+    else:
+        mdat = box('mdat', frames)
+    return box('ftyp', b'isom\0\0\0\1isom') + mdat + moov
+
+
+class TestMediaMetadata(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def assert_metadata(self, metadata):
+        self.assertEqual(metadata['DateTimeOriginal'], '2025:06:27 10:11:12')
+        self.assertEqual(metadata['Orientation'], 6)
+        self.assertEqual(metadata['GPSInfo'][1], 'N')
+        self.assertEqual(metadata['GPSInfo'][2], ((10, 1), (20, 1), (30, 1)))
+        self.assertEqual(metadata['GPSInfo'][3], 'W')
+
+    def test_jpeg_app1(self):
+        app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\0' + b'\0' * 9
+        exif = b'Exif\0\0' + build_tiff()
+        app1 = b'\xff\xe1' + struct.pack('>H', len(exif) + 2) + exif
+        path = self.write('IMG_0001.JPG', b'\xff\xd8' + app0 + app1 + b'\xff\xda\0\x02' + b'\0' * 64)
+        self.assert_metadata(read_exif_fast(path))
+
+    def test_big_endian_tiff(self):
+        self.assert_metadata(read_exif_fast(self.write('scan.tiff', build_tiff('>'))))
+
+    def test_cr3_cmt_boxes(self):
+        full = build_tiff()
+        # CMT1 is IFD0, CMT2 starts at the Exif IFD and CMT4 at the GPS IFD.
+        cmt1 = b'II' + struct.pack('<HI', 42, 8) + build_ifd([(0x0112, 3, 1, struct.pack('<H', 6))], 8)
+        cmt2 = b'II' + struct.pack('<HI', 42, 8) + build_ifd([ascii_entry(0x9003, '2025:06:27 10:11:12')], 8)
+        gps_only = build_ifd([
+            (1, 2, 2, b'N\0'),
+            (2, 5, 3, rationals((10, 1), (20, 1), (30, 1))),
+            (3, 2, 2, b'W\0'),
+        ], 8)
+        cmt4 = b'II' + struct.pack('<HI', 42, 8) + gps_only
+        canon = box('uuid', CANON_UUID + box('CNCV', b'CanonCR3_001/00.09.00/00.00.00')
+                    + box('CMT1', cmt1) + box('CMT2', cmt2) + box('CMT4', cmt4))
+        data = box('ftyp', b'crx \0\0\0\1crx isom') + box('moov', canon) + box('mdat', full)
+        self.assert_metadata(read_exif_fast(self.write('_MG_7635.CR3', data)))
+
+    def test_cr3_embedded_previews(self):
+        jpeg = b'\xff\xd8\xff\xdb' + os.urandom(2000) + b'\xff\xd9'
+        thumb = b'\xff\xd8\xff\xdb' + os.urandom(100) + b'\xff\xd9'
+        thmb = box('THMB', bytes(4) + struct.pack('>HHI', 160, 120, len(thumb)) + bytes(4) + thumb)
+        canon = box('uuid', CANON_UUID + box('CNCV', b'CanonCR3_001') + thmb)
+        prvw = box('uuid', CANON_PREVIEW_UUID + bytes(8)
+                   + box('PRVW', bytes(6) + struct.pack('>HHHI', 1620, 1080, 1, len(jpeg)) + jpeg))
+        head = box('ftyp', b'crx \0\0\0\1crx isom') + box('moov', canon)
+        self.assertEqual(read_cr3_preview(self.write('A.CR3', head + prvw + box('mdat', bytes(64)))), jpeg)
+        self.assertEqual(read_cr3_preview(self.write('B.CR3', head + box('mdat', bytes(64)))), thumb)
+        self.assertIsNone(read_cr3_preview(self.write('C.CR3', box('ftyp', b'crx ') + box('mdat', bytes(64)))))
+
+    def test_video_mvhd_and_tkhd(self):
+        for version, large_mdat in ((0, False), (1, True)):
+            info = read_video_metadata(self.write('MVI_0001.MP4', build_mp4(version, large_mdat)))
+            self.assertEqual(info['creation_time'], datetime(2025, 6, 27, 10, 0, 0, tzinfo=timezone.utc))
+            self.assertEqual(info['duration'], 12.5)
+            self.assertEqual((info['width'], info['height']), (1920, 1080))
+
+    def test_video_without_moov(self):
+        self.assertIsNone(read_video_metadata(self.write('partial.mov', box('mdat', b'\0' * 64))))
+
+    def test_unparseable_returns_none(self):
+        self.assertIsNone(read_exif_fast(self.write('broken.jpg', b'not a jpeg')))
+        self.assertIsNone(read_exif_fast(self.write('clip.cr3', box('ftyp', b'crx '))))
+        self.assertIsNone(read_exif_fast(os.path.join(self.tmpdir.name, 'missing.jpg')))
+
+
+if __name__ == '__main__':
+    unittest.main()
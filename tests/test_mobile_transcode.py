@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from src.mobile_transcode import MobileTranscoder, transcode_jpeg
+
+
+class TestMobileTranscode(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_folder = os.path.join(self.tmpdir.name, "mobile")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_jpeg(self, name, size=(4000, 3000), orientation=None):
+        path = os.path.join(self.tmpdir.name, name)
+        exif = Image.Exif()
+        exif[0x0132] = "2024:05:01 10:00:00"  # DateTime
+        if orientation:
+            exif[0x0112] = orientation
+        Image.new("RGB", size, (30, 120, 200)).save(path, quality=95, exif=exif)
+        return path
+
+    def test_downscales_upright_and_keeps_exif(self):
+        data = transcode_jpeg(self.write_jpeg("IMG_1.JPG", orientation=6), long_edge=1000, quality=80)
+        img = Image.open(io.BytesIO(data))
+        self.assertEqual(img.size, (750, 1000))  # Orientation 6 is applied, so the copy is portrait
+        exif = img.getexif()
+        self.assertEqual(exif.get(0x0132), "2024:05:01 10:00:00")
+        self.assertNotIn(0x0112, exif)
+
+    def test_small_images_are_sent_as_they_are(self):
+        self.assertIsNone(transcode_jpeg(self.write_jpeg("IMG_2.JPG", size=(800, 600)), long_edge=1000))
+
+    def test_cached_by_content_and_settings(self):
+        big = self.write_jpeg("IMG_3.JPG")
+        sources = {big: None, self.write_jpeg("IMG_4.JPG", size=(800, 600)): None,
+                   os.path.join(self.tmpdir.name, "MVI_1.MP4"): None}
+        transcoder = MobileTranscoder(self.cache_folder, long_edge=1000, quality=80, workers=2)
+        copies = transcoder.transcode_all(sources)
+        self.assertEqual(list(copies), [big])
+        self.assertEqual(max(Image.open(copies[big]).size), 1000)
+        self.assertEqual(transcoder.encoded, 1)
+
+        self.assertEqual(transcoder.transcode_all(sources), copies)
+        self.assertEqual(transcoder.encoded, 1)  # Not encoded again
+        transcoder.close()
+
+        other = MobileTranscoder(self.cache_folder, long_edge=500, quality=80)
+        self.assertNotEqual(other.transcode_all({big: None})[big], copies[big])
+        self.assertEqual(other.encoded, 1)
+        other.close()
+
+    def test_copies_of_one_run_stay_cached(self):
+        sources = {self.write_jpeg(f"IMG_{n}.JPG"): None for n in range(5, 8)}
+        transcoder = MobileTranscoder(self.cache_folder, long_edge=1000, quality=80, max_bytes=1, workers=2)
+        copies = transcoder.transcode_all(sources)
+        self.assertEqual(len(copies), 3)
+        self.assertTrue(all(os.path.exists(path) for path in copies.values()))  # Though over max_bytes
+        transcoder.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
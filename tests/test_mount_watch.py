@@ -0,0 +1,116 @@
+import os
+import sys
+import select
+import tempfile
+import unittest
+from unittest import mock
+
+from src import mount_watch
+from src.mount_watch import (LinuxMountDetector, MountDetector, _unescape_mount_field, create_detector,
+                             default_mount_points)
+
+MOUNTS = """\
+sysfs /sys sysfs rw,nosuid,nodev,noexec,relatime 0 0
+/dev/nvme0n1p2 / ext4 rw,relatime 0 0
+/dev/sdb1 /media/pi/EOS_DIGITAL vfat rw,nosuid,nodev,relatime 0 0
+"""
+CARD_WITH_SPACE = "/dev/sdc1 /media/pi/NIKON\\040D750 exfat rw,nosuid,nodev,relatime 0 0\n"
+
+
+class ScriptedDetector(MountDetector):
+    """Returns one mount table per check instead of asking the system."""
+
+    def __init__(self, patterns, tables):
+        super().__init__(patterns)
+        self.tables = iter(tables)
+        self.closed = False
+
+    def list_mounts(self):
+        return next(self.tables)
+
+    def wait(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class TestMountWatch(unittest.TestCase):
+    def test_unescape_mount_field(self):
+        self.assertEqual(_unescape_mount_field('/media/pi/NIKON\\040D750'), '/media/pi/NIKON D750')
+        self.assertEqual(_unescape_mount_field('/mnt/tab\\011and\\134slash'), '/mnt/tab\tand\\slash')
+        # The kernel prints raw bytes, read as latin-1: UTF-8 names come back intact.
+        self.assertEqual(_unescape_mount_field('/media/pi/F\xc3\xbcr'), '/media/pi/Für')
+        self.assertEqual(_unescape_mount_field('/mnt/plain'), '/mnt/plain')
+
+    @unittest.skipIf(os.name == 'nt' or sys.platform == 'darwin', "Linux mount points")
+    def test_default_patterns_skip_permanent_mounts(self):
+        detector = MountDetector(default_mount_points())
+        self.assertTrue(detector.matches('/media/pi/EOS_DIGITAL'))
+        self.assertTrue(detector.matches('/run/media/pi/EOS_DIGITAL'))
+        self.assertFalse(detector.matches('/mnt/c'))  # WSL's Windows drive, or a server's data disk
+
+    def test_matches_mount_point_or_device(self):
+        detector = ScriptedDetector(['/media/*/*', '/dev/sd?1'], [])
+        self.assertTrue(detector.matches('/media/pi/EOS_DIGITAL'))
+        self.assertFalse(detector.matches('/media/pi'))
+        self.assertFalse(detector.matches('/mnt/backup', '/dev/nvme0n1p3'))
+        self.assertTrue(detector.matches('/mnt/backup', '/dev/sdb1'))
+
+    def test_events_report_added_and_removed(self):
+        card = ('/dev/sdb1', '/media/pi/EOS_DIGITAL')
+        second = ('/dev/sdc1', '/media/pi/NIKON D750')
+        root = ('/dev/nvme0n1p2', '/')
+        detector = ScriptedDetector(['/media/*/*'], [[root], [root, card], [root, card], [root, second]])
+        events = detector.events()
+        self.assertEqual(next(events), ({'/media/pi/EOS_DIGITAL'}, set()))
+        # The unchanged third table yields nothing, the fourth swaps the cards.
+        self.assertEqual(next(events), ({'/media/pi/NIKON D750'}, {'/media/pi/EOS_DIGITAL'}))
+        events.close()
+        self.assertTrue(detector.closed)
+
+    @unittest.skipUnless(sys.platform.startswith('linux') and hasattr(select, 'poll'), "Linux only")
+    def test_linux_detector_parses_mounts_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            mounts_file = os.path.join(folder, 'mounts')
+            with open(mounts_file, 'w', encoding='latin-1') as f:
+                f.write(MOUNTS)
+            with mock.patch.object(mount_watch, 'PROC_MOUNTS', mounts_file):
+                detector = create_detector(['/media/*/*'], 'proc-mounts')
+            self.assertIsInstance(detector, LinuxMountDetector)
+            self.assertIn(('/dev/sdb1', '/media/pi/EOS_DIGITAL'), detector.list_mounts())
+
+            detector.poller = mock.Mock()  # A regular file never raises POLLPRI, so don't sleep on it
+            events = detector.events()
+            self.assertEqual(next(events), ({'/media/pi/EOS_DIGITAL'}, set()))
+            with open(mounts_file, 'w', encoding='latin-1') as f:
+                f.write(MOUNTS.replace('/dev/sdb1 /media/pi/EOS_DIGITAL', '/dev/sdb1 /mnt/elsewhere')
+                        + CARD_WITH_SPACE)
+            self.assertEqual(next(events), ({'/media/pi/NIKON D750'}, {'/media/pi/EOS_DIGITAL'}))
+            self.assertEqual(detector.poller.poll.call_count, 1)
+            events.close()
+            self.assertTrue(detector.mounts_file.closed)
+
+    def test_create_detector_backends(self):
+        detector = create_detector(['/media/*/*'], 'polling', interval=7)
+        self.assertEqual((detector.name, detector.interval), ('polling', 7))
+        with mock.patch.object(mount_watch.time, 'sleep') as sleep:
+            detector.wait()
+        sleep.assert_called_once_with(7)
+
+        with mock.patch.object(sys, 'platform', 'darwin'):
+            self.assertEqual(create_detector(['/Volumes/*']).name, 'polling')
+            with self.assertRaises(ValueError):
+                create_detector(['/Volumes/*'], 'proc-mounts')
+
+    @unittest.skipUnless(sys.platform.startswith('linux') and hasattr(select, 'poll'), "Linux only")
+    def test_create_detector_falls_back_without_proc_mounts(self):
+        with mock.patch.object(mount_watch, 'PROC_MOUNTS', '/nonexistent/mounts'), \
+                mock.patch('builtins.print'):
+            self.assertEqual(create_detector(['/media/*/*']).name, 'polling')
+            with self.assertRaises(OSError):
+                create_detector(['/media/*/*'], 'proc-mounts')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from src import near_duplicates
+from src.catalog import Catalog
+from src.near_duplicates import cluster_hashes, find_similar_pairs, popcount64
+
+
+def make_scene(seed, size=(640, 480)):
+    """A random arrangement of shapes, different for every seed."""
+    rng = np.random.default_rng(seed)
+    img = Image.new("RGB", size, tuple(int(v) for v in rng.integers(0, 255, 3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.integers(0, size[0]), rng.integers(0, size[1])
+        w, h = rng.integers(40, 240, 2)
+        draw.ellipse([x, y, x + w, y + h], fill=tuple(int(v) for v in rng.integers(0, 255, 3)))
+    return img
+
+
+class TestPerceptualHashes(unittest.TestCase):
+    def hashes(self, *images):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for n, img in enumerate(images):
+                paths.append(os.path.join(tmpdir, f"{n}.jpg"))
+                img.save(paths[-1], quality=85)
+            return [(dhash, phash) for _, dhash, phash in near_duplicates.compute_hashes(paths, workers=1)]
+
+    def distance(self, a, b):
+        return bin(a ^ b).count("1")
+
+    def test_burst_frames_are_close_and_scenes_far(self):
+        scene = make_scene(1)
+        brighter = scene.point(lambda v: min(255, v + 12))
+        smaller = scene.resize((480, 360))
+        (d0, p0), (d1, p1), (d2, p2), (d3, p3) = self.hashes(scene, brighter, smaller, make_scene(2))
+        for dhash, phash in ((d1, p1), (d2, p2)):
+            self.assertLessEqual(self.distance(d0, dhash), near_duplicates.HAMMING_THRESHOLD)
+            self.assertLessEqual(self.distance(p0, phash), near_duplicates.HAMMING_THRESHOLD)
+        self.assertGreater(self.distance(p0, p3), 16)
+        self.assertGreater(self.distance(d0, d3), 16)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def test_pairs_match_brute_force(self):
+        rng = np.random.default_rng(7)
+        hashes = rng.integers(0, 2 ** 63, size=1500, dtype=np.uint64) * np.uint64(2)
+        # Plant near copies differing in 1..9 bits
+        for n in range(200):
+            flips = rng.choice(64, size=n % 9 + 1, replace=False)
+            hashes[1000 + n] = hashes[n] ^ np.uint64(sum(1 << int(b) for b in flips))
+        distances = popcount64(hashes[:, None] ^ hashes[None, :])
+        for threshold in (0, 3, 7, 10):
+            i, j = find_similar_pairs(hashes, threshold)
+            expected = np.argwhere(np.triu(distances <= threshold, 1))
+            self.assertEqual(sorted(zip(i.tolist(), j.tolist())), sorted(map(tuple, expected.tolist())))
+
+    def test_clusters_are_transitive(self):
+        hashes = [0b0, 0b111, 0b111111, 0xFFFF << 40, 0b0, (0xFFFF << 40) | 1, 0xF0F0F0F0]
+        self.assertEqual(cluster_hashes(hashes, threshold=3), [[0, 1, 2, 4], [3, 5]])
+
+    def test_catalog_hashes_and_clusters(self):
+        with tempfile.TemporaryDirectory() as library:
+            catalog = Catalog(library)
+            scene = make_scene(3)
+            frames = [scene, scene.point(lambda v: min(255, v + 8)), make_scene(4), make_scene(5)]
+            for n, img in enumerate(frames):
+                path = os.path.join(library, f"IMG_{n}.JPG")
+                img.save(path, quality=85)
+                catalog.add({"filename": f"IMG_{n}.JPG", "filepath": path,
+                             "creation_date": f"2025-06-20T10:00:0{n}", "file_type": "IMAGES"})
+            self.assertEqual(near_duplicates.update_catalog_hashes(catalog, workers=1), 4)
+            self.assertEqual(near_duplicates.update_catalog_hashes(catalog, workers=1), 0)
+            catalog.close()
+
+            reopened = Catalog(library)
+            self.assertEqual(len(reopened.get(os.path.join(library, "IMG_0.JPG"))["phash"]), 16)
+            clusters = near_duplicates.find_clusters(reopened)
+            self.assertEqual([[entry["filename"] for entry in cluster] for cluster in clusters],
+                             [["IMG_0.JPG", "IMG_1.JPG"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,12 @@
+import os
+import tempfile
 import unittest
 from datetime import datetime
+from unittest import mock
 
+from src import picchronicle
 from src.picchronicle import get_date_taken, get_decimal_from_dms, get_gps_coords
+from sample_media import make_card
 
 class TestPicChronicleFunctions(unittest.TestCase):
     def test_get_date_taken_valid(self):
@@ -62,5 +67,32 @@ class TestPicChronicleFunctions(unittest.TestCase):
         self.assertAlmostEqual(coords[0], expected_lat, places=5)
         self.assertAlmostEqual(coords[1], expected_lon, places=5)
 
+class TestOrganizePipeline(unittest.TestCase):
+    def run_organize(self, root, workers):
+        source = os.path.join(root, "card")
+        destination = os.path.join(root, "organized")
+        make_card(source, count=12, days=3)
+        with mock.patch.object(picchronicle, "DESTINATION_FOLDER", destination):
+            catalog = picchronicle.open_catalog()
+            files = sorted(os.path.join(source, f) for f in os.listdir(source))
+            picchronicle.organize_files(files, catalog, workers=workers)
+            catalog.close()
+        with open(catalog.journal_path, encoding="utf-8") as f:
+            journal = f.read().replace(destination, "<dest>")
+        # Compare catalogs independent of the temporary root
+        return journal, [dict(e, filepath=os.path.relpath(e["filepath"], destination)) for e in catalog]
+
+    def test_pipelined_catalog_matches_serial(self):
+        with tempfile.TemporaryDirectory() as serial_root, tempfile.TemporaryDirectory() as parallel_root:
+            serial_journal, serial = self.run_organize(serial_root, workers=1)
+            parallel_journal, parallel = self.run_organize(parallel_root, workers=3)
+        self.assertEqual(len(serial), 12)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial_journal, parallel_journal)
+        self.assertEqual(serial[0]["filepath"], os.path.join("2025", "06", "20", "images", "IMG_0000.JPG"))
+        self.assertEqual(serial[0]["hash_algorithm"], picchronicle.HASH_ALGORITHM)
+        self.assertEqual(len(serial[0]["content_hash"]), 32)
+
+
 if __name__ == '__main__':
     unittest.main()
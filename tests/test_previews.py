@@ -0,0 +1,91 @@
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from src.media_metadata import CANON_PREVIEW_UUID
+from src.previews import PREVIEW_SIZES, PreviewCache, PreviewStore, render_previews
+from sample_media import box
+
+
+class TestPreviews(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_folder = os.path.join(self.tmpdir.name, "previews")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_jpeg(self, name, size=(3000, 2000), orientation=None):
+        path = os.path.join(self.tmpdir.name, name)
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        Image.new("RGB", size, (200, 30, 30)).save(path, quality=90, exif=exif)
+        return path
+
+    def test_render_sizes_upright(self):
+        previews = render_previews(self.write_jpeg("IMG_1.JPG", orientation=6))
+        sizes = {name: Image.open(io.BytesIO(data)).size for name, data in previews.items()}
+        # Orientation 6 is rotated 90 degrees, so the preview is portrait
+        self.assertEqual(sizes, {"medium": (1067, 1600), "thumb": (213, 320)})
+
+    def test_cr3_uses_embedded_preview(self):
+        jpeg = io.BytesIO()
+        Image.new("RGB", (1620, 1080), (0, 0, 200)).save(jpeg, "JPEG")
+        jpeg = jpeg.getvalue()
+        data = (box('ftyp', b'crx \0\0\0\1crx isom')
+                + box('uuid', CANON_PREVIEW_UUID + bytes(8) + box('PRVW', bytes(16) + jpeg))
+                + box('mdat', bytes(64)))
+        path = os.path.join(self.tmpdir.name, "IMG_2.CR3")
+        with open(path, "wb") as f:
+            f.write(data)
+        thumb = Image.open(io.BytesIO(render_previews(path, ["thumb"])["thumb"]))
+        self.assertEqual(thumb.size, (320, 213))
+
+    def test_lru_eviction_survives_restart(self):
+        cache = PreviewCache(self.cache_folder, max_bytes=250)
+        for n in range(3):
+            cache.put(f"{n:032x}", "thumb", bytes(100))
+            os.utime(cache.path_for(f"{n:032x}", "thumb"), ns=(n * 10 ** 9, n * 10 ** 9))
+        self.assertIsNone(cache.get(f"{0:032x}", "thumb"))  # Evicted to stay under 250 bytes
+        self.assertTrue(cache.get(f"{1:032x}", "thumb"))  # Now the most recently used
+
+        reloaded = PreviewCache(self.cache_folder, max_bytes=250)
+        self.assertEqual(reloaded.total_bytes, 200)
+        reloaded.put(f"{3:032x}", "thumb", bytes(100))
+        self.assertIsNone(reloaded.get(f"{2:032x}", "thumb"))
+        self.assertTrue(reloaded.get(f"{1:032x}", "thumb"))
+
+    def test_pinned_files_are_not_evicted(self):
+        cache = PreviewCache(self.cache_folder, max_bytes=250)
+        pinned = cache.put(f"{0:032x}", "thumb", bytes(100))
+        cache.pin(pinned)
+        for n in range(1, 4):
+            cache.put(f"{n:032x}", "thumb", bytes(100))
+        self.assertTrue(os.path.exists(pinned))
+        self.assertEqual(cache.total_bytes, 200)  # The pinned file and the newest one
+
+        cache.unpin_all()
+        cache.put(f"{4:032x}", "thumb", bytes(100))
+        self.assertFalse(os.path.exists(pinned))
+
+    def test_store_renders_once_per_content(self):
+        store = PreviewStore(self.cache_folder)
+        original = self.write_jpeg("IMG_3.JPG")
+        path, content_hash = store.get_or_render(original, "thumb")
+        self.assertEqual(path, store.cache.path_for(content_hash, "thumb"))
+        self.assertEqual(len(store.cache.entries), len(PREVIEW_SIZES))  # Every size rendered on the first miss
+
+        copy = os.path.join(self.tmpdir.name, "copy.jpg")
+        with open(original, "rb") as src, open(copy, "wb") as dst:
+            dst.write(src.read())
+        self.assertEqual(store.get_or_render(copy, "medium")[0], store.cache.path_for(content_hash, "medium"))
+        self.assertEqual(len(store.cache.entries), len(PREVIEW_SIZES))
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from src.hash_manifest import HashManifest
+from src.progress import MeterGroup
+from usb_watcher import scan_device
+
+
+class TestMeterGroup(unittest.TestCase):
+    def test_aggregates_child_meters(self):
+        group = MeterGroup("All cards")
+        first, second = group.meter("/media/a"), group.meter("/media/b")
+        first.add(1024 * 1024)
+        first.add(1024 * 1024)
+        second.add(512)
+        second.skip(3)
+
+        files, num_bytes, skipped, meters = group.totals()
+        self.assertEqual((files, num_bytes, skipped), (3, 2 * 1024 * 1024 + 512, 3))
+        self.assertEqual(meters, [first, second])
+
+        summary = group.summary()
+        self.assertTrue(summary.startswith("All cards: 3 files, 2.0 MB"))
+        self.assertIn(", 3 unchanged", summary)
+        self.assertIn("/media/a: 2.0 MB @", summary)
+        self.assertIn("/media/b: 512 B @", summary)
+        self.assertEqual((group.files, group.bytes, group.skipped), (3, 2 * 1024 * 1024 + 512, 3))
+
+    def test_children_report_through_group(self):
+        group = MeterGroup(interval=0)
+        meter = group.meter("card")
+        meter.add(10)
+        with mock.patch("builtins.print") as printed:
+            meter.maybe_report()
+        self.assertIn("All devices: 1 files", printed.call_args[0][0])
+
+    def test_concurrent_device_scans(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cards = []
+            for card, count in (("EOS_DIGITAL", 5), ("NIKON", 3)):
+                dcim = os.path.join(folder, card, "DCIM")
+                os.makedirs(dcim)
+                for i in range(count):
+                    with open(os.path.join(dcim, f"IMG_{i:04d}.JPG"), "wb") as f:
+                        f.write(card.encode() * (i + 1))
+                cards.append(os.path.join(folder, card))
+            manifest = HashManifest(os.path.join(folder, "manifest.sqlite"))
+            group = MeterGroup("All cards")
+
+            with mock.patch("builtins.print"), ThreadPoolExecutor(max_workers=2) as pool:
+                futures = [pool.submit(scan_device, card, manifest, group.meter(card), "md5", False, 2, 4096)
+                           for card in cards]
+                results = [future.result() for future in futures]
+            manifest.close()
+
+        self.assertEqual([len(result["new_files"]) for result in results], [5, 3])
+        self.assertEqual([result["stats"]["Images"] for result in results], [5, 3])
+        files, num_bytes, _, meters = group.totals()
+        self.assertEqual(files, 8)
+        self.assertEqual(num_bytes, len("EOS_DIGITAL") * 15 + len("NIKON") * 6)
+        self.assertEqual([meter.files for meter in meters], [5, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
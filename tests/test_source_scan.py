@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import source_scan
+from src.source_scan import SourceScanner
+
+
+class TestSourceScanner(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmpdir.name, "100CANON")
+        self.organized = os.path.join(self.source, "organized")
+        for folder in (os.path.join(self.source, "sub"), os.path.join(self.organized, "2025")):
+            os.makedirs(folder)
+        for path in ("IMG_1.JPG", "notes.txt", os.path.join("sub", "MVI_1.MP4"),
+                     os.path.join("organized", "2025", "IMG_0.JPG")):
+            open(os.path.join(self.source, path), "w").close()
+        self.snapshot = os.path.join(self.tmpdir.name, "snapshot.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_scanner(self):
+        return SourceScanner(self.snapshot, exclude=[self.organized],
+                             file_filter=lambda name: name.upper().endswith((".JPG", ".MP4")))
+
+    def test_incremental_rescan(self):
+        # No racy window, so directories can be reused right after the first scan.
+        with mock.patch.object(source_scan, "RACY_WINDOW_NS", -10 ** 12):
+            scanner = self.make_scanner()
+            expected = [os.path.join(self.source, "IMG_1.JPG"), os.path.join(self.source, "sub", "MVI_1.MP4")]
+            self.assertEqual(sorted(scanner.scan(self.source)), expected)
+            self.assertEqual(scanner.listed, 2)  # organized/ is never entered
+            scanner.save()
+
+            rescan = self.make_scanner()
+            self.assertEqual(sorted(rescan.scan(self.source)), expected)
+            self.assertEqual((rescan.listed, rescan.reused), (0, 2))
+
+            # A new file changes only its own directory's mtime.
+            open(os.path.join(self.source, "sub", "MVI_2.MP4"), "w").close()
+            st = os.stat(os.path.join(self.source, "sub"))
+            os.utime(os.path.join(self.source, "sub"), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            changed = self.make_scanner()
+            changed.snapshot = rescan.snapshot
+            self.assertIn(os.path.join(self.source, "sub", "MVI_2.MP4"), list(changed.scan(self.source)))
+            self.assertEqual((changed.listed, changed.reused), (1, 1))
+
+    def test_recent_directories_are_relisted(self):
+        scanner = self.make_scanner()
+        list(scanner.scan(self.source))
+        rescan = self.make_scanner()
+        rescan.snapshot = scanner.snapshot
+        list(rescan.scan(self.source))
+        self.assertEqual(rescan.reused, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+
+from src import sync_manifest
+from src.sync_manifest import SyncManifest
+
+
+class TestSyncManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "IMG_1.JPG")
+        self.write(b"photo one")
+        self.manifest = SyncManifest(os.path.join(self.tmpdir.name, "sync.sqlite"))
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmpdir.cleanup()
+
+    def write(self, data, mtime_ns=None):
+        with open(self.path, "wb") as f:
+            f.write(data)
+        if mtime_ns:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+        return os.stat(self.path)
+
+    def test_synced_until_content_changes(self):
+        st = os.stat(self.path)
+        content_hash = hashlib.md5(b"photo one").hexdigest()
+        self.assertEqual(self.manifest.sync_state(self.path, st, "/DCIM/IMG_1.JPG"), (False, content_hash))
+        self.manifest.mark_done(self.path, st, content_hash, "/DCIM/IMG_1.JPG")
+        self.assertEqual(self.manifest.sync_state(self.path, st, "/DCIM/IMG_1.JPG"), (True, content_hash))
+        self.assertEqual(self.manifest.sync_state(self.path, st, "/Other/IMG_1.JPG"), (False, content_hash))
+
+        touched = self.write(b"photo one", mtime_ns=st.st_mtime_ns + 10 ** 9)
+        self.assertEqual(self.manifest.sync_state(self.path, touched, "/DCIM/IMG_1.JPG"), (True, content_hash))
+        self.assertEqual(self.manifest.get(self.path)["mtime_ns"], touched.st_mtime_ns)
+
+        edited = self.write(b"photo 1!!", mtime_ns=st.st_mtime_ns + 2 * 10 ** 9)
+        self.assertEqual(self.manifest.sync_state(self.path, edited, "/DCIM/IMG_1.JPG"),
+                         (False, hashlib.md5(b"photo 1!!").hexdigest()))
+
+    def test_synced_in_any_accepted_variant(self):
+        st = os.stat(self.path)
+        content_hash = self.manifest.content_hash(self.path, st)
+        self.manifest.mark_done(self.path, st, content_hash, "/DCIM/IMG_1.JPG")  # Sent as the original
+        self.assertFalse(self.manifest.sync_state(self.path, st, "/DCIM/IMG_1.JPG", ("2560q85",))[0])
+        self.assertTrue(self.manifest.sync_state(self.path, st, "/DCIM/IMG_1.JPG", ("2560q85", ""))[0])
+
+        self.manifest.mark_done(self.path, st, content_hash, "/DCIM/IMG_1.JPG", "1280q85")
+        self.assertFalse(self.manifest.sync_state(self.path, st, "/DCIM/IMG_1.JPG", ("2560q85", ""))[0])
+
+        touched = self.write(b"photo one", mtime_ns=st.st_mtime_ns + 10 ** 9)
+        self.assertTrue(self.manifest.sync_state(self.path, touched, "/DCIM/IMG_1.JPG", ("1280q85",))[0])
+        self.assertEqual(self.manifest.get(self.path)["variant"], "1280q85")
+
+    def test_touched_file_is_hashed_once(self):
+        st = os.stat(self.path)
+        self.manifest.mark_done(self.path, st, hashlib.md5(b"photo one").hexdigest(), "/DCIM/IMG_1.JPG")
+        edited = self.write(b"photo 1!!", mtime_ns=st.st_mtime_ns + 10 ** 9)
+        with mock.patch.object(sync_manifest, "hash_file", wraps=sync_manifest.hash_file) as hash_file:
+            synced, content_hash = self.manifest.sync_state(self.path, edited, "/DCIM/IMG_1.JPG")
+        self.assertFalse(synced)
+        self.assertEqual(content_hash, hashlib.md5(b"photo 1!!").hexdigest())
+        self.assertEqual(hash_file.call_count, 1)
+
+        with mock.patch.object(sync_manifest, "hash_file") as hash_file:
+            self.manifest.sync_state(self.path, st, "/DCIM/IMG_1.JPG")  # Untouched: the row's hash
+        hash_file.assert_not_called()
+
+    def test_resumes_only_our_partial_upload(self):
+        st = os.stat(self.path)
+        content_hash = self.manifest.content_hash(self.path, st)
+        self.assertEqual(self.manifest.resume_offset(self.path, content_hash, "/DCIM/IMG_1.JPG", 4), 0)
+        self.manifest.mark_sending(self.path, st, content_hash, "/DCIM/IMG_1.JPG")
+        self.assertEqual(self.manifest.resume_offset(self.path, content_hash, "/DCIM/IMG_1.JPG", 4), 4)
+        self.assertEqual(self.manifest.resume_offset(self.path, content_hash, "/DCIM/IMG_1.JPG", 9), 0)
+        self.assertEqual(self.manifest.resume_offset(self.path, "other", "/DCIM/IMG_1.JPG", 4), 0)
+        self.assertFalse(self.manifest.sync_state(self.path, st, "/DCIM/IMG_1.JPG")[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
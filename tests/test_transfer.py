@@ -0,0 +1,150 @@
+import os
+import json
+import errno
+import tempfile
+import unittest
+from unittest import mock
+
+from src import transfer
+from src.file_hashing import hash_file
+from src.transfer import TransferEngine, copy_file, move_with_hash
+
+
+class TestTransferEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmpdir.name, "organized")
+        self.dest = os.path.join(self.tmpdir.name, "cloud")
+        os.makedirs(os.path.join(self.source, "2025", "01"))
+        self.jobs = []
+        for i in range(6):
+            src = os.path.join(self.source, "2025", "01", f"IMG_{i}.JPG")
+            with open(src, "wb") as f:
+                f.write(os.urandom(1000 + i * 4096))
+            os.utime(src, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+            self.jobs.append((src, os.path.join(self.dest, "2025", "01", f"IMG_{i}.JPG")))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assert_copied(self, src, dst):
+        with open(src, "rb") as a, open(dst, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertEqual(os.stat(src).st_mtime_ns, os.stat(dst).st_mtime_ns)
+
+    def test_copies_then_skips_existing(self):
+        engine = TransferEngine(workers=3)
+        self.assertEqual(engine.run(self.jobs), (6, 0, 0))
+        for src, dst in self.jobs:
+            self.assert_copied(src, dst)
+        self.assertFalse([name for name in os.listdir(os.path.dirname(self.jobs[0][1]))
+                          if name.endswith(transfer.PARTIAL_SUFFIX)])
+        self.assertEqual(TransferEngine(workers=3).run(self.jobs), (0, 6, 0))
+
+    def test_falls_back_to_userspace_copy(self):
+        src, dst = self.jobs[-1]
+        os.makedirs(os.path.dirname(dst))
+        with mock.patch.object(transfer, "kernel_copiers", return_value=[]):
+            self.assertEqual(copy_file(src, dst), "copy")
+        self.assert_copied(src, dst)
+
+    def test_falls_back_when_sendfile_needs_a_socket(self):
+        src, dst = self.jobs[-1]
+        os.makedirs(os.path.dirname(dst))
+
+        def sendfile_to_socket_only(fsrc, fdst, size):  # macOS and BSD
+            fdst.write(b"partial")
+            raise OSError(errno.ENOTSOCK, "Socket operation on non-socket")
+
+        with mock.patch.object(transfer, "kernel_copiers", return_value=[("sendfile", sendfile_to_socket_only)]):
+            self.assertEqual(transfer.copy_file_data(src, dst), "copy")
+        with open(src, "rb") as a, open(dst, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+        with mock.patch.object(transfer.sys, "platform", "darwin"):
+            self.assertNotIn("sendfile", [method for method, _ in transfer.kernel_copiers()])
+
+    def test_error_leaves_no_partial_file(self):
+        src, dst = self.jobs[0]
+        engine = TransferEngine(workers=2)
+        with mock.patch.object(transfer.shutil, "copystat", side_effect=OSError("denied")):
+            self.assertEqual(engine.run([(src, dst)]), (0, 0, 1))
+        self.assertEqual(os.listdir(os.path.dirname(dst)), [])
+
+    def test_hardlink_mode_logs_method(self):
+        log_path = os.path.join(self.tmpdir.name, "export_log.jsonl")
+        engine = TransferEngine(workers=2, mode="hardlink", log_path=log_path)
+        self.assertEqual(engine.run(self.jobs[:2]), (2, 0, 0))
+        for src, dst in self.jobs[:2]:
+            self.assertTrue(os.path.samefile(src, dst))
+        with open(log_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r["destination"] for r in records), [dst for _, dst in self.jobs[:2]])
+        self.assertEqual({r["method"] for r in records}, {"hardlink"})
+
+    def test_auto_mode_falls_back_to_copy(self):
+        src, dst = self.jobs[0]
+        os.makedirs(os.path.dirname(dst))
+        unsupported = OSError(errno.EXDEV, "Cross-device link")
+        with mock.patch.object(transfer, "reflink_file", side_effect=unsupported), \
+                mock.patch.object(transfer.os, "link", side_effect=unsupported):
+            self.assertNotIn(copy_file(src, dst, mode="auto"), ("reflink", "hardlink"))
+        self.assert_copied(src, dst)
+        self.assertFalse(os.path.samefile(src, dst))
+
+    def test_verified_copy_records_hashes(self):
+        expected = {src: hash_file(src) for src, _ in self.jobs}
+        jobs = [(src, dst, expected[src] if i % 2 else None) for i, (src, dst) in enumerate(self.jobs)]
+        engine = TransferEngine(workers=3, hash_algorithm="md5")
+        self.assertEqual(engine.run(jobs), (6, 0, 0))
+        self.assertEqual(engine.hashes, expected)
+        self.assertEqual(engine.methods, {"copy+hash": 6})
+        for src, dst in self.jobs:
+            self.assert_copied(src, dst)
+
+    def test_only_moves_are_synced_to_disk(self):
+        with mock.patch.object(transfer.os, "fsync") as fsync:
+            self.assertEqual(TransferEngine(workers=3, hash_algorithm="md5").run(self.jobs), (6, 0, 0))
+        fsync.assert_not_called()  # The source is still there, exports aren't synced file by file
+
+        src, dst = self.jobs[0]
+        moved = dst + ".moved"
+        with mock.patch.object(transfer, "same_volume", return_value=False), \
+                mock.patch.object(transfer.os, "fsync") as fsync:
+            move_with_hash(src, moved)
+        fsync.assert_called_once()  # Before the source is removed
+        self.assertFalse(os.path.exists(src))
+
+    def test_hash_mismatch_discards_copy(self):
+        src, dst = self.jobs[0]
+        engine = TransferEngine(workers=1, hash_algorithm="md5")
+        self.assertEqual(engine.run([(src, dst, "0" * 32)]), (0, 0, 1))
+        self.assertIsInstance(engine.errors[0][1], transfer.HashMismatchError)
+        self.assertEqual(os.listdir(os.path.dirname(dst)), [])
+
+    def test_move_with_hash(self):
+        os.makedirs(os.path.dirname(self.jobs[0][1]))
+        for same_volume, (src, dst) in zip((True, False), self.jobs):
+            with open(src, "rb") as f:
+                data = f.read()
+            expected = hash_file(src)
+            with mock.patch.object(transfer, "same_volume", return_value=same_volume):
+                self.assertEqual(move_with_hash(src, dst), expected)
+            self.assertFalse(os.path.exists(src))
+            with open(dst, "rb") as f:
+                self.assertEqual(f.read(), data)
+            self.assertEqual(os.stat(dst).st_mtime_ns, 1_600_000_000_000_000_000)
+
+    def test_supports_hardlinks(self):
+        self.assertTrue(transfer.supports_hardlinks(self.source))
+        with mock.patch.object(transfer.os, "link", side_effect=OSError(errno.EPERM, "Operation not permitted")):
+            self.assertFalse(transfer.supports_hardlinks(self.source))
+        self.assertEqual(os.listdir(self.source), ["2025"])  # The probe files are gone
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            TransferEngine(mode="symlink")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import json
+import tempfile
+import unittest
+from ftplib import FTP
+
+from src.ftp_pool import FTPPool, UploadJob
+from src.upload_scheduler import (ConcurrencyTuner, TokenBucket, UploadScheduler, scheduler_from_config, summarize,
+                                  MAX_SESSIONS, TUNE_HOLD)
+from ftp_test_server import HAVE_PYFTPDLIB, start_ftp_server
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestUploadScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def job(self, name, size, mtime):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        os.utime(path, (mtime, mtime))
+        return UploadJob(path, f"/photos/{name}")
+
+    def test_policies(self):
+        jobs = [self.job("MVI_1.MP4", 3000, 300), self.job("IMG_1.CR3", 2000, 200),
+                self.job("IMG_1.JPG", 1000, 100), self.job("IMG_2.JPG", 1500, 400)]
+
+        def names(policy):
+            return [os.path.basename(job.local_path) for job in UploadScheduler(policy).order(jobs)]
+
+        self.assertEqual(names("newest"), ["IMG_2.JPG", "MVI_1.MP4", "IMG_1.CR3", "IMG_1.JPG"])
+        self.assertEqual(names("smallest"), ["IMG_1.JPG", "IMG_2.JPG", "IMG_1.CR3", "MVI_1.MP4"])
+        self.assertEqual(names("type"), ["IMG_1.JPG", "IMG_2.JPG", "IMG_1.CR3", "MVI_1.MP4"])
+        self.assertEqual(names("fifo"), ["MVI_1.MP4", "IMG_1.CR3", "IMG_1.JPG", "IMG_2.JPG"])
+        with self.assertRaises(ValueError):
+            UploadScheduler("largest")
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(1000, clock=clock, sleep=clock.sleep)
+        bucket.consume(1000)  # The initial burst is free
+        self.assertEqual(clock.slept, [])
+        for _ in range(4):
+            bucket.consume(500)
+        self.assertEqual(sum(clock.slept), 2.0)  # 2000 bytes at 1000 bytes/s
+        TokenBucket(0, clock=clock, sleep=clock.sleep).consume(10 ** 9)
+        self.assertEqual(sum(clock.slept), 2.0)
+
+    def test_tuner_adds_sessions_while_transfers_hold_up(self):
+        tuner = ConcurrencyTuner(2, max_sessions=6)
+        # Per-connection bottleneck: each transfer keeps 1 MB/s, whatever the number of sessions
+        for _ in range(6):
+            tuner.update(1.0, tuner.limit * 1.0)
+        self.assertEqual(tuner.limit, 6)
+
+    def test_tuner_steps_back_on_a_shared_link(self):
+        tuner = ConcurrencyTuner(1, max_sessions=8)
+        link = 3.0  # Saturated at 3 MB/s: beyond 3 sessions each transfer just gets slower
+        for _ in range(4):
+            tuner.update(min(1.0, link / tuner.limit), min(tuner.limit, link))
+        self.assertEqual(tuner.limit, 3)
+        for _ in range(TUNE_HOLD):
+            tuner.update(1.0, 3.0)
+        self.assertEqual(tuner.limit, 3)  # Held before probing again
+
+    def test_tuner_halves_on_collapse(self):
+        tuner = ConcurrencyTuner(6, max_sessions=8)
+        tuner.update(1.0, 6.0)
+        self.assertEqual(tuner.limit, 7)
+        tuner.update(0.1, 0.7)
+        self.assertEqual(tuner.limit, 3)
+
+    def test_tuner_never_exceeds_refused_sessions(self):
+        tuner = ConcurrencyTuner(4, max_sessions=8)
+        self.assertEqual(tuner.refused(3), 3)
+        for _ in range(TUNE_HOLD + 4):
+            tuner.update(1.0, tuner.limit * 1.0)
+        self.assertEqual(tuner.limit, 3)
+
+    def test_sessions_are_fixed_unless_auto_tuned(self):
+        self.assertEqual(UploadScheduler(sessions=12).sessions, 12)
+        self.assertEqual(UploadScheduler(sessions=2, max_sessions=8).sessions, 2)
+        self.assertEqual(UploadScheduler(sessions=2, auto_tune=True).sessions, MAX_SESSIONS)
+        self.assertEqual(UploadScheduler(sessions=12, auto_tune=True).sessions, 12)
+        self.assertEqual(UploadScheduler(sessions=2, max_sessions=4, auto_tune=True).sessions, 4)
+
+        scheduler = scheduler_from_config({"policy": "smallest"}, 6)
+        self.assertEqual((scheduler.sessions, scheduler.tuner.limit, scheduler.auto_tune), (6, 6, False))
+        scheduler = scheduler_from_config({"auto_tune": True, "max_sessions": 10}, 3)
+        self.assertEqual((scheduler.sessions, scheduler.tuner.limit), (10, 3))
+
+    @unittest.skipIf(not HAVE_PYFTPDLIB, "pyftpdlib is not installed")
+    def test_pool_follows_the_schedule_and_records_stats(self):
+        remote = os.path.join(self.tmpdir.name, "remote")
+        os.makedirs(os.path.join(remote, "photos"))
+        port = start_ftp_server(self, remote)
+
+        def connect():
+            ftp = FTP()
+            ftp.connect("127.0.0.1", port)
+            ftp.login("user", "pass")
+            return ftp
+
+        jobs = [self.job(f"IMG_{i}.JPG", 5000 - i * 1000, i) for i in range(4)]
+        done = []
+        for job in jobs:
+            job.on_done = lambda job: done.append(os.path.basename(job.remote_path))
+        stats_file = os.path.join(self.tmpdir.name, "stats.jsonl")
+        scheduler = UploadScheduler("smallest", sessions=1, auto_tune=False, stats_file=stats_file)
+        self.assertEqual(FTPPool(connect, scheduler=scheduler).run(jobs), (4, 0))
+        self.assertEqual(done, ["IMG_3.JPG", "IMG_2.JPG", "IMG_1.JPG", "IMG_0.JPG"])
+        self.assertEqual(scheduler.peak, 1)
+
+        with open(stats_file, encoding="utf-8") as f:
+            stats = json.loads(f.readline())
+        self.assertEqual((stats["policy"], stats["files"], stats["bytes"]), ("smallest", 4, 14000))
+        self.assertEqual(summarize(stats_file)["smallest"]["runs"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,34 @@
-import time
 import subprocess
-import psutil
 import os
-import hashlib
+import sys
+import queue
+import argparse
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from file_hashing import HashEngine, hash_file, cached_file_hash, available_algorithms
+from hash_manifest import HashManifest
+from mount_watch import create_detector, default_mount_points
+from progress import MeterGroup
+from catalog import Catalog
 
 # === CONFIG ===
-TARGET_DRIVE = 'D:\\'
-WATCH_PATH = os.path.join(TARGET_DRIVE, 'DCIM')  # Update to actual folder
+MOUNT_POINTS = default_mount_points()  # Glob patterns where cards mount, e.g. ['D:\\'] or ['/media/*/*']
+WATCH_SUBFOLDER = 'DCIM'  # Folder on the card to scan, update to actual folder
+DETECTION_BACKEND = 'auto'  # 'auto', 'proc-mounts' (Linux, event-driven) or 'polling'
 SCRIPT_PATH = r'C:\Users\shravan\Documents\Python_Scripts\PicChronicle\run_all.py'
 VENV_PYTHON = r'C:\Users\shravan\Documents\Python_Scripts\PicChronicle\venv\Scripts\python.exe'
-HASH_RECORD_FILE = 'usb_file_hashes.txt'
-SCAN_INTERVAL = 3
+MANIFEST_FILE = 'usb_manifest.sqlite'  # Stat cache + ingested hashes, indexed by path and hash
+HASH_RECORD_FILE = 'usb_file_hashes.txt'  # Legacy path::hash records, migrated into MANIFEST_FILE
+CATALOG_FOLDER = r'D:\DCIM\100CANON\organized'  # picchronicle's DESTINATION_FOLDER, holds catalog.jsonl
+HASH_ALGORITHM = 'md5'  # Changing this makes every file look modified once
+HASH_WORKERS = 4  # Files hashed concurrently by get_file_hashes
+DEVICE_IO_WORKERS = 2  # Concurrent reads per card, so one slow reader can't starve the others
+MAX_PARALLEL_DEVICES = 4  # Cards scanned at the same time
+HASH_READAHEAD = 1024 * 1024  # Bytes per read while hashing
+SCAN_INTERVAL = 3  # Only used by the polling backend
 
 # === CATEGORIES ===
 EXT_CATEGORIES = {
@@ -21,37 +38,53 @@ EXT_CATEGORIES = {
 }
 
 # === HELPERS ===
-def drive_connected():
-    return TARGET_DRIVE in [part.device for part in psutil.disk_partitions()]
-
-def compute_file_hash(filepath):
+def compute_file_hash(filepath, algorithm=HASH_ALGORITHM, cache=None, full_rehash=False):
     try:
-        with open(filepath, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
-    except:
+        if cache is None:
+            return hash_file(filepath, algorithm)
+        return cached_file_hash(filepath, cache, algorithm, full_rehash)
+    except OSError:
         return None
 
-def get_file_hashes(folder):
-    file_hashes = {}
-    for root, _, files in os.walk(folder):
-        for file in files:
-            path = os.path.join(root, file)
-            hash_val = compute_file_hash(path)
-            if hash_val:
-                file_hashes[path] = hash_val
-    return file_hashes
-
-def load_previous_hashes():
-    if not os.path.exists(HASH_RECORD_FILE):
-        return {}
-    with open(HASH_RECORD_FILE, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-        return dict(line.strip().split('::') for line in lines if '::' in line)
-
-def save_current_hashes(hashes):
-    with open(HASH_RECORD_FILE, 'w', encoding='utf-8') as f:
-        for path, hash_val in hashes.items():
-            f.write(f"{path}::{hash_val}\n")
+def get_file_hashes(folder, cache=None, algorithm=HASH_ALGORITHM, full_rehash=False,
+                    workers=HASH_WORKERS, readahead=HASH_READAHEAD):
+    """Hash every file under folder, only reading files that are new or changed since the cached scan."""
+    engine = HashEngine(workers=workers, readahead=readahead, algorithm=algorithm,
+                        cache=cache, full_rehash=full_rehash, label="Card scan")
+    return dict(engine.iter_hashes(folder))
+
+def open_manifest():
+    """Open the SQLite manifest, importing the legacy text records on first use."""
+    manifest = HashManifest(MANIFEST_FILE)
+    migrated = manifest.migrate_text_records(HASH_RECORD_FILE)
+    if migrated:
+        print(f"📦 Migrated {migrated} records from {HASH_RECORD_FILE} to {MANIFEST_FILE}")
+    return manifest
+
+def save_current_hashes(hashes, manifest, algorithm=HASH_ALGORITHM):
+    manifest.mark_ingested(hashes, algorithm)
+
+def seed_manifest_from_catalog(manifest, catalog_folder=CATALOG_FOLDER, algorithm=HASH_ALGORITHM):
+    """Reuse the hashes picchronicle recorded while organizing, so organized files are never re-read."""
+    if not os.path.isdir(catalog_folder):
+        return 0
+    seeded = {}
+    for entry in Catalog(catalog_folder):
+        path = entry.get("filepath")
+        if not entry.get("content_hash") or entry.get("hash_algorithm") != algorithm:
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        # Only trust the hash if the file is unchanged since it was organized.
+        if (st.st_size, st.st_mtime_ns) != (entry.get("size"), entry.get("mtime_ns")):
+            continue
+        if manifest.get(path, st, algorithm) is None:
+            manifest.put(path, st, algorithm, entry["content_hash"])
+            seeded[path] = entry["content_hash"]
+    manifest.mark_ingested(seeded, algorithm)
+    return len(seeded)
 
 def get_extension_category(ext):
     ext = ext.lower()
@@ -60,57 +93,143 @@ def get_extension_category(ext):
             return category
     return "Other"
 
-def classify_new_files(current_hashes, previous_hashes):
-    new_files = {path: hash for path, hash in current_hashes.items()
-                 if path not in previous_hashes or previous_hashes[path] != hash}
-    
+def classify_new_files(current_hashes, previous_hashes, algorithm=HASH_ALGORITHM):
+    """Classify new/modified files. current_hashes may be a dict or a stream of (path, hash) pairs.
+
+    previous_hashes is either a {path: hash} dict or a HashManifest, in which case content
+    ingested before with the same algorithm under a different path (e.g. moved into
+    organized/) is not new.
+    """
+    if isinstance(current_hashes, dict):
+        current_hashes = current_hashes.items()
+
+    new_files = {}
     stats = {"Images": 0, "RAW": 0, "Videos": 0, "Other": 0}
-    for path in new_files:
+    for path, hash in current_hashes:
+        if hasattr(previous_hashes, "is_known"):
+            if previous_hashes.is_known(hash, algorithm):
+                continue
+        elif path in previous_hashes and previous_hashes[path] == hash:
+            continue
+        new_files[path] = hash
         ext = os.path.splitext(path)[1]
         category = get_extension_category(ext)
         stats[category] += 1
     return new_files, stats
 
 # === MAIN ===
-def main():
-    print("🔍 Watching for USB insertion + new files...")
-    already_connected = False
+def scan_device(mountpoint, manifest, meter, algorithm, full_rehash, workers, readahead):
+    """Hash and classify one card. Runs on its own thread with its own I/O worker limit."""
+    watch_path = os.path.join(mountpoint, WATCH_SUBFOLDER)
+    if not os.path.exists(watch_path):
+        print(f"⚠️ Folder not found: {watch_path}")
+        return None
+
+    engine = HashEngine(workers=workers, readahead=readahead, algorithm=algorithm,
+                        cache=manifest, full_rehash=full_rehash, meter=meter)
+    # Classify while the card is still being hashed.
+    new_files, stats = classify_new_files(engine.iter_hashes(watch_path), manifest, algorithm)
+    print(f"🧮 {engine.meter.summary()}")
+    return {"mountpoint": mountpoint, "watch_path": watch_path, "hashes": engine.results,
+            "new_files": new_files, "stats": stats}
+
+def ingest_results(results, manifest, algorithm):
+    """Summarise every scanned card and run run_all.py once for all cards with new files."""
+    results = [result for result in results if result["new_files"]]
+    if not results:
+        print("✅ No new files found.")
+        return
+
+    print(f"\n📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    for result in results:
+        print(f"🆕 {len(result['new_files'])} new/modified files found on {result['mountpoint']}:")
+        for cat, count in result["stats"].items():
+            if count > 0:
+                print(f"  - {cat}: {count}")
+
+    confirm = input("\n❓ Do you want to run run_all.py now? (y/n): ").strip().lower()
+    if confirm == 'y':
+        command = [VENV_PYTHON, SCRIPT_PATH]
+        for result in results:
+            command += ["--source", result["watch_path"]]
+        subprocess.run(command)
+        for result in results:
+            save_current_hashes(result["hashes"], manifest, algorithm)
+        seeded = seed_manifest_from_catalog(manifest, algorithm=algorithm)
+        if seeded:
+            print(f"🧾 Recorded {seeded} organized files from the catalog, no re-hash needed")
+        print("✅ Script executed.")
+    else:
+        print("❌ Skipped script execution.")
+
+def watch_mounts(detector, events):
+    for added, removed in detector.events():
+        events.put(("mounts", (added, removed)))
+
+def main(algorithm=HASH_ALGORITHM, full_rehash=False, workers=DEVICE_IO_WORKERS, readahead=HASH_READAHEAD,
+         mount_points=None, backend=DETECTION_BACKEND):
+    detector = create_detector(mount_points or MOUNT_POINTS, backend, SCAN_INTERVAL)
+    print(f"🔍 Watching for USB insertion + new files ({detector.name}: {', '.join(detector.patterns)})...")
+    manifest = open_manifest()
+    if full_rehash:
+        print("♻️ Full re-hash requested, ignoring cached hashes.")
+
+    # Mount changes and finished scans both arrive on this queue, prompts stay on the main thread.
+    events = queue.Queue()
+    threading.Thread(target=watch_mounts, args=(detector, events), daemon=True).start()
+    device_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DEVICES)
+    scanning = set()
+    results = []
+    group = None
 
     while True:
-        time.sleep(SCAN_INTERVAL)
-        connected = drive_connected()
-
-        if connected and not already_connected:
-            print(f"📥 USB detected at {TARGET_DRIVE}")
-            if os.path.exists(WATCH_PATH):
-                current_hashes = get_file_hashes(WATCH_PATH)
-                previous_hashes = load_previous_hashes()
-                new_files, stats = classify_new_files(current_hashes, previous_hashes)
-
-                if new_files:
-                    print(f"\n📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                    print(f"🆕 {len(new_files)} new/modified files found:")
-                    for cat, count in stats.items():
-                        if count > 0:
-                            print(f"  - {cat}: {count}")
-                    
-                    confirm = input("\n❓ Do you want to run run_all.py now? (y/n): ").strip().lower()
-                    if confirm == 'y':
-                        subprocess.run([VENV_PYTHON, SCRIPT_PATH])
-                        save_current_hashes(current_hashes)
-                        print("✅ Script executed.")
-                    else:
-                        print("❌ Skipped script execution.")
-                else:
-                    print("✅ No new files found.")
-            else:
-                print(f"⚠️ Folder not found: {WATCH_PATH}")
-
-            already_connected = True
-
-        elif not connected and already_connected:
-            print("📤 USB removed.")
-            already_connected = False
+        kind, payload = events.get()
+        if kind == "mounts":
+            added, removed = payload
+            for mountpoint in sorted(removed):
+                print(f"📤 USB removed: {mountpoint}")
+            for mountpoint in sorted(added - scanning):
+                print(f"📥 USB detected at {mountpoint}")
+                if group is None:
+                    group = MeterGroup("All cards")
+                future = device_pool.submit(scan_device, mountpoint, manifest, group.meter(mountpoint),
+                                            algorithm, full_rehash, workers, readahead)
+                scanning.add(mountpoint)
+                future.add_done_callback(lambda f, m=mountpoint: events.put(("scanned", (m, f))))
+        elif kind == "scanned":
+            mountpoint, future = payload
+            scanning.discard(mountpoint)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ Scan of {mountpoint} failed: {e}")
+                result = None
+            if result:
+                results.append(result)
+            if not scanning:
+                # Wait for every card inserted together before asking once for all of them.
+                if group is not None and len(group.meters) > 1:
+                    print(f"📊 {group.summary()}")
+                group = None
+                ingest_results(results, manifest, algorithm)
+                results = []
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Watch for a camera card and detect new files.")
+    parser.add_argument("--algorithm", default=HASH_ALGORITHM, choices=available_algorithms(),
+                        help=f"Hash algorithm for change detection (default: {HASH_ALGORITHM})")
+    parser.add_argument("--rehash", action="store_true",
+                        help="Ignore the hash cache and re-read every file on the card")
+    parser.add_argument("--workers", type=int, default=DEVICE_IO_WORKERS,
+                        help=f"Files hashed in parallel per card (default: {DEVICE_IO_WORKERS})")
+    parser.add_argument("--readahead", type=int, default=HASH_READAHEAD,
+                        help=f"Bytes per read while hashing (default: {HASH_READAHEAD})")
+    parser.add_argument("--mount", action="append", dest="mount_points", metavar="PATTERN",
+                        help=f"Mount point (glob) to watch for cards, repeatable (default: {', '.join(MOUNT_POINTS)})")
+    parser.add_argument("--backend", default=DETECTION_BACKEND, choices=["auto", "proc-mounts", "polling"],
+                        help="Mount detection backend (default: auto, event-driven where supported)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(args.algorithm, args.rehash, args.workers, args.readahead, args.mount_points, args.backend)